@@ -0,0 +1,172 @@
+"""
+admission.py
+Domain: Admission Control and Backpressure
+
+LLM-bound work (/api/login, /api/chat, /api/clear_history, /api/report) is admitted
+here before it starts, instead of piling up in the server threadpool until clients
+time out:
+- at most ADMISSION_MAX_CONCURRENCY requests run at once
+- up to ADMISSION_QUEUE_SIZE more wait, first come first served, for at most
+  ADMISSION_QUEUE_TIMEOUT_S
+- one session may hold at most ADMISSION_SESSION_LIMIT running + waiting requests
+  (for /api/chat and /api/clear_history this is enforced by the session gate before
+  the turn waits on the session lock, session_gate.py; turns reach admit() one at a
+  time per session)
+Anything beyond that is rejected at once with Overloaded (HTTP 429 + Retry-After,
+see api.py). Retry-After is the estimated time for the queue ahead to drain, from a
+moving average of admitted requests' service time.
+
+Priority lane: work that needs no LLM (response-cache hits, regex guardrail blocks,
+token budget refusals) is answered without admission, so it stays fast under overload.
+
+Server threads: api.py's lifespan raises anyio's default thread limiter, which is
+process-wide (every sync endpoint and every anyio.to_thread call without its own
+limiter share it), to THREADPOOL_SIZE so that admitted and queued requests never
+wait for a thread. It only raises the limit, never lowers it.
+
+Opt-out: ADMISSION=0 admits everything.
+"""
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("ADMISSION", "1").lower() in ("1", "true", "yes")
+MAX_CONCURRENCY = int(os.getenv("ADMISSION_MAX_CONCURRENCY", "16"))
+QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "32"))
+QUEUE_TIMEOUT_S = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_S", "10"))
+SESSION_LIMIT = int(os.getenv("ADMISSION_SESSION_LIMIT", "2"))
+# Server threads: every admitted or queued request holds one, plus room for the priority lane
+# and cheap endpoints, so the threadpool itself never becomes the hidden unbounded queue.
+THREADPOOL_SIZE = MAX_CONCURRENCY + QUEUE_SIZE + int(os.getenv("ADMISSION_EXTRA_THREADS", "24"))
+
+# Rejection reasons
+QUEUE_FULL = "queue_full"
+QUEUE_TIMEOUT = "queue_timeout"
+SESSION_BUSY = "session_busy"
+
+_EWMA_ALPHA = 0.2
+
+
+class Overloaded(Exception):
+    """The request was not admitted; retry after `retry_after` seconds."""
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Bounded FIFO admission with a global and a per-key (session) limit."""
+
+    def __init__(self, max_concurrency: int = MAX_CONCURRENCY, queue_size: int = QUEUE_SIZE,
+                 queue_timeout_s: float = QUEUE_TIMEOUT_S, session_limit: int = SESSION_LIMIT):
+        self.max_concurrency = max_concurrency
+        self.queue_size = queue_size
+        self.queue_timeout_s = queue_timeout_s
+        self.session_limit = session_limit
+        self.active = 0
+        self._queue: deque = deque()
+        self._per_session: Dict[str, int] = {}
+        self._service_s = 1.0  # moving average of admitted request duration
+        self._lock = threading.Lock()
+
+    @property
+    def queued(self) -> int:
+        return len(self._queue)
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue has likely drained."""
+        ahead = len(self._queue) + 1
+        return max(1, math.ceil(self._service_s * ahead / self.max_concurrency))
+
+    def _reject(self, endpoint: str, reason: str):
+        retry_after = self.retry_after()
+        metrics.ADMISSIONS.inc(endpoint=endpoint, outcome=f"rejected_{reason}")
+        logger.warning("request rejected", extra={"endpoint": endpoint, "reason": reason,
+                                                  "retry_after": retry_after, "queued": len(self._queue)})
+        raise Overloaded(reason, retry_after)
+
+    def _release_session(self, session_key: Optional[str]):
+        if session_key is None:
+            return
+        left = self._per_session.get(session_key, 0) - 1
+        if left > 0:
+            self._per_session[session_key] = left
+        else:
+            self._per_session.pop(session_key, None)
+
+    def acquire(self, endpoint: str, session_key: Optional[str]):
+        with self._lock:
+            if session_key is not None and self._per_session.get(session_key, 0) >= self.session_limit:
+                self._reject(endpoint, SESSION_BUSY)
+            if self.active < self.max_concurrency and not self._queue:
+                self.active += 1
+                if session_key is not None:
+                    self._per_session[session_key] = self._per_session.get(session_key, 0) + 1
+                metrics.ADMISSIONS.inc(endpoint=endpoint, outcome="admitted")
+                return
+            if len(self._queue) >= self.queue_size:
+                self._reject(endpoint, QUEUE_FULL)
+            granted = threading.Event()
+            self._queue.append(granted)
+            if session_key is not None:
+                self._per_session[session_key] = self._per_session.get(session_key, 0) + 1
+
+        start = time.perf_counter()
+        granted.wait(self.queue_timeout_s)
+        with self._lock:
+            # A slot may have been handed over just as the wait timed out
+            if not granted.is_set():
+                self._queue.remove(granted)
+                self._release_session(session_key)
+                self._reject(endpoint, QUEUE_TIMEOUT)
+        metrics.ADMISSION_WAIT_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint)
+        metrics.ADMISSIONS.inc(endpoint=endpoint, outcome="admitted")
+
+    def release(self, session_key: Optional[str], service_s: float):
+        with self._lock:
+            self._service_s += _EWMA_ALPHA * (service_s - self._service_s)
+            self._release_session(session_key)
+            if self._queue:
+                # Hand the slot straight to the oldest waiter; `active` is unchanged
+                self._queue.popleft().set()
+            else:
+                self.active -= 1
+
+    @contextmanager
+    def admit(self, endpoint: str, session_key: Optional[str] = None, priority: bool = False):
+        """Runs the block once admitted; priority work (no LLM call) is not counted."""
+        if not ENABLED or priority:
+            metrics.ADMISSIONS.inc(endpoint=endpoint, outcome="priority" if priority else "admitted")
+            yield
+            return
+        self.acquire(endpoint, session_key)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(session_key, time.perf_counter() - start)
+
+
+controller = AdmissionController()
+metrics.gauge("insure_admission_active", "LLM-bound requests admitted and running.", fn=lambda: controller.active)
+metrics.gauge("insure_admission_queued", "LLM-bound requests waiting for admission.", fn=lambda: controller.queued)
+
+
+def admit(endpoint: str, session_key: Optional[str] = None, priority: bool = False):
+    return controller.admit(endpoint, session_key, priority)
+
+
+def get_admission_stats() -> dict:
+    return {"enabled": ENABLED, "active": controller.active, "queued": controller.queued,
+            "max_concurrency": controller.max_concurrency, "queue_size": controller.queue_size,
+            "session_limit": controller.session_limit, "service_s": round(controller._service_s, 3)}
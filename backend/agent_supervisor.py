@@ -2,15 +2,14 @@
 agent_supervisor.py
 Multi-agent LangGraph workflow with supervisor routing.
 """
-import sys, os
+import sys, os, logging
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from dotenv import load_dotenv
 load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".env"))
 
 from typing import Literal, TypedDict, Annotated, List
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import SystemMessage
+from langchain_core.messages import SystemMessage, AIMessage
 from langchain_core.runnables import RunnableConfig
 from langgraph.graph import StateGraph, START, END
 from langgraph.prebuilt import ToolNode
@@ -23,19 +22,36 @@ from policy_tools import get_customer_policies, get_policy_details
 from claims_tools import get_customer_claims, check_claim_status, file_new_claim
 from billing_tools import get_billing_history
 from auto_tools import get_vehicle_details
-from rag_tools import search_faq
+from rag_tools import search_faq, FaqToolNode
+from response_templates import templated_reply_node, after_tools
+from prefetch import prefetch_node, needs_prefetch, merge_prefetched, take_prefetched, WRITE_TOOLS
+import fan_out
+import turn_budget
+import cassette
+import llm_gateway
+import metrics
+
+logger = logging.getLogger(__name__)
 
 # --- STATE ---
 class AgentState(TypedDict):
     messages: Annotated[List, add_messages]
     next: str
     authenticated_customer_id: str  # Set at login, used by tools to enforce ownership
-
-llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+    policy_types: List[str]  # Customer's policy types, set at login; narrows FAQ search
+    prefetched: Annotated[dict, merge_prefetched]  # Speculative tool results, see prefetch.py
+    prefer_templates: bool  # Templated replies even when RESPONSE_TEMPLATES is off (near token budget)
+    also: List[str]  # Further agents the supervisor routed a compound question to, see fan_out.py
+    branches: Annotated[list, fan_out.merge_branches]  # Answers of the parallel agent branches
+    deadline: float  # time.monotonic() by which the turn must finish, see turn_budget.py
 
 # --- SECURE TOOL NODE ---
 class SecureToolNode:
-    """ToolNode wrapper that passes authenticated_customer_id to tools via config."""
+    """
+    ToolNode wrapper that passes authenticated_customer_id to tools via config.
+    Tool calls matching a prefetched result are answered from state without re-querying.
+    During cassette replay, all tool calls are answered from the cassette.
+    """
     def __init__(self, tools):
         self.tool_node = ToolNode(tools)
 
@@ -45,12 +61,46 @@ class SecureToolNode:
             **config.get("configurable", {}),
             "authenticated_customer_id": state.get("authenticated_customer_id", "")
         }}
-        return self.tool_node.invoke(state, config)
+
+        last = state["messages"][-1]
+        tool_calls = getattr(last, "tool_calls", None) or []
+        replayed = cassette.replayed_tools(tool_calls)
+        if replayed is not None:
+            return {"messages": replayed}
+        hits, misses, consumed = take_prefetched(state, tool_calls)
+        if not hits:
+            return self._run(state, config, tool_calls)
+
+        tool_messages = dict(hits)
+        if misses:
+            # Run only the calls that were not prefetched
+            partial = AIMessage(content=last.content, tool_calls=misses, id=last.id)
+            result = self.tool_node.invoke({**state, "messages": [partial]}, config)
+            for m in result["messages"]:
+                tool_messages[m.tool_call_id] = m
+
+        update = {"messages": [tool_messages[tc["id"]] for tc in tool_calls if tc["id"] in tool_messages],
+                  "prefetched": consumed}
+        if any(tc["name"] in WRITE_TOOLS for tc in misses):
+            update["prefetched"] = None
+        return update
+
+    def _run(self, state, config, tool_calls):
+        result = self.tool_node.invoke(state, config)
+        if any(tc["name"] in WRITE_TOOLS for tc in tool_calls):
+            # A write makes prefetched reads stale
+            return {**result, "prefetched": None}
+        return result
 
 # --- SUPERVISOR NODE ---
+AgentName = Literal["customer_agent", "policy_agent", "claims_agent", "billing_agent", "faq_agent"]
+
 class RouterOutput(BaseModel):
     next: Literal["customer_agent", "policy_agent", "claims_agent", "billing_agent", "faq_agent", "FINISH"]
+    also: List[AgentName] = []  # Other agents a compound question needs; they run in parallel
 
+@metrics.timed(metrics.SUPERVISOR_SECONDS)
+@turn_budget.guarded("supervisor", next="FINISH")
 def supervisor_node(state: AgentState):
     messages = state["messages"]
 
@@ -81,50 +131,74 @@ def supervisor_node(state: AgentState):
     - If user asks "Do I owe anything?", route to 'billing_agent'.
     - If user asks "What is NCD?" or "Explain PayNow", route to 'faq_agent'.
 
+    COMPOUND QUESTIONS:
+    - If one message asks about topics of DIFFERENT agents (e.g. "Show my policies and anything I still owe"),
+      set 'next' to the agent for the first topic and list the other agents in 'also'
+      (e.g. next='policy_agent', also=['billing_agent']).
+    - Otherwise leave 'also' empty.
+
     FINISHING RULES:
     - ONLY return 'FINISH' if the user explicitly says "goodbye", "thanks", or "done".
     - If the user provides new information (like a date or description), route it to the relevant agent.
     - If an agent previously asked a question (e.g., "What is the date?"), DO NOT FINISH. Route back to that Agent.
     """
 
-    router = llm.with_structured_output(RouterOutput)
-    response = router.invoke([SystemMessage(content=system_prompt)] + messages)
-    print(f"   [Supervisor] Routing to: {response.next}")
-    return {"next": response.next}
+    response = llm_gateway.get("supervisor").invoke([SystemMessage(content=system_prompt)] + messages)
+    metrics.ROUTES.inc(route=response.next)
+    logger.info("supervisor routed", extra={"route": response.next, "also": response.also})
+    return {"next": response.next, "also": response.also}
 
 # --- AGENT NODES ---
+# Tool-bound runnables are built once here; see llm_gateway.py
+llm_gateway.register("supervisor", schema=RouterOutput)
+llm_gateway.register("customer_agent", tools=[lookup_customer])
+llm_gateway.register("policy_agent", tools=[get_customer_policies, get_policy_details, get_vehicle_details])
+llm_gateway.register("claims_agent", tools=[get_customer_claims, check_claim_status, file_new_claim])
+llm_gateway.register("billing_agent", tools=[get_billing_history])
+llm_gateway.register("faq_agent", tools=[search_faq])
+
+@metrics.timed(metrics.AGENT_SECONDS, agent="customer_agent")
+@turn_budget.guarded("customer_agent")
 def customer_agent_node(state: AgentState):
-    print("   [Customer Agent] Thinking...")
-    agent = llm.bind_tools([lookup_customer])
+    logger.debug("agent thinking", extra={"agent": "customer_agent"})
+    agent = llm_gateway.get("customer_agent")
     res = agent.invoke(state["messages"])
     return {"messages": [res]}
 
+@metrics.timed(metrics.AGENT_SECONDS, agent="policy_agent")
+@turn_budget.guarded("policy_agent")
 def policy_agent_node(state: AgentState):
-    print("   [Policy Agent] Thinking...")
-    agent = llm.bind_tools([get_customer_policies, get_policy_details, get_vehicle_details])
+    logger.debug("agent thinking", extra={"agent": "policy_agent"})
+    agent = llm_gateway.get("policy_agent")
     res = agent.invoke(state["messages"])
     return {"messages": [res]}
 
+@metrics.timed(metrics.AGENT_SECONDS, agent="claims_agent")
+@turn_budget.guarded("claims_agent")
 def claims_agent_node(state: AgentState):
-    print("   [Claims Agent] Thinking...")
-    agent = llm.bind_tools([get_customer_claims, check_claim_status, file_new_claim])
+    logger.debug("agent thinking", extra={"agent": "claims_agent"})
+    agent = llm_gateway.get("claims_agent")
     res = agent.invoke(state["messages"])
     return {"messages": [res]}
 
+@metrics.timed(metrics.AGENT_SECONDS, agent="billing_agent")
+@turn_budget.guarded("billing_agent")
 def billing_agent_node(state: AgentState):
-    print("   [Billing Agent] Thinking...")
+    logger.debug("agent thinking", extra={"agent": "billing_agent"})
     instructions = """
     You are the Billing Agent.
     1. Use 'get_billing_history' to see status.
     2. If user sees an UNPAID bill and wants to pay, say: "I will connect you to a secure human agent for payment."
     """
-    agent = llm.bind_tools([get_billing_history])
+    agent = llm_gateway.get("billing_agent")
     res = agent.invoke([SystemMessage(content=instructions)] + state["messages"])
     return {"messages": [res]}
 
+@metrics.timed(metrics.AGENT_SECONDS, agent="faq_agent")
+@turn_budget.guarded("faq_agent")
 def faq_agent_node(state: AgentState):
-    print("   [FAQ Agent] Thinking...")
-    agent = llm.bind_tools([search_faq])
+    logger.debug("agent thinking", extra={"agent": "faq_agent"})
+    agent = llm_gateway.get("faq_agent")
     res = agent.invoke(state["messages"])
     return {"messages": [res]}
 
@@ -138,32 +212,70 @@ workflow.add_node("policy_agent", policy_agent_node)
 workflow.add_node("claims_agent", claims_agent_node)
 workflow.add_node("billing_agent", billing_agent_node)
 workflow.add_node("faq_agent", faq_agent_node)
+workflow.add_node("prefetch", prefetch_node)
+workflow.add_node("templated_reply", templated_reply_node)
+workflow.add_node("budget_fallback", turn_budget.budget_fallback_node)
 
 # Tool Nodes
-workflow.add_node("customer_tools", ToolNode([lookup_customer]))
-workflow.add_node("policy_tools", SecureToolNode([get_customer_policies, get_policy_details, get_vehicle_details]))
-workflow.add_node("claims_tools", SecureToolNode([get_customer_claims, check_claim_status, file_new_claim]))
-workflow.add_node("billing_tools", SecureToolNode([get_billing_history]))
-workflow.add_node("faq_tools", ToolNode([search_faq]))
+TOOL_NODES = {
+    "customer_agent": SecureToolNode([lookup_customer]),
+    "policy_agent": SecureToolNode([get_customer_policies, get_policy_details, get_vehicle_details]),
+    "claims_agent": SecureToolNode([get_customer_claims, check_claim_status, file_new_claim]),
+    "billing_agent": SecureToolNode([get_billing_history]),
+    "faq_agent": FaqToolNode([search_faq]),
+}
+workflow.add_node("customer_tools", TOOL_NODES["customer_agent"])
+workflow.add_node("policy_tools", TOOL_NODES["policy_agent"])
+workflow.add_node("claims_tools", TOOL_NODES["claims_agent"])
+workflow.add_node("billing_tools", TOOL_NODES["billing_agent"])
+workflow.add_node("faq_tools", TOOL_NODES["faq_agent"])
+
+# Compound questions: one branch per agent, then a single merged reply (see fan_out.py)
+AGENT_NODES = {
+    "customer_agent": customer_agent_node,
+    "policy_agent": policy_agent_node,
+    "claims_agent": claims_agent_node,
+    "billing_agent": billing_agent_node,
+    "faq_agent": faq_agent_node,
+}
+workflow.add_node("agent_branch", fan_out.make_branch_node(AGENT_NODES, TOOL_NODES))
+workflow.add_node("merge_answers", fan_out.merge_answers_node)
 
 # Edges
 workflow.add_edge(START, "supervisor")
 
+def route_from_supervisor(state):
+    agents = fan_out.branch_agents(state)
+    if agents:
+        return fan_out.sends(state, agents)
+    # Agents with a prefetch policy get a parallel branch that runs their first tool
+    if needs_prefetch(state["next"]):
+        return [state["next"], "prefetch"]
+    return state["next"]
+
 workflow.add_conditional_edges(
     "supervisor",
-    lambda x: x["next"],
+    route_from_supervisor,
     {
         "customer_agent": "customer_agent",
         "policy_agent": "policy_agent",
         "claims_agent": "claims_agent",
         "billing_agent": "billing_agent",
         "faq_agent": "faq_agent",
+        "prefetch": "prefetch",
+        "agent_branch": "agent_branch",
         "FINISH": END
     }
 )
+workflow.add_edge("prefetch", END)
+workflow.add_edge("agent_branch", "merge_answers")
+workflow.add_edge("merge_answers", END)
 
 def basic_logic(state, tool_node):
     if getattr(state["messages"][-1], "tool_calls", None):
+        # Out of time or tool rounds: answer from what the turn has so far
+        if turn_budget.exhausted(state):
+            return "budget_fallback"
         return tool_node
     return END
 
@@ -171,15 +283,19 @@ workflow.add_conditional_edges("customer_agent", lambda x: basic_logic(x, "custo
 workflow.add_edge("customer_tools", "customer_agent")
 
 workflow.add_conditional_edges("policy_agent", lambda x: basic_logic(x, "policy_tools"))
-workflow.add_edge("policy_tools", "policy_agent")
+workflow.add_conditional_edges("policy_tools", lambda x: after_tools(x, "policy_agent"), ["policy_agent", "templated_reply"])
 
 workflow.add_conditional_edges("claims_agent", lambda x: basic_logic(x, "claims_tools"))
-workflow.add_edge("claims_tools", "claims_agent")
+workflow.add_conditional_edges("claims_tools", lambda x: after_tools(x, "claims_agent"), ["claims_agent", "templated_reply"])
 
 workflow.add_conditional_edges("billing_agent", lambda x: basic_logic(x, "billing_tools"))
-workflow.add_edge("billing_tools", "billing_agent")
+workflow.add_conditional_edges("billing_tools", lambda x: after_tools(x, "billing_agent"), ["billing_agent", "templated_reply"])
 
 workflow.add_conditional_edges("faq_agent", lambda x: basic_logic(x, "faq_tools"))
 workflow.add_edge("faq_tools", "faq_agent")
 
-graph = workflow.compile()
+workflow.add_edge("templated_reply", END)
+workflow.add_edge("budget_fallback", END)
+
+# Tool latency and errors are recorded by a callback on every run
+graph = workflow.compile().with_config({"callbacks": [metrics.ToolMetricsHandler()]})
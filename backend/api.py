@@ -6,7 +6,10 @@ Replicates the flow from the Streamlit app_ui.py.
 import os
 import sys
 import uuid
+import logging
 import sqlite3
+import threading
+from contextlib import asynccontextmanager
 
 # Ensure backend directory is on path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -14,20 +17,62 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 from dotenv import load_dotenv
 load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".env"))
 
-from fastapi import FastAPI, HTTPException
+import anyio
+from fastapi import FastAPI, File, Header, HTTPException, UploadFile
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Optional
 
 from langchain_core.messages import HumanMessage, AIMessage
+from langgraph.errors import GraphRecursionError
 from agent_supervisor import graph
-from guardrails import validate_input
+from guardrails import quick_check, validate_input
 from report import generate_report
+from prefetch import get_prefetch_stats
+import llm_gateway
+import metrics
+import tracing
+import usage_ledger
+import cassette
+import profiling
+import turn_budget
+import admission
+import session_gate
+import session_memory
+import claim_intake
+from logging_config import configure_logging
+import response_cache
+from vectordb import vector_db
 
 # --- CONFIG ---
 DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "db", "insurance_support.db")
 
-app = FastAPI(title="InsureAI API", version="1.0.0")
+FAQ_WARMUP = os.getenv("FAQ_WARMUP", "1").lower() in ("1", "true", "yes")
+
+BUDGET_EXCEEDED_MESSAGE = (
+    "You've reached the usage limit for this session. Please try again later, "
+    "or contact our support hotline for urgent help."
+)
+
+configure_logging()
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm the FAQ vector store in the background; /api/health/ready reports 503 until done
+    if FAQ_WARMUP:
+        threading.Thread(target=vector_db.warm_up, name="faq-warmup", daemon=True).start()
+    # Sync endpoints run in anyio's default threadpool; size it above the admission limits
+    # (admission.py). This limiter is process-wide: to_thread calls without their own limiter share it.
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    limiter.total_tokens = max(limiter.total_tokens, admission.THREADPOOL_SIZE)
+    yield
+    await llm_gateway.aclose()
+
+
+app = FastAPI(title="InsureAI API", version="1.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -37,8 +82,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(admission.Overloaded)
+async def overloaded(request, exc: admission.Overloaded):
+    """Fast rejection under overload: 429 with the estimated wait (admission.py)."""
+    return JSONResponse(
+        status_code=429,
+        headers={"Retry-After": str(exc.retry_after)},
+        content={"detail": "The assistant is busy. Please try again shortly.", "reason": exc.reason,
+                 "retry_after": exc.retry_after},
+    )
+
+
 # --- SERVER-SIDE SESSION STORE ---
 sessions: dict = {}
+metrics.gauge("insure_active_sessions", "Logged-in sessions held in memory.", fn=lambda: len(sessions))
 
 # --- AGENT MAP (mirrors app_ui.py lines 197-205) ---
 AGENT_MAP = {
@@ -81,7 +138,23 @@ def get_users():
             for r in rows
         ]
     except Exception as e:
-        print(f"DB Read Error: {e}")
+        logger.error("DB read error listing users", extra={"error": str(e)})
+        return []
+
+
+def get_customer_policy_types(customer_id: str) -> list:
+    """Distinct policy types held by the customer (e.g. ["Health", "Motor"])."""
+    if not os.path.exists(DB_PATH):
+        return []
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        rows = conn.execute(
+            "SELECT DISTINCT policy_type FROM policies WHERE customer_id = ? ORDER BY policy_type",
+            (customer_id,),
+        ).fetchall()
+        conn.close()
+        return [r[0] for r in rows]
+    except Exception:
         return []
 
 
@@ -100,6 +173,17 @@ def get_customer_id_by_email(email: str) -> str:
 
 def detect_agent(response_messages) -> tuple:
     """Search backwards for last tool call to identify the agent. Returns (agent_name, tool_calls)."""
+    last = response_messages[-1] if response_messages else None
+    if isinstance(last, AIMessage) and last.response_metadata.get("fan_out"):
+        # Merged answer of parallel agents: every tool call since the question, first agent's name
+        turn = []
+        for m in reversed(response_messages[:-1]):
+            if isinstance(m, HumanMessage):
+                break
+            turn.insert(0, m)
+        calls = [tc for m in turn if isinstance(m, AIMessage) for tc in m.tool_calls]
+        if calls:
+            return AGENT_MAP.get(calls[0]["name"], "General"), [{"name": tc["name"], "args": tc["args"]} for tc in calls]
     recent = response_messages[-6:]
     for m in reversed(recent):
         if isinstance(m, AIMessage) and hasattr(m, "tool_calls") and m.tool_calls:
@@ -117,6 +201,7 @@ class LoginRequest(BaseModel):
 class ChatRequest(BaseModel):
     session_id: str
     message: str
+    idempotency_key: Optional[str] = None  # Retries with the same key share one turn (session_gate.py)
 
 class ReportRequest(BaseModel):
     session_id: str
@@ -127,6 +212,10 @@ class ChatResponse(BaseModel):
     tool_calls: list = []
     blocked: bool = False
     block_message: Optional[str] = None
+    cached: bool = False
+    budget_exceeded: bool = False  # Token budget reached; the LLM was not called (usage_ledger.py)
+    trace: Optional[dict] = None  # Spans for this request (tracing.py); None when TRACING=0
+    coalesced: bool = False  # Answered from a duplicate submission's turn (session_gate.py)
 
 
 # --- ENDPOINTS ---
@@ -153,22 +242,33 @@ def login(req: LoginRequest):
     user_info = next((u for u in users if u["email"] == email), None)
     display_name = user_info["displayName"] if user_info else "User"
     policy_type = user_info["policyType"] if user_info else ""
+    policy_types = get_customer_policy_types(customer_id)
 
     # Silent login: inject "Who am I?" message (mirrors lines 116-124)
-    init_msg = HumanMessage(content=f"I am {email}. Who am I?")
-    response = graph.invoke({
-        "messages": [init_msg],
-        "authenticated_customer_id": customer_id
-    })
-
-    # Create session
     session_id = str(uuid.uuid4())
+    init_msg = HumanMessage(content=f"I am {email}. Who am I?")
+    with admission.admit("login", email), \
+            usage_ledger.attribute("login", session_id, customer_id), \
+            cassette.recording("login", session_id, customer_id, init_msg.content, policy_types=policy_types) as recorder:
+        deadline = turn_budget.new_deadline()
+        response = graph.invoke({
+            "messages": [init_msg],
+            "authenticated_customer_id": customer_id,
+            "policy_types": policy_types,
+            "deadline": deadline,
+        }, turn_budget.config(deadline))
+        if recorder:
+            recorder.finish(response["messages"], response["messages"][-1].content)
+
+    # Create session; its history is kept compact between turns (session_memory.py)
+    session_memory.store(session_id, response["messages"])
     sessions[session_id] = {
-        "messages": response["messages"],
         "authenticated_customer_id": customer_id,
         "email": email,
         "display_name": display_name,
         "policy_type": policy_type,
+        "policy_types": policy_types,
+        "gate": session_gate.SessionGate(),
     }
 
     return {
@@ -181,21 +281,116 @@ def login(req: LoginRequest):
 
 
 @app.post("/api/chat", response_model=ChatResponse)
-def chat(req: ChatRequest):
+def chat(req: ChatRequest, x_profile: Optional[str] = Header(None), x_profile_token: Optional[str] = Header(None),
+         idempotency_key: Optional[str] = Header(None)):
     """
     Send a message. Runs guardrails then graph.invoke().
     Mirrors app_ui.py lines 154-213.
+    X-Profile: 1 with the admin X-Profile-Token samples the request (profiling.py).
+    Turns of one session run one at a time; duplicate submissions (same idempotency key,
+    or without one the same message while it is still running) get the first one's reply
+    (session_gate.py). An idempotency key reused for a different message is rejected (422).
     """
     session = sessions.get(req.session_id)
     if not session:
         raise HTTPException(status_code=401, detail="Invalid session. Please log in again.")
 
+    key = req.idempotency_key or idempotency_key
+    profile = profiling.requested(x_profile, x_profile_token)
+
+    def turn() -> ChatResponse:
+        with session["gate"].turn("chat"), session_memory.checkout(req.session_id, session), \
+                profiling.profile("chat", profile):
+            return _profiled_chat(req, session)
+
+    try:
+        result, coalesced = session["gate"].run("chat", session_gate.request_key(req.message, key), turn,
+                                                remember=_replayable if key is not None else None,
+                                                digest=session_gate.message_digest(req.message))
+    except session_gate.KeyReused:
+        raise HTTPException(status_code=422, detail="Idempotency key was already used for a different message.")
+    return result.model_copy(update={"coalesced": True}) if coalesced else result
+
+
+def _replayable(result: ChatResponse) -> bool:
+    """
+    Replies replayed to a retry with the same idempotency key. Not errors ("System error",
+    blocked), budget refusals or turn-limit fallbacks: a retry after those should run again.
+    """
+    message = result.ai_message
+    return not (result.blocked or result.budget_exceeded or message == turn_budget.FALLBACK_MESSAGE
+                or message.startswith(turn_budget.PARTIAL_PREFIX))
+
+
+def _profiled_chat(req: ChatRequest, session: dict) -> ChatResponse:
+    customer_id = session["authenticated_customer_id"]
+    history_len = len(session["messages"])
+    with tracing.start("chat") as trace, \
+            usage_ledger.attribute("chat", req.session_id, customer_id), \
+            cassette.recording("chat", req.session_id, customer_id, req.message,
+                               policy_types=session.get("policy_types", [])) as recorder:
+        result = _chat_turn(req, session)
+        if recorder:
+            recorder.finish(session["messages"][history_len:], result.ai_message, agent_name=result.agent_name,
+                            blocked=result.blocked, cached=result.cached, budget_exceeded=result.budget_exceeded)
+        if trace:
+            trace.attributes.update(agent_name=result.agent_name, blocked=result.blocked, cached=result.cached)
+            result.trace = trace.finish()
+            tracing.save(result.trace)
+    return result
+
+
+def _chat_turn(req: ChatRequest, session: dict) -> ChatResponse:
+    # Regex guardrail first: a blocked message is never answered from the cache
+    blocked = quick_check(req.message)
+
+    # Cached answer for a repeated read-only question: skip the LLM guardrail and graph.
+    # Only self-contained questions are looked up or stored, so only they need the data-version stamp.
+    customer_id = session["authenticated_customer_id"]
+    cacheable = (response_cache.ENABLED and blocked is None
+                 and response_cache.is_cacheable_question(req.message, session["messages"]))
+    data_version = response_cache.data_version(customer_id) if cacheable else None
+    hit = response_cache.lookup(customer_id, req.message, data_version) if cacheable else None
+    if cacheable:
+        metrics.CACHE_LOOKUPS.inc(cache="response", result="hit" if hit else "miss")
+        tracing.event("response_cache", "cache", cache_hit=bool(hit))
+    if hit:
+        session["messages"].append(HumanMessage(content=req.message))
+        session["messages"].append(AIMessage(content=hit["answer"]))
+        return ChatResponse(
+            ai_message=hit["answer"],
+            agent_name=hit["agent_name"],
+            tool_calls=hit["tool_calls"],
+            cached=True,
+        )
+
+    # Token budget: templated replies when close, no LLM call at all once reached
+    budget = usage_ledger.current_budget_status()
+    if budget == usage_ledger.BUDGET_EXCEEDED:
+        session["messages"].append(HumanMessage(content=req.message))
+        session["messages"].append(AIMessage(content=BUDGET_EXCEEDED_MESSAGE))
+        return ChatResponse(ai_message=BUDGET_EXCEEDED_MESSAGE, budget_exceeded=True)
+    cassette.note_state(prefer_templates=budget == usage_ledger.BUDGET_SOFT)
+
+    # Regex guardrail blocks need no LLM either: priority lane, no admission queue
+    with admission.admit("chat", req.session_id, priority=blocked is not None):
+        return _agent_turn(req, session, blocked, budget, data_version)
+
+
+def _agent_turn(req: ChatRequest, session: dict, blocked: Optional[dict], budget: str,
+                data_version: Optional[str]) -> ChatResponse:
+    # The turn's time budget starts before the guardrail; the graph gets what is left
+    deadline = turn_budget.new_deadline()
+    customer_id = session["authenticated_customer_id"]
+
     # A. Guardrail check (mirrors lines 163-171)
-    validation = validate_input(
-        req.message,
-        session["email"],
-        session.get("messages", [])
-    )
+    with tracing.span("guardrail", "guardrail"):
+        validation = blocked or validate_input(
+            req.message,
+            session["email"],
+            session.get("messages", []),
+            checked=True,
+        )
 
     if not validation["valid"]:
         # Save rejection to history
@@ -210,12 +405,16 @@ def chat(req: ChatRequest):
 
     # B. Agent execution (mirrors lines 173-213)
     session["messages"].append(HumanMessage(content=req.message))
+    turn_start = len(session["messages"])
 
     try:
         response = graph.invoke({
             "messages": session["messages"],
-            "authenticated_customer_id": session["authenticated_customer_id"]
-        })
+            "authenticated_customer_id": session["authenticated_customer_id"],
+            "policy_types": session.get("policy_types", []),
+            "prefer_templates": budget == usage_ledger.BUDGET_SOFT,
+            "deadline": deadline,
+        }, {**turn_budget.config(deadline), "callbacks": tracing.callbacks() + profiling.callbacks()})
 
         ai_msg = response["messages"][-1]
         session["messages"] = response["messages"]
@@ -223,13 +422,25 @@ def chat(req: ChatRequest):
         # Detect agent (mirrors lines 186-209)
         agent_name, tool_calls = detect_agent(response["messages"])
 
+        response_cache.store(
+            customer_id, req.message, data_version, response["messages"][turn_start:],
+            ai_msg.content, agent_name, tool_calls,
+        )
+
         return ChatResponse(
             ai_message=ai_msg.content,
             agent_name=agent_name,
             tool_calls=tool_calls,
         )
 
+    except GraphRecursionError:
+        # Backstop for loops the tool-round budget did not catch
+        turn_budget.record(turn_budget.RECURSION, "graph")
+        session["messages"].append(AIMessage(content=turn_budget.FALLBACK_MESSAGE))
+        return ChatResponse(ai_message=turn_budget.FALLBACK_MESSAGE)
+
     except Exception as e:
+        logger.exception("chat turn failed", extra={"session_id": req.session_id})
         return ChatResponse(
             ai_message=f"System error: {str(e)}",
             blocked=True,
@@ -246,18 +457,29 @@ def clear_history(session_id: str):
 
         # Re-run silent login
         init_msg = HumanMessage(content=f"I am {email}. Who am I?")
-        response = graph.invoke({
-            "messages": [init_msg],
-            "authenticated_customer_id": customer_id
-        })
-        sessions[session_id]["messages"] = response["messages"]
+        policy_types = sessions[session_id].get("policy_types", [])
+        with sessions[session_id]["gate"].turn("clear_history"), \
+                admission.admit("clear_history", session_id), \
+                usage_ledger.attribute("clear_history", session_id, customer_id), \
+                cassette.recording("clear_history", session_id, customer_id, init_msg.content,
+                                   policy_types=policy_types) as recorder:
+            deadline = turn_budget.new_deadline()
+            response = graph.invoke({
+                "messages": [init_msg],
+                "authenticated_customer_id": customer_id,
+                "policy_types": policy_types,
+                "deadline": deadline,
+            }, turn_budget.config(deadline))
+            if recorder:
+                recorder.finish(response["messages"], response["messages"][-1].content)
+            session_memory.store(session_id, response["messages"])
 
         return {"status": "cleared"}
     raise HTTPException(status_code=404, detail="Session not found")
 
 
 @app.post("/api/report")
-def get_report(req: ReportRequest):
+def get_report(req: ReportRequest, x_profile: Optional[str] = Header(None), x_profile_token: Optional[str] = Header(None)):
     """Generate executive summary report for the authenticated customer."""
     session = sessions.get(req.session_id)
     if not session:
@@ -265,12 +487,89 @@ def get_report(req: ReportRequest):
 
     customer_id = session["authenticated_customer_id"]
     try:
-        report = generate_report(customer_id)
+        with admission.admit("report", req.session_id), \
+                usage_ledger.attribute("report", req.session_id, customer_id), \
+                profiling.profile("report", profiling.requested(x_profile, x_profile_token)):
+            report = generate_report(customer_id)
         return report
+    except admission.Overloaded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Report generation failed: {str(e)}")
 
 
+@app.post("/api/claims/bulk")
+def bulk_claims(file: UploadFile = File(...), x_intake_token: Optional[str] = Header(None)):
+    """
+    Bulk claim intake from a CSV or JSONL upload (claim_intake.py), for back-office staff
+    and partner garages. Streams one NDJSON result line per row, then a summary line.
+    """
+    if not claim_intake.authorized(x_intake_token):
+        raise HTTPException(status_code=403, detail="Bulk intake requires a valid X-Intake-Token.")
+    try:
+        rows = claim_intake.read_rows(file.file, claim_intake.detect_format(file.filename, file.content_type))
+    except claim_intake.IntakeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(claim_intake.ndjson(rows), media_type="application/x-ndjson")
+
+
+@app.get("/api/stats/prefetch")
+def prefetch_stats():
+    """Per-agent speculative prefetch counts and hit rates."""
+    return {"prefetch": get_prefetch_stats()}
+
+
+@app.get("/api/stats/admission")
+def admission_stats():
+    """Admission control: running and queued LLM-bound requests and limits."""
+    return {"admission": admission.get_admission_stats()}
+
+
+@app.get("/api/stats/sessions")
+def session_stats(session_id: Optional[str] = None):
+    """Session history memory: sessions in memory and spilled, bytes against the ceiling (and one session's bytes)."""
+    return {"sessions": session_memory.get_session_memory_stats(session_id)}
+
+
+@app.get("/api/stats/llm")
+def llm_stats():
+    """LLM gateway call counts, in-flight calls and 429 retries."""
+    return {"llm": llm_gateway.get_llm_stats()}
+
+
+@app.get("/api/usage")
+def usage(session_id: str):
+    """Token usage and cost for a session and its customer today, by endpoint and node, with budget status."""
+    session = sessions.get(session_id)
+    if not session:
+        raise HTTPException(status_code=401, detail="Invalid session. Please log in again.")
+    return {"usage": usage_ledger.usage_summary(session_id, session["authenticated_customer_id"])}
+
+
+@app.get("/api/metrics")
+def prometheus_metrics():
+    """Latency histograms, counters and gauges in Prometheus text format."""
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
 @app.get("/api/health")
 def health():
-    return {"status": "ok", "db_exists": os.path.exists(DB_PATH)}
+    return {"status": "ok", "db_exists": os.path.exists(DB_PATH), "ready": vector_db.warmup_finished() or not FAQ_WARMUP}
+
+
+@app.get("/api/health/live")
+def health_live():
+    """Liveness: the process is up and serving HTTP."""
+    return {"status": "ok"}
+
+
+@app.get("/api/health/ready")
+def health_ready():
+    """Readiness: 503 until the FAQ vector store warm-up has finished."""
+    warmup = vector_db.warmup_status()
+    if FAQ_WARMUP and not warmup["finished"]:
+        return JSONResponse(status_code=503, content={"status": "warming_up", "warmup": warmup})
+    if not os.path.exists(DB_PATH):
+        return JSONResponse(status_code=503, content={"status": "db_missing", "warmup": warmup})
+    status = "ready" if warmup["ready"] or not FAQ_WARMUP else "degraded"
+    return {"status": status, "warmup": warmup}
@@ -0,0 +1,199 @@
+"""
+benchmarks/claim_intake_bench.py
+Bulk claim intake (claim_intake.py) throughput and memory at growing upload sizes.
+
+For each --rows size a CSV upload is generated on disk: mostly valid claims against
+real policies, plus a share of exact re-sends (duplicates) and rows for a policy of
+another customer (rejected). Each size is ingested in a fresh subprocess from the file
+on disk, as the endpoint does from its spooled upload; peak RSS growth should stay flat
+as the row count grows. Use --http to send the largest file through POST /api/claims/bulk
+on a local uvicorn server instead, reading the NDJSON result stream as it arrives.
+
+--concurrent N sends N copies of a smaller upload (--concurrent-rows, several chunks
+each) to the server at once. The streams are read on the server's threadpool, one chunk
+per worker thread, so this checks that no connection or cursor is shared across threads:
+every stream must end with its summary, and across all of them each claim is created
+once (the other copies are duplicates).
+
+Usage:
+    cd backend
+    python -m benchmarks.claim_intake_bench --rows 10000 100000
+    python -m benchmarks.claim_intake_bench --rows 10000 --concurrent 8
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def write_upload(db_path: str, rows: int, path: str, seed: int = 11) -> dict:
+    rng = random.Random(seed)
+    conn = sqlite3.connect(db_path)
+    owners = conn.execute("SELECT policy_number, customer_id FROM policies").fetchall()
+    conn.close()
+    expected = {"created": 0, "duplicate": 0, "rejected": 0}
+    previous = None
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["customer_id", "policy_number", "claim_date", "claim_amount", "description", "reference"])
+        for i in range(rows):
+            roll = rng.random()
+            if roll < 0.05 and previous:
+                writer.writerow(previous)  # re-sent valid row
+                expected["duplicate"] += 1
+                continue
+            policy, customer = owners[rng.randrange(len(owners))]
+            row = [customer, policy, f"2025-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}",
+                   f"{rng.uniform(100, 9000):.2f}", f"Garage intake {i}", ""]
+            if roll < 0.10:
+                row[0] = "CUST-NOT-OWNER"
+                expected["rejected"] += 1
+            else:
+                expected["created"] += 1
+                previous = row
+            writer.writerow(row)
+    return expected
+
+
+def child(db_path: str, upload: str):
+    from benchmarks.common import DB_MODULES
+    for name in DB_MODULES:
+        __import__(name).DB_PATH = db_path
+    import claim_intake
+    import claim_writer  # noqa: F401
+    base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    counts = {}
+    start = time.perf_counter()
+    with open(upload, "rb") as f:
+        for result in claim_intake.ingest(claim_intake.read_rows(f, claim_intake.CSV)):
+            if "summary" in result:
+                counts = result["summary"]
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"seconds": elapsed, "peak_growth_kb": peak - base, **counts}))
+
+
+def run_child(db_path: str, upload: str) -> dict:
+    out = subprocess.run([sys.executable, "-m", "benchmarks.claim_intake_bench", "--child", upload, "--db", db_path],
+                         cwd=BACKEND_DIR, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+PORT = 8749
+
+
+def serve(db_path: str, port: int = PORT):
+    """Runs the API on a local uvicorn server (once per process), against db_path."""
+    os.environ.setdefault("FAQ_WARMUP", "0")
+    import uvicorn
+    import api
+    import claim_intake
+    api.DB_PATH = db_path
+    claim_intake.INTAKE_TOKEN = "bench-intake"
+    threading.Thread(target=lambda: uvicorn.run(api.app, port=port, log_level="warning"), daemon=True).start()
+    time.sleep(2)
+
+
+def run_http(upload: str, port: int = PORT) -> dict:
+    import httpx
+    summary, lines = {}, 0
+    start = time.perf_counter()
+    with open(upload, "rb") as f, httpx.stream(
+            "POST", f"http://127.0.0.1:{port}/api/claims/bulk", headers={"X-Intake-Token": "bench-intake"},
+            files={"file": (os.path.basename(upload), f, "text/csv")}, timeout=600) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            lines += 1
+            result = json.loads(line)
+            summary = result.get("summary", summary)
+    return {"seconds": time.perf_counter() - start, "lines": lines, **summary}
+
+
+def run_concurrent(upload: str, uploads: int, port: int = PORT) -> dict:
+    """Sends `uploads` copies of the file at once; failed = errors or streams without a summary."""
+    results, errors = [], []
+
+    def send():
+        try:
+            r = run_http(upload, port)
+            (results if "rows" in r else errors).append(r if "rows" in r else "stream ended without a summary")
+        except Exception as e:
+            errors.append(repr(e))
+
+    threads = [threading.Thread(target=send) for _ in range(uploads)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    totals = {k: sum(r[k] for r in results) for k in ("created", "duplicate", "rejected", "failed")}
+    return {"seconds": time.perf_counter() - start, "ok": len(results), "errors": errors, **totals}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--http", action="store_true", help="Also send the largest upload through the API")
+    parser.add_argument("--concurrent", type=int, default=0, help="Also send this many uploads through the API at once")
+    parser.add_argument("--concurrent-rows", type=int, default=2000)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--db", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.db, args.child)
+        return
+
+    from benchmarks.common import generated_db
+    workdir = tempfile.mkdtemp(prefix="insure-intake-")
+    print(f"\n{'rows':>8} {'MB':>6} {'seconds':>8} {'rows/s':>8} {'peak RSS +MB':>13} {'created':>8} {'dup':>6} "
+          f"{'rejected':>9} {'matches':>8}")
+    for rows in args.rows:
+        db_path = generated_db()
+        upload = os.path.join(workdir, f"claims_{rows}.csv")
+        expected = write_upload(db_path, rows, upload)
+        r = run_child(db_path, upload)
+        ok = all(r[k] == v for k, v in expected.items())
+        print(f"{rows:>8} {os.path.getsize(upload) / 2**20:>6.1f} {r['seconds']:>8.1f} {rows / r['seconds']:>8.0f} "
+              f"{r['peak_growth_kb'] / 1024:>13.1f} {r['created']:>8} {r['duplicate']:>6} {r['rejected']:>9} {str(ok):>8}")
+
+    if not (args.http or args.concurrent):
+        return
+    db_path = generated_db()
+    serve(db_path)
+    if args.http:
+        rows = max(args.rows)
+        upload = os.path.join(workdir, f"claims_http_{rows}.csv")
+        write_upload(db_path, rows, upload)
+        r = run_http(upload)
+        print(f"\nHTTP {rows} rows: {r['seconds']:.1f} s ({rows / r['seconds']:.0f} rows/s), {r['lines']} result lines, "
+              f"created {r['created']}, duplicate {r['duplicate']}, rejected {r['rejected']}")
+    if args.concurrent:
+        rows, n = args.concurrent_rows, args.concurrent
+        upload = os.path.join(workdir, f"claims_concurrent_{rows}.csv")
+        expected = write_upload(db_path, rows, upload, seed=29)
+        r = run_concurrent(upload, n)
+        # Each claim is created by exactly one of the copies; the rest see it as a duplicate
+        ok = (not r["errors"] and not r["failed"] and r["created"] == expected["created"]
+              and r["rejected"] == n * expected["rejected"])
+        print(f"\nHTTP {n} concurrent uploads of {rows} rows: {r['seconds']:.1f} s, {r['ok']}/{n} completed, "
+              f"created {r['created']} (expected {expected['created']}), duplicate {r['duplicate']}, "
+              f"rejected {r['rejected']}, failed rows {r['failed']}, matches {ok}")
+        for error in r["errors"]:
+            print(f"  upload failed: {error}")
+        if not ok:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
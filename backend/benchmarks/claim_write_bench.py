@@ -0,0 +1,130 @@
+"""
+benchmarks/claim_write_bench.py
+Concurrent claim-filing throughput: the old per-call write path vs claim_writer.py.
+
+--threads callers each file --filings claims against their own customers' policies;
+a --retry fraction of filings is sent a second time, as a retried tool call would be.
+- direct: what file_new_claim did before, with the schema's column names: its own
+  connection per filing (rollback journal), a CLM#### random id, one commit each
+- writer: claim_writer.file_claim (single writer, WAL, sequential ids, idempotency keys,
+  batched commits)
+Each mode runs on a freshly generated database.
+
+Usage:
+    cd backend
+    python -m benchmarks.claim_write_bench --threads 16 --filings 50
+"""
+import argparse
+import random
+import sqlite3
+import threading
+import time
+
+from benchmarks.common import generated_db, percentile
+
+import claim_writer
+
+
+def policies(db_path: str, n: int) -> list:
+    conn = sqlite3.connect(db_path)
+    try:
+        return [r[0] for r in conn.execute("SELECT policy_number FROM policies ORDER BY policy_number LIMIT ?", (n,))]
+    finally:
+        conn.close()
+
+
+def workload(policy_numbers: list, threads: int, filings: int, retry: float, seed: int = 7) -> list:
+    """Per thread: [(policy, date, amount, description)], retried filings repeated."""
+    rng = random.Random(seed)
+    work = []
+    for t in range(threads):
+        calls = []
+        for i in range(filings):
+            filing = (policy_numbers[(t * filings + i) % len(policy_numbers)], "2025-06-01",
+                      round(rng.uniform(200, 5000), 2), f"Bench incident {t}-{i}")
+            calls.append(filing)
+            if rng.random() < retry:
+                calls.append(filing)
+        work.append(calls)
+    return work
+
+
+def file_direct(db_path: str, filing: tuple) -> dict:
+    conn = sqlite3.connect(db_path)
+    try:
+        new_id = f"CLM{random.randint(1000, 9999)}"
+        conn.execute(
+            """INSERT INTO claims (claim_id, policy_number, claim_date, claim_amount, status, description)
+               VALUES (?, ?, ?, ?, 'Pending', ?)""",
+            (new_id, filing[0], filing[1], filing[2], filing[3]),
+        )
+        conn.commit()
+        return {"status": "success", "claim_id": new_id}
+    except Exception as e:
+        return {"status": "error", "msg": str(e)}
+    finally:
+        conn.close()
+
+
+def file_writer(db_path: str, filing: tuple) -> dict:
+    key = claim_writer.idempotency_key("bench", *filing[:2], filing[3], f"{filing[2]:.2f}")
+    return claim_writer.file_claim(filing[0], filing[1], filing[2], filing[3], key)
+
+
+def run(mode: str, threads: int, filings: int, retry: float) -> dict:
+    db_path = generated_db()
+    work = workload(policies(db_path, 1500), threads, filings, retry)
+    file_one = file_direct if mode == "direct" else file_writer
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def caller(calls):
+        for filing in calls:
+            start = time.perf_counter()
+            result = file_one(db_path, filing)
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                if result["status"] != "success":
+                    errors.append(result["msg"])
+
+    workers = [threading.Thread(target=caller, args=(calls,)) for calls in work]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    wall = time.perf_counter() - start
+
+    conn = sqlite3.connect(db_path)
+    rows, distinct = conn.execute(
+        "SELECT COUNT(*), COUNT(DISTINCT description) FROM claims WHERE description LIKE 'Bench incident%'"
+    ).fetchone()
+    conn.close()
+    return {"calls": len(latencies), "per_s": len(latencies) / wall, "p50_ms": percentile(latencies, 50) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000, "locked": sum("locked" in e for e in errors),
+            "collisions": sum("UNIQUE" in e for e in errors), "other_errors": len(errors), "rows": rows,
+            "duplicates": rows - distinct, "expected": sum(len(set(c)) for c in work)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--filings", type=int, default=50, help="Distinct claims per thread")
+    parser.add_argument("--retry", type=float, default=0.2, help="Fraction of filings sent twice")
+    args = parser.parse_args()
+
+    results = {mode: run(mode, args.threads, args.filings, args.retry) for mode in ("direct", "writer")}
+    print(f"\n{args.threads} threads x {args.filings} claims, {args.retry:.0%} retried\n")
+    print(f"{'mode':<7} {'calls':>6} {'calls/s':>8} {'p50 ms':>7} {'p95 ms':>7} {'locked':>7} {'id clash':>9} "
+          f"{'rows':>6} {'expected':>9} {'dup rows':>9}")
+    for mode, r in results.items():
+        r["other_errors"] -= r["locked"] + r["collisions"]
+        print(f"{mode:<7} {r['calls']:>6} {r['per_s']:>8.0f} {r['p50_ms']:>7.1f} {r['p95_ms']:>7.1f} {r['locked']:>7} "
+              f"{r['collisions']:>9} {r['rows']:>6} {r['expected']:>9} {r['duplicates']:>9}")
+        if r["other_errors"]:
+            print(f"        {r['other_errors']} other errors")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+benchmarks/common.py
+Shared setup for offline benchmarks: a generated database and a fake LLM.
+
+Run benchmarks from the backend directory, e.g.:
+    python -m benchmarks.templates_bench
+"""
+import os
+import sys
+import sqlite3
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "db"))
+os.environ.setdefault("OPENAI_API_KEY", "sk-offline-benchmark")
+
+from setup import setup_insurance_database
+
+# Modules that open their own connection to the insurance DB via a module-level DB_PATH
+DB_MODULES = ["customer_tools", "policy_tools", "claims_tools", "claim_writer", "claim_intake", "customer_rollup", "billing_tools", "auto_tools", "report"]
+
+
+def generated_db() -> str:
+    """Creates a fresh synthetic database in a temp dir and points the tool modules at it."""
+    path = os.path.join(tempfile.mkdtemp(prefix="insure-bench-"), "insurance_support.db")
+    setup_insurance_database(path)
+    for name in DB_MODULES:
+        module = __import__(name)
+        module.DB_PATH = path
+    return path
+
+
+def pick_customer(db_path: str) -> dict:
+    """Finds a customer with a Motor policy and at least one claim, for realistic lookups."""
+    conn = sqlite3.connect(db_path)
+    try:
+        row = conn.execute("""
+            SELECT p.customer_id, p.policy_number, c.claim_id
+            FROM policies p
+            JOIN claims c ON c.policy_number = p.policy_number
+            JOIN auto_policy_details a ON a.policy_number = p.policy_number
+            ORDER BY p.customer_id LIMIT 1
+        """).fetchone()
+        return {"customer_id": row[0], "motor_policy": row[1], "claim_id": row[2]}
+    finally:
+        conn.close()
+
+
+def percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
@@ -0,0 +1,129 @@
+"""
+benchmarks/customer_rollup_bench.py
+Per-customer totals read from the trigger-maintained rollups (customer_rollup.py) vs
+aggregated from raw rows on every request, and what the triggers add to writes.
+
+- read: for every customer, active policies, outstanding / overdue amounts (billing LEFT
+  JOIN payments) and claim totals by status; `raw` runs the aggregate queries, `rollup`
+  calls customer_rollup.get. --claims extra claims are spread over --heavy customers
+  first, so some customers have long histories, as long-lived accounts do.
+- write: --writes claims (executemany, as claim_writer does) and payments inserted
+  with and without the triggers, each on a freshly generated database.
+- check: customer_rollup.check after the writes; mismatches should be 0.
+
+Usage:
+    cd backend
+    python -m benchmarks.customer_rollup_bench --claims 200000 --heavy 20
+"""
+import argparse
+import random
+import sqlite3
+import time
+
+from benchmarks.common import generated_db, percentile
+
+import customer_rollup
+
+RAW_TOTALS = [
+    "SELECT COUNT(*), SUM(status = 'Active') FROM policies WHERE customer_id = ?",
+    """SELECT COUNT(*), SUM(b.amount), SUM(CASE WHEN b.status = 'overdue' THEN b.amount END)
+       FROM billing b JOIN policies p ON p.policy_number = b.policy_number
+       LEFT JOIN payments pay ON pay.bill_id = b.bill_id AND LOWER(pay.status) IN ('completed', 'success')
+       WHERE p.customer_id = ? AND b.status != 'paid' AND pay.payment_id IS NULL""",
+    """SELECT c.status, COUNT(*), SUM(c.claim_amount)
+       FROM claims c JOIN policies p ON p.policy_number = c.policy_number
+       WHERE p.customer_id = ? GROUP BY c.status""",
+]
+
+
+def add_claims(db_path: str, claims: int, heavy: int, seed: int = 5):
+    """Extra claims, half of them on the first `heavy` customers' policies."""
+    rng = random.Random(seed)
+    conn = sqlite3.connect(db_path)
+    policies = [r[0] for r in conn.execute("SELECT policy_number FROM policies ORDER BY customer_id")]
+    hot = policies[:max(heavy, 1)]
+    rows = [(f"BENCH{i:07d}", rng.choice(hot) if i % 2 else rng.choice(policies), "2025-03-01",
+             round(rng.uniform(100, 9000), 2), rng.choice(["Pending", "Approved", "Paid"]), "Bench claim")
+            for i in range(claims)]
+    conn.executemany("INSERT INTO claims VALUES (?,?,?,?,?,?)", rows)
+    conn.commit()
+    conn.close()
+
+
+def read_raw(db_path: str, customer_id: str):
+    conn = sqlite3.connect(db_path)
+    try:
+        return [conn.execute(q, (customer_id,)).fetchall() for q in RAW_TOTALS]
+    finally:
+        conn.close()
+
+
+def time_reads(fn, customers: list) -> dict:
+    latencies = []
+    for customer_id in customers:
+        start = time.perf_counter()
+        fn(customer_id)
+        latencies.append(time.perf_counter() - start)
+    return {"p50_ms": percentile(latencies, 50) * 1000, "p99_ms": percentile(latencies, 99) * 1000,
+            "max_ms": max(latencies) * 1000}
+
+
+def time_writes(writes: int, triggers: bool, seed: int = 9) -> dict:
+    db_path = generated_db()
+    if triggers:
+        customer_rollup.ensure(db_path)
+    rng = random.Random(seed)
+    conn = sqlite3.connect(db_path)
+    policies = [r[0] for r in conn.execute("SELECT policy_number FROM policies")]
+    bills = [r[0] for r in conn.execute("SELECT bill_id FROM billing WHERE status != 'paid'")]
+    claims = [(f"W{i:07d}", rng.choice(policies), "2025-04-01", round(rng.uniform(100, 9000), 2), "Pending", "w")
+              for i in range(writes)]
+    payments = [(f"WPAY{i:07d}", rng.choice(bills), "2025-04-02", 100, "completed", "Card") for i in range(writes)]
+    start = time.perf_counter()
+    conn.executemany("INSERT INTO claims VALUES (?,?,?,?,?,?)", claims)
+    conn.commit()
+    claim_s = time.perf_counter() - start
+    start = time.perf_counter()
+    conn.executemany("INSERT INTO payments VALUES (?,?,?,?,?,?)", payments)
+    conn.commit()
+    payment_s = time.perf_counter() - start
+    conn.close()
+    result = {"claims_per_s": writes / claim_s, "payments_per_s": writes / payment_s}
+    if triggers:
+        result["mismatched"] = len(customer_rollup.check(db_path)["mismatched"])
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--claims", type=int, default=200000, help="Extra claims before the read test")
+    parser.add_argument("--heavy", type=int, default=20, help="Policies that receive half of the extra claims")
+    parser.add_argument("--writes", type=int, default=20000, help="Claims and payments inserted in the write test")
+    args = parser.parse_args()
+
+    db_path = generated_db()
+    add_claims(db_path, args.claims, args.heavy)
+    start = time.perf_counter()
+    customers = customer_rollup.rebuild(db_path)
+    rebuild_s = time.perf_counter() - start
+    conn = sqlite3.connect(db_path)
+    ids = [r[0] for r in conn.execute("SELECT customer_id FROM customers")]
+    conn.close()
+
+    reads = {"raw": time_reads(lambda c: read_raw(db_path, c), ids),
+             "rollup": time_reads(customer_rollup.get, ids)}
+    print(f"\nreads: {customers} customers, +{args.claims} claims (half on {args.heavy} policies), "
+          f"rebuild {rebuild_s:.2f} s\n")
+    print(f"{'mode':<7} {'p50 ms':>7} {'p99 ms':>7} {'max ms':>7}")
+    for mode, r in reads.items():
+        print(f"{mode:<7} {r['p50_ms']:>7.3f} {r['p99_ms']:>7.3f} {r['max_ms']:>7.2f}")
+
+    writes = {"plain": time_writes(args.writes, triggers=False), "rollup": time_writes(args.writes, triggers=True)}
+    print(f"\nwrites: {args.writes} claims, then {args.writes} payments, executemany\n")
+    print(f"{'mode':<7} {'claims/s':>9} {'payments/s':>11} {'mismatched':>11}")
+    for mode, r in writes.items():
+        print(f"{mode:<7} {r['claims_per_s']:>9.0f} {r['payments_per_s']:>11.0f} {str(r.get('mismatched', '-')):>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+benchmarks/fan_out_bench.py
+Wall-clock gain of multi-agent fan-out (fan_out.py) on compound questions.
+
+Each script is a compound question ("Show my policies and anything I still owe") made of
+parts that belong to different agents. It is run two ways, guardrail + graph each turn:
+- sequential: one turn per part, as a customer has to ask without fan-out
+- fan-out: the whole question in one turn; the agents run in parallel branches
+All LLM nodes run on a FakeChatModel with a fixed latency per call (--llm-latency), so
+the gain comes from fewer round trips on the critical path, not from a faster model.
+
+Usage:
+    cd backend
+    python -m benchmarks.fan_out_bench --rounds 10 --llm-latency 0.3
+"""
+import argparse
+import contextlib
+import io
+import sys
+import time
+
+from benchmarks.common import generated_db, pick_customer, percentile
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+import agent_supervisor
+import fan_out
+import guardrails
+import llm_gateway
+from fake_llm import FakeChatModel
+from vectordb import vector_db
+
+
+# --- WORKLOAD ---
+def build_scripts(ids: dict) -> list:
+    """(name, compound question, [(part question, agent, tool, args)])"""
+    cid = ids["customer_id"]
+    return [
+        ("policies+billing", "Show my policies and anything I still owe", [
+            ("What policies do I have?", "policy_agent", "get_customer_policies", {"customer_id": cid}),
+            ("Do I owe anything?", "billing_agent", "get_billing_history", {"customer_id": cid}),
+        ]),
+        ("claim+billing", f"What's the status of {ids['claim_id']} and do I owe anything?", [
+            (f"Status of {ids['claim_id']}?", "claims_agent", "check_claim_status", {"claim_id": ids["claim_id"]}),
+            ("Do I owe anything?", "billing_agent", "get_billing_history", {"customer_id": cid}),
+        ]),
+        ("premium+faq", "What's my premium and what is NCD?", [
+            ("What's my premium?", "policy_agent", "get_policy_details", {"policy_number": ids["motor_policy"]}),
+            ("What is NCD?", "faq_agent", "search_faq", {"query": "What is NCD?"}),
+        ]),
+        ("vin+claims+billing", "What's my VIN, how are my claims going and do I owe anything?", [
+            ("What's my VIN?", "policy_agent", "get_vehicle_details", {"policy_number": ids["motor_policy"]}),
+            ("How are my claims going?", "claims_agent", "get_customer_claims", {"customer_id": cid}),
+            ("Do I owe anything?", "billing_agent", "get_billing_history", {"customer_id": cid}),
+        ]),
+    ]
+
+
+def make_responder(parts: list):
+    """Guardrail allows, supervisor routes to the parts' agents, each agent calls its tool then answers."""
+    def respond(messages, tools):
+        names = [t["function"]["name"] for t in tools]
+        if names == ["GuardrailVerdict"]:
+            return {"is_allowed": True, "reason": ""}
+        if names == ["RouterOutput"]:
+            return {"next": parts[0][1], "also": [agent for _, agent, _, _ in parts[1:]]}
+        if isinstance(messages[-1], HumanMessage):
+            for _, _, tool, args in parts:
+                if tool in names:
+                    return AIMessage(content="", tool_calls=[{"name": tool, "args": args, "id": f"call_{time.time_ns()}"}])
+        if isinstance(messages[-1], ToolMessage):
+            return f"Here is what I found:\n{messages[-1].content[:200]}"
+        return "OK"
+    return respond
+
+
+def run_turn(question: str, history: list, customer_id: str) -> list:
+    verdict = guardrails.validate_input(question, "bench@example.com", history)
+    assert verdict["valid"], verdict
+    response = agent_supervisor.graph.invoke({
+        "messages": history + [HumanMessage(content=question)],
+        "authenticated_customer_id": customer_id,
+        "policy_types": ["Motor"],
+    })
+    return response["messages"]
+
+
+# --- PASSES ---
+def run_sequential(parts: list, fake: FakeChatModel, customer_id: str) -> float:
+    history = []
+    start = time.perf_counter()
+    for part in parts:
+        fake.responder = make_responder([part])
+        history = run_turn(part[0], history, customer_id)
+    return time.perf_counter() - start
+
+
+def run_fan_out(question: str, parts: list, fake: FakeChatModel, customer_id: str) -> float:
+    fake.responder = make_responder(parts)
+    start = time.perf_counter()
+    messages = run_turn(question, [], customer_id)
+    elapsed = time.perf_counter() - start
+    merged = messages[-1].response_metadata.get("fan_out")
+    assert merged == [agent for _, agent, _, _ in parts], f"not fanned out: {merged}"
+    return elapsed
+
+
+def measure(run, fake: FakeChatModel, rounds: int, warmup: int) -> dict:
+    latencies, calls = [], []
+    for r in range(warmup + rounds):
+        fake.reset_calls()
+        elapsed = run()
+        if r >= warmup:
+            latencies.append(elapsed)
+            calls.append(fake.calls)
+    return {"p50_ms": percentile(latencies, 50) * 1000, "p95_ms": percentile(latencies, 95) * 1000,
+            "llm_calls": sum(calls) / len(calls)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Simulated seconds per LLM call")
+    parser.add_argument("--check", action="store_true", help="Exit 1 if fan-out is not faster on every script")
+    args = parser.parse_args()
+
+    if not fan_out.ENABLED:
+        sys.exit("AGENT_FAN_OUT is off; nothing to compare.")
+    db_path = generated_db()
+    ids = pick_customer(db_path)
+    fake = FakeChatModel(latency_s=args.llm_latency)
+    llm_gateway.use_model(fake)
+    # BM25-only FAQ search: no embedding model download needed offline
+    vector_db.RETRIEVAL_MODE = "lexical"
+
+    print(f"\n{'script':<20} {'agents':>6} {'seq p50 ms':>11} {'fan p50 ms':>11} {'fan p95 ms':>11} "
+          f"{'speedup':>8} {'seq LLM':>8} {'fan LLM':>8}")
+    slower = []
+    for name, question, parts in build_scripts(ids):
+        with contextlib.redirect_stdout(io.StringIO()):  # agent nodes print progress
+            seq = measure(lambda: run_sequential(parts, fake, ids["customer_id"]), fake, args.rounds, args.warmup)
+            fan = measure(lambda: run_fan_out(question, parts, fake, ids["customer_id"]), fake, args.rounds, args.warmup)
+        speedup = seq["p50_ms"] / fan["p50_ms"] if fan["p50_ms"] else 0.0
+        if speedup <= 1:
+            slower.append(name)
+        print(f"{name:<20} {len(parts):>6} {seq['p50_ms']:>11.1f} {fan['p50_ms']:>11.1f} {fan['p95_ms']:>11.1f} "
+              f"{speedup:>7.2f}x {seq['llm_calls']:>8.1f} {fan['llm_calls']:>8.1f}")
+
+    if slower:
+        print(f"\nFan-out not faster on: {', '.join(slower)}")
+        if args.check:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
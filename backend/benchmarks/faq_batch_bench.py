@@ -0,0 +1,56 @@
+"""
+benchmarks/faq_batch_bench.py
+Cost of answering several FAQ questions in one turn: one query_faqs call per
+question (uncached), one batched query_faqs call (uncached), and repeated
+questions served from the query caches.
+
+Requires a seeded store (python -m vectordb.vector_db).
+
+Usage:
+    cd backend
+    python -m benchmarks.faq_batch_bench --batch 4 --repeat 20
+"""
+import argparse
+import time
+
+from benchmarks.common import percentile
+from benchmarks.faq_retrieval_bench import LABELED_QUERIES
+
+from vectordb import vector_db
+
+
+def measure(fn, repeat: int, clear: bool) -> dict:
+    latencies = []
+    for _ in range(repeat):
+        if clear:
+            vector_db.clear_query_caches()
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return {"p50_ms": percentile(latencies, 50) * 1000, "p95_ms": percentile(latencies, 95) * 1000}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    # Skip acronym queries: they never reach the embedding model
+    queries = [q for q, _ in LABELED_QUERIES if " " in q][:args.batch]
+    vector_db.warm_up()
+
+    cases = [
+        ("sequential", lambda: [vector_db.query_faqs(q) for q in queries], True),
+        ("batched", lambda: vector_db.query_faqs(queries), True),
+        ("cached", lambda: vector_db.query_faqs(queries), False),
+    ]
+    print(f"{len(queries)} questions per turn, mode={vector_db.RETRIEVAL_MODE}")
+    print(f"{'case':<11} {'p50 ms':>9} {'p95 ms':>9}")
+    for name, fn, clear in cases:
+        r = measure(fn, args.repeat, clear)
+        print(f"{name:<11} {r['p50_ms']:>9.3f} {r['p95_ms']:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
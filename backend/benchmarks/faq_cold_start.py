@@ -0,0 +1,69 @@
+"""
+benchmarks/faq_cold_start.py
+Measures FAQ vector store cold start: first-query latency in a fresh process
+without warm-up vs. with warm_up() run at startup.
+
+Each mode runs in its own subprocess so nothing is already loaded.
+Requires a seeded store (python -m vectordb.vector_db).
+
+Usage:
+    cd backend
+    python -m benchmarks.faq_cold_start --runs 3
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = r"""
+import json, sys, time
+t0 = time.perf_counter()
+from vectordb import vector_db
+imported = time.perf_counter()
+warmup = {}
+if sys.argv[1] == "warm":
+    warmup = vector_db.warm_up()["timings_ms"]
+ready = time.perf_counter()
+# Not acronym questions: those are answered by the BM25 fast path without touching the vector index
+vector_db.query_faqs("Can I renew my policy online?")
+first = time.perf_counter()
+vector_db.query_faqs("How do I change my payment method?")
+second = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - t0) * 1000,
+    "startup_ms": (ready - imported) * 1000,
+    "first_query_ms": (first - ready) * 1000,
+    "second_query_ms": (second - first) * 1000,
+    "warmup": warmup,
+}))
+"""
+
+
+def probe(mode: str) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE, mode],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'mode':<6} {'import ms':>10} {'startup ms':>11} {'1st query ms':>13} {'2nd query ms':>13}")
+    for mode in ("cold", "warm"):
+        for _ in range(args.runs):
+            r = probe(mode)
+            print(f"{mode:<6} {r['import_ms']:>10.1f} {r['startup_ms']:>11.1f} "
+                  f"{r['first_query_ms']:>13.1f} {r['second_query_ms']:>13.1f}")
+            if r["warmup"]:
+                print(f"       warm-up breakdown: {r['warmup']}")
+
+
+if __name__ == "__main__":
+    main()
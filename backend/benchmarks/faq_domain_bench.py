@@ -0,0 +1,74 @@
+"""
+benchmarks/faq_domain_bench.py
+Domain-filtered FAQ retrieval (policy types from login) vs. searching the whole
+knowledge base: recall@k of the expected FAQ, precision@k (share of results in
+the domains relevant to the customer and question) and latency.
+
+Each labeled query is asked by customers holding one policy type, for every
+type under which the expected FAQ is relevant.
+
+Requires a seeded store (python -m vectordb.vector_db).
+
+Usage:
+    cd backend
+    python -m benchmarks.faq_domain_bench --k 2 --repeat 5
+"""
+import argparse
+import time
+
+from benchmarks.common import percentile
+from benchmarks.faq_retrieval_bench import LABELED_QUERIES
+
+from vectordb import vector_db
+
+
+def run(filtered: bool, k: int, repeat: int, mode: str) -> dict:
+    domains = vector_db.faq_domains()
+    latencies, hits, precise, returned, asked = [], 0, 0, 0, 0
+    for policy_type in vector_db.POLICY_DOMAINS:
+        for query, expected in LABELED_QUERIES:
+            relevant = vector_db.search_domains([policy_type], query) or set(domains.values())
+            expected_id = vector_db.generate_id(expected)
+            if domains.get(expected_id) not in relevant:
+                continue
+            asked += 1
+            for i in range(repeat):
+                vector_db.clear_query_caches()
+                start = time.perf_counter()
+                ids = [doc_id for doc_id, _ in vector_db.retrieve(
+                    query, k, mode=mode, policy_types=[policy_type] if filtered else None)]
+                latencies.append(time.perf_counter() - start)
+                if i == 0:
+                    hits += expected_id in ids
+                    precise += sum(domains.get(doc_id) in relevant for doc_id in ids)
+                    returned += len(ids)
+    return {
+        "asked": asked,
+        "recall": hits / max(asked, 1),
+        "precision": precise / max(returned, 1),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--k", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--mode", default=vector_db.RETRIEVAL_MODE)
+    args = parser.parse_args()
+
+    vector_db.get_lexical_index()
+    if args.mode != "lexical":
+        vector_db.warm_up()
+
+    print(f"mode={args.mode} backend={vector_db.VECTOR_BACKEND}")
+    print(f"{'search':<10} {'queries':>8} {f'recall@{args.k}':>10} {f'prec@{args.k}':>8} {'p50 ms':>9} {'p95 ms':>9}")
+    for name, filtered in (("all", False), ("domain", True)):
+        r = run(filtered, args.k, args.repeat, args.mode)
+        print(f"{name:<10} {r['asked']:>8} {r['recall']:>10.2f} {r['precision']:>8.2f} "
+              f"{r['p50_ms']:>9.3f} {r['p95_ms']:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+benchmarks/faq_reindex_bench.py
+Times a full FAQ index build against an incremental re-run after a one-entry edit.
+Uses a throwaway Chroma directory and manifest, never the real store.
+
+Usage:
+    cd backend
+    python -m benchmarks.faq_reindex_bench --copies 20
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.common import BACKEND_DIR  # noqa: F401  (puts backend on sys.path)
+
+from vectordb import vector_db
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--copies", type=int, default=20, help="Replicate faq_data.json N times to grow the corpus")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="faq-reindex-")
+    vector_db.CHROMA_PATH = os.path.join(workdir, "chroma_faq_db")
+    vector_db.MANIFEST_PATH = os.path.join(workdir, "chroma_faq_manifest.json")
+    source = os.path.join(workdir, "faqs.jsonl")
+
+    base = vector_db.load_faqs_from_json(vector_db.JSON_PATH)
+    faqs = [
+        {**faq, "question": f"{faq['question']} (variant {i})"} if i else faq
+        for i in range(args.copies) for faq in base
+    ]
+
+    def write_source():
+        with open(source, "w", encoding="utf-8") as f:
+            for faq in faqs:
+                f.write(json.dumps(faq) + "\n")
+
+    write_source()
+    vector_db.get_embedding_function()(["load model"])
+
+    start = time.perf_counter()
+    vector_db.upsert_faqs(source)
+    full_s = time.perf_counter() - start
+
+    faqs[len(faqs) // 2]["answer"] += " (edited)"
+    write_source()
+    start = time.perf_counter()
+    vector_db.upsert_faqs(source)
+    incremental_s = time.perf_counter() - start
+
+    print(f"\n{len(faqs)} FAQs: full index {full_s:.2f}s, re-run after one edit {incremental_s:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+benchmarks/faq_retrieval_bench.py
+Latency and recall@k of FAQ retrieval modes (vector, lexical, hybrid) on a labeled query set.
+
+Requires a seeded store for the vector and hybrid modes (python -m vectordb.vector_db).
+
+Usage:
+    cd backend
+    python -m benchmarks.faq_retrieval_bench --k 2 --repeat 5
+    python -m benchmarks.faq_retrieval_bench --modes lexical
+"""
+import argparse
+import time
+
+from benchmarks.common import percentile
+
+from vectordb import vector_db
+
+# query -> the FAQ question that should be retrieved
+LABELED_QUERIES = [
+    ("NCD", "What is NCD?"),
+    ("what is ncd", "What is NCD?"),
+    ("COE", "What is COE?"),
+    ("GIRO", "What is GIRO?"),
+    ("MAS", "What is MAS?"),
+    ("GIA", "What is GIA?"),
+    ("DPS", "What is DPS?"),
+    ("TPO cover", "What is Third Party Only (TPO)?"),
+    ("Explain PayNow", "What is PayNow?"),
+    ("Can I move my no claim discount to another insurer?", "Can I transfer my NCD?"),
+    ("Can I pay premiums with MediSave?", "Can I use CPF for insurance?"),
+    ("What is the certificate to own a car?", "What is COE?"),
+    ("How do I make a claim after an accident?", "How do I file a claim?"),
+    ("how long until my claim is paid", "How long does claim processing take?"),
+    ("amount I pay before insurance pays", "What is a deductible?"),
+    ("why is my premium so high", "How is my premium calculated?"),
+    ("does car insurance cover flood damage", "What is comprehensive coverage?"),
+    ("change my phone number", "How do I update my contact details?"),
+    ("can I pay by credit card", "What payment methods are accepted?"),
+    ("digital identity login", "What is Singpass?"),
+    ("who regulates insurers in Singapore", "What is MAS?"),
+    ("insurance for my flat against fire", "What is home insurance?"),
+    ("hospital bills coverage", "What is health insurance?"),
+    ("payout to my family if I die", "What does life insurance cover?"),
+]
+
+
+def run_mode(mode: str, k: int, repeat: int) -> dict:
+    latencies, hits = [], 0
+    for query, expected in LABELED_QUERIES:
+        expected_id = vector_db.generate_id(expected)
+        for i in range(repeat):
+            vector_db.clear_query_caches()  # measure retrieval, not the query cache
+            start = time.perf_counter()
+            ids = [doc_id for doc_id, _ in vector_db.retrieve(query, k, mode=mode)]
+            latencies.append(time.perf_counter() - start)
+            if i == 0:
+                hits += expected_id in ids
+    return {
+        "recall": hits / len(LABELED_QUERIES),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--k", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--modes", nargs="+", default=["vector", "lexical", "hybrid"])
+    args = parser.parse_args()
+
+    # Build indexes and load the model outside the timed loop
+    vector_db.get_lexical_index()
+    if set(args.modes) & {"vector", "hybrid"}:
+        vector_db.warm_up()
+
+    print(f"{'mode':<8} {f'recall@{args.k}':>10} {'p50 ms':>9} {'p95 ms':>9}")
+    for mode in args.modes:
+        r = run_mode(mode, args.k, args.repeat)
+        print(f"{mode:<8} {r['recall']:>10.2f} {r['p50_ms']:>9.3f} {r['p95_ms']:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
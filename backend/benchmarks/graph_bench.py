@@ -0,0 +1,311 @@
+"""
+benchmarks/graph_bench.py
+Offline end-to-end benchmark of a chat turn (guardrail + graph) and report generation.
+
+Every LLM node runs on a scripted FakeChatModel (via llm_gateway.use_model) against a
+generated database, so the numbers measure graph overhead, DB latency and tool cost
+without calling OpenAI. Reports per-scenario end-to-end percentiles, per-node / per-tool
+latency percentiles and allocations (tracemalloc peak and net, separate pass).
+
+Results are compared against the stored baseline (benchmarks/baselines/graph_bench.json);
+a p50 or allocation peak more than --tolerance above baseline is a regression; p95 over
+--tolerance is only a warning (with a few dozen rounds it is one or two samples). Absolute
+timings depend on the machine and its load, so every round also times a fixed calibration
+workload (Python + SQLite) and baseline latencies are scaled by the ratio of the median
+calibration times before comparing; latency increases under --min-delta-ms are ignored,
+and with --check a latency regression must reproduce in a second timing pass to fail.
+
+Usage:
+    cd backend
+    python -m benchmarks.graph_bench --rounds 20
+    python -m benchmarks.graph_bench --save-baseline   # record a new baseline
+    python -m benchmarks.graph_bench --check           # exit 1 on regression (CI)
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sqlite3
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+
+from benchmarks.common import generated_db, pick_customer, percentile
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+import agent_supervisor
+import guardrails
+import llm_gateway
+import report
+from fake_llm import FakeChatModel
+from vectordb import vector_db
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "graph_bench.json")
+
+
+# --- WORKLOAD ---
+def build_scenarios(ids: dict) -> list:
+    """(name, question, route, tool calls) replayed through guardrail + graph; None = report."""
+    return [
+        ("policy_list", "What policies do I have?", "policy_agent",
+         [("get_customer_policies", {"customer_id": ids["customer_id"]})]),
+        ("vehicle", "What's my VIN?", "policy_agent",
+         [("get_vehicle_details", {"policy_number": ids["motor_policy"]})]),
+        ("claim_status", f"Status of {ids['claim_id']}?", "claims_agent",
+         [("check_claim_status", {"claim_id": ids["claim_id"]})]),
+        ("billing", "Do I owe anything?", "billing_agent",
+         [("get_billing_history", {"customer_id": ids["customer_id"]})]),
+        ("faq", "What is NCD and how does GIRO work?", "faq_agent",
+         [("search_faq", {"query": "What is NCD?"}), ("search_faq", {"query": "How does GIRO work?"})]),
+        ("whoami", "Who am I?", "customer_agent",
+         [("lookup_customer", {"customer_id": ids["customer_id"]})]),
+        ("report", None, None, None),
+    ]
+
+
+def make_responder(scenario: dict):
+    """Scripted replies: guardrail allows, supervisor routes, agent calls tools then answers."""
+    def respond(messages, tools):
+        schema = tools[0]["function"]["name"] if tools else ""
+        if schema == "GuardrailVerdict":
+            return {"is_allowed": True, "reason": ""}
+        if schema == "RouterOutput":
+            return {"next": scenario["route"]}
+        if schema == "ExecutiveSummary":
+            return {"account_status": "Active", "portfolio_narrative": "Benchmark narrative.",
+                    "key_findings": ["Finding one", "Finding two", "Finding three"]}
+        if isinstance(messages[-1], HumanMessage):
+            calls = [{"name": name, "args": args, "id": f"call_{time.time_ns()}_{i}"}
+                     for i, (name, args) in enumerate(scenario["tools"])]
+            return AIMessage(content="", tool_calls=calls)
+        if isinstance(messages[-1], ToolMessage):
+            return f"Here is what I found:\n{messages[-1].content[:200]}"
+        return "OK"
+    return respond
+
+
+# --- PER-NODE TIMING ---
+class NodeTimer(BaseCallbackHandler):
+    """Collects durations of graph nodes, tool calls and LLM calls from callback events."""
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self._open = {}
+
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node")
+        if node and node == kwargs.get("name"):
+            self._open[run_id] = (f"node:{node}", time.perf_counter())
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._close(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._close(run_id)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        self._open[run_id] = (f"tool:{kwargs.get('name') or (serialized or {}).get('name')}", time.perf_counter())
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._close(run_id)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._open[run_id] = ("llm", time.perf_counter())
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._close(run_id)
+
+    def _close(self, run_id):
+        entry = self._open.pop(run_id, None)
+        if entry:
+            self.samples[entry[0]].append(time.perf_counter() - entry[1])
+
+
+def run_scenario(scenario: dict, customer_id: str, timer: NodeTimer = None):
+    if scenario["question"] is None:
+        return report.generate_report(customer_id)
+    start = time.perf_counter()
+    verdict = guardrails.validate_input(scenario["question"], "bench@example.com", [])
+    assert verdict["valid"], verdict
+    if timer:
+        timer.samples["guardrail"].append(time.perf_counter() - start)
+    return agent_supervisor.graph.invoke(
+        {"messages": [HumanMessage(content=scenario["question"])],
+         "authenticated_customer_id": customer_id,
+         "policy_types": ["Motor"]},
+        {"callbacks": [timer] if timer else []},
+    )
+
+
+# --- CALIBRATION ---
+def calibrate() -> float:
+    """Seconds for a fixed Python + SQLite workload: the machine-speed yardstick, timed between rounds."""
+    start = time.perf_counter()
+    conn = sqlite3.connect(":memory:")
+    try:
+        conn.execute("CREATE TABLE t (k INTEGER PRIMARY KEY, g INTEGER, v TEXT)")
+        conn.executemany("INSERT INTO t VALUES (?, ?, ?)", ((i, i % 17, str(i) * 3) for i in range(5000)))
+        conn.execute("SELECT g, COUNT(*), MAX(v) FROM t GROUP BY g").fetchall()
+    finally:
+        conn.close()
+    json.loads(json.dumps([{"k": i, "v": [i] * 5} for i in range(2000)]))
+    return time.perf_counter() - start
+
+
+# --- PASSES ---
+def time_pass(scenarios, fake, customer_id, rounds, warmup) -> tuple:
+    timer = NodeTimer()
+    latencies, llm_calls, calibration = defaultdict(list), defaultdict(list), []
+    for r in range(warmup + rounds):
+        if r >= warmup:
+            calibration.append(calibrate())
+        for s in scenarios:
+            fake.responder = make_responder(s)
+            fake.reset_calls()
+            start = time.perf_counter()
+            run_scenario(s, customer_id, timer if r >= warmup else None)
+            if r >= warmup:
+                latencies[s["name"]].append(time.perf_counter() - start)
+                llm_calls[s["name"]].append(fake.calls)
+    end_to_end = {
+        name: {"p50_ms": percentile(v, 50) * 1000, "p95_ms": percentile(v, 95) * 1000,
+               "p99_ms": percentile(v, 99) * 1000, "llm_calls": sum(llm_calls[name]) / len(llm_calls[name])}
+        for name, v in latencies.items()
+    }
+    nodes = {
+        name: {"count": len(v), "p50_ms": percentile(v, 50) * 1000, "p95_ms": percentile(v, 95) * 1000}
+        for name, v in sorted(timer.samples.items())
+    }
+    return end_to_end, nodes, percentile(calibration, 50) * 1000
+
+
+def alloc_pass(scenarios, fake, customer_id, rounds) -> dict:
+    """tracemalloc peak and retained bytes per scenario (separate pass: tracing slows everything)."""
+    out = {}
+    tracemalloc.start()
+    try:
+        for s in scenarios:
+            fake.responder = make_responder(s)
+            peaks, nets = [], []
+            for _ in range(rounds):
+                before = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+                run_scenario(s, customer_id)
+                current, peak = tracemalloc.get_traced_memory()
+                peaks.append(peak - before)
+                nets.append(current - before)
+            # Max peak: the prefetch branch runs in parallel, so a single run's peak depends on interleaving
+            out[s["name"]] = {"peak_kib": max(peaks) / 1024, "net_kib": percentile(nets, 50) / 1024}
+    finally:
+        tracemalloc.stop()
+    return out
+
+
+# --- BASELINE ---
+def speed_ratio(results: dict, baseline: dict) -> float:
+    """How much slower this machine is than the baseline's (1.0 when either run lacks calibration)."""
+    ours, theirs = results.get("calibration_ms"), baseline.get("calibration_ms")
+    return ours / theirs if ours and theirs else 1.0
+
+
+def compare(results: dict, baseline: dict, tolerance: float, min_delta_ms: float = 0.0) -> tuple:
+    """(regressions, warnings): p50 and allocation peaks regress, p95 only warns."""
+    regressions, warnings = [], []
+    scale = speed_ratio(results, baseline)
+    for name, r in results["end_to_end"].items():
+        base = baseline.get("end_to_end", {}).get(name)
+        for metric, out in (("p50_ms", regressions), ("p95_ms", warnings)):
+            if not (base and base[metric]):
+                continue
+            expected = base[metric] * scale
+            if r[metric] > expected * (1 + tolerance) and r[metric] - expected > min_delta_ms:
+                out.append(f"{name} {metric}: {expected:.2f} (scaled) -> {r[metric]:.2f}")
+    for name, r in results["allocations"].items():
+        base = baseline.get("allocations", {}).get(name)
+        if base and base["peak_kib"] and r["peak_kib"] > base["peak_kib"] * (1 + tolerance):
+            regressions.append(f"{name} peak_kib: {base['peak_kib']:.1f} -> {r['peak_kib']:.1f}")
+    return regressions, warnings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--alloc-rounds", type=int, default=5)
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Simulated seconds per LLM call")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown vs. baseline (0.25 = 25%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0,
+                        help="Ignore latency increases smaller than this, after scaling (timer noise)")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--check", action="store_true", help="Exit 1 if any metric regressed")
+    args = parser.parse_args()
+
+    db_path = generated_db()
+    ids = pick_customer(db_path)
+    fake = FakeChatModel(latency_s=args.llm_latency)
+    llm_gateway.use_model(fake)
+    # BM25-only FAQ search: no embedding model download needed offline
+    vector_db.RETRIEVAL_MODE = "lexical"
+
+    scenarios = [{"name": n, "question": q, "route": r, "tools": t} for n, q, r, t in build_scenarios(ids)]
+    with contextlib.redirect_stdout(io.StringIO()):  # agent nodes print progress
+        end_to_end, nodes, calibration_ms = time_pass(scenarios, fake, ids["customer_id"], args.rounds, args.warmup)
+        allocations = alloc_pass(scenarios, fake, ids["customer_id"], args.alloc_rounds)
+    results = {"llm_latency_s": args.llm_latency, "rounds": args.rounds, "calibration_ms": calibration_ms,
+               "end_to_end": end_to_end, "nodes": nodes, "allocations": allocations}
+
+    print(f"\n{'scenario':<14} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'LLM calls':>10} {'peak KiB':>9} {'net KiB':>8}")
+    for name, r in end_to_end.items():
+        a = allocations[name]
+        print(f"{name:<14} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f} "
+              f"{r['llm_calls']:>10.1f} {a['peak_kib']:>9.1f} {a['net_kib']:>8.1f}")
+    print(f"\n{'node / tool':<32} {'count':>6} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, r in nodes.items():
+        print(f"{name:<32} {r['count']:>6} {r['p50_ms']:>8.3f} {r['p95_ms']:>8.3f}")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"\nBaseline saved to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print("\nNo baseline stored; run with --save-baseline to record one.")
+        return
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("llm_latency_s") != args.llm_latency:
+        print(f"\nBaseline was recorded with --llm-latency {baseline.get('llm_latency_s')}; not comparing.")
+        return
+    print(f"\nMachine speed vs. baseline: {speed_ratio(results, baseline):.2f}x "
+          f"(calibration {results['calibration_ms']:.1f} ms; baseline timings scaled by this)")
+    regressions, warnings = compare(results, baseline, args.tolerance, args.min_delta_ms)
+    if args.check and any("_ms:" in line for line in regressions):
+        # One noisy pass (another process on the box) should not fail CI: time again, keep what repeats
+        with contextlib.redirect_stdout(io.StringIO()):
+            end_to_end, _, calibration_ms = time_pass(scenarios, fake, ids["customer_id"], args.rounds, args.warmup)
+        again, _ = compare({**results, "end_to_end": end_to_end, "calibration_ms": calibration_ms},
+                           baseline, args.tolerance, args.min_delta_ms)
+        repeated = {line.split(":")[0] for line in again}
+        regressions = [line for line in regressions if line.split(":")[0] in repeated]
+    if warnings:
+        print(f"\nTail latency above baseline (> {args.tolerance:.0%}; not a failure):")
+        for line in warnings:
+            print(f"  {line}")
+    if regressions:
+        print(f"\nREGRESSIONS (> {args.tolerance:.0%} over baseline):")
+        for line in regressions:
+            print(f"  {line}")
+        if args.check:
+            sys.exit(1)
+    else:
+        print(f"\nNo regressions vs. baseline (tolerance {args.tolerance:.0%}).")
+
+
+if __name__ == "__main__":
+    main()
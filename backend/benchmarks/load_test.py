@@ -0,0 +1,233 @@
+"""
+benchmarks/load_test.py
+HTTP load test of api.py under concurrent users: threadpool saturation, session
+contention and SQLite locking show up as latency and errors per endpoint.
+
+Each virtual user runs login -> chat turns -> report in a loop until the duration ends.
+Reports throughput, error rate and p50/p95/p99 per endpoint. Requests the API sheds
+under overload (429, admission.py) are counted separately with their own latency; the
+virtual user then waits Retry-After (capped at --max-backoff) like a well-behaved client.
+
+By default the backend and a mock OpenAI server (benchmarks/mock_openai.py) are started
+as subprocesses, with the API on a freshly generated database and FAQ search in BM25-only
+mode (no embedding model download). Use --base-url to target an already running API.
+
+Usage:
+    cd backend
+    python -m benchmarks.load_test --users 20 --duration 60 --mock-latency 0.4
+    python -m benchmarks.load_test --base-url http://127.0.0.1:8000 --users 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+import httpx
+
+from benchmarks.common import percentile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHAT_SCRIPT = [
+    "What policies do I have?",
+    "Do I owe anything?",
+    "Show my claims",
+    "What is NCD?",
+    "What is my premium?",
+    "Explain PayNow",
+]
+
+SERVE = r"""
+import sys
+from benchmarks.common import generated_db
+db_path = generated_db()
+import api, response_cache
+api.DB_PATH = db_path
+response_cache.DB_PATH = db_path
+import uvicorn
+uvicorn.run(api.app, host="127.0.0.1", port=int(sys.argv[1]), log_level="warning")
+"""
+
+
+# --- SERVERS ---
+def _wait_until_up(url: str, timeout_s: float):
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    raise RuntimeError(f"{url} did not come up within {timeout_s:.0f}s")
+
+
+@contextmanager
+def spawned_servers(args):
+    """Starts the mock OpenAI server and the API; yields the API base URL."""
+    mock_url = f"http://127.0.0.1:{args.mock_port}"
+    env = {
+        **os.environ,
+        "OPENAI_API_KEY": "sk-load-test",
+        "OPENAI_BASE_URL": f"{mock_url}/v1",
+        "FAQ_WARMUP": "0",
+        "FAQ_RETRIEVAL": "lexical",
+    }
+    procs = [subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.mock_openai", "--port", str(args.mock_port),
+         "--latency", str(args.mock_latency), "--token-latency", str(args.mock_token_latency),
+         "--error-rate", str(args.mock_error_rate)],
+        cwd=BACKEND_DIR, env=env,
+    )]
+    try:
+        _wait_until_up(f"{mock_url}/v1/models", 30)
+        procs.append(subprocess.Popen(
+            [sys.executable, "-c", SERVE, str(args.api_port)],
+            cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL,
+        ))
+        api_url = f"http://127.0.0.1:{args.api_port}"
+        _wait_until_up(f"{api_url}/api/health/live", 120)
+        yield api_url
+    finally:
+        for p in procs:
+            p.terminate()
+        for p in procs:
+            p.wait(timeout=10)
+
+
+# --- LOAD ---
+class Recorder:
+    def __init__(self, max_backoff_s: float = 5.0):
+        self.latencies = defaultdict(list)
+        self.shed = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.error_samples = defaultdict(list)
+        self.max_backoff_s = max_backoff_s
+
+    async def call(self, client: httpx.AsyncClient, endpoint: str, method: str, path: str, **kwargs):
+        start = time.perf_counter()
+        try:
+            resp = await client.request(method, path, **kwargs)
+            if resp.status_code == 429:
+                self.shed[endpoint].append(time.perf_counter() - start)
+                retry_after = float(resp.headers.get("retry-after") or 1)
+                await asyncio.sleep(min(retry_after, self.max_backoff_s))
+                return None
+            error = f"HTTP {resp.status_code}" if resp.status_code >= 400 else None
+            body = resp.json() if resp.status_code < 400 else None
+            # /api/chat reports graph failures as a 200 with a "System error" message
+            if body and endpoint == "chat" and str(body.get("ai_message", "")).startswith("System error"):
+                error = body["ai_message"][:120]
+        except (httpx.HTTPError, ValueError) as e:
+            error, body = f"{type(e).__name__}: {e}"[:120], None
+        self.latencies[endpoint].append(time.perf_counter() - start)
+        if error:
+            self.errors[endpoint] += 1
+            if len(self.error_samples[endpoint]) < 3:
+                self.error_samples[endpoint].append(error)
+            return None
+        return body
+
+
+async def virtual_user(client, recorder: Recorder, emails: list, deadline: float, chats: int, rng: random.Random):
+    while time.monotonic() < deadline:
+        login = await recorder.call(client, "login", "POST", "/api/login", json={"email": rng.choice(emails)})
+        if not login:
+            continue
+        session_id = login["session_id"]
+        for question in rng.sample(CHAT_SCRIPT, min(chats, len(CHAT_SCRIPT))):
+            if time.monotonic() >= deadline:
+                break
+            await recorder.call(client, "chat", "POST", "/api/chat",
+                                json={"session_id": session_id, "message": question})
+        if time.monotonic() < deadline:
+            await recorder.call(client, "report", "POST", "/api/report", json={"session_id": session_id})
+
+
+async def run_load(base_url: str, users: int, duration_s: float, chats: int, seed: int,
+                   max_backoff_s: float = 5.0) -> tuple:
+    limits = httpx.Limits(max_connections=users * 2, max_keepalive_connections=users * 2)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        recorder = Recorder(max_backoff_s)
+        listing = await recorder.call(client, "users", "GET", "/api/users")
+        emails = sorted({u["email"] for u in (listing or {}).get("users", [])})
+        if not emails:
+            raise RuntimeError("No users returned by /api/users; is the database set up?")
+        start = time.monotonic()
+        deadline = start + duration_s
+        await asyncio.gather(*(
+            virtual_user(client, recorder, emails, deadline, chats, random.Random(seed + i))
+            for i in range(users)
+        ))
+        return recorder, time.monotonic() - start
+
+
+def summarize(recorder: Recorder, elapsed_s: float) -> dict:
+    summary = {}
+    for endpoint in list(recorder.latencies) + [e for e in recorder.shed if e not in recorder.latencies]:
+        values = recorder.latencies[endpoint]
+        errors = recorder.errors[endpoint]
+        shed = recorder.shed[endpoint]
+        summary[endpoint] = {
+            "requests": len(values) + len(shed),
+            "rps": len(values) / elapsed_s,
+            "error_rate": errors / len(values) if values else 0.0,
+            "shed_rate": len(shed) / (len(values) + len(shed)),
+            "shed_p50_ms": percentile(shed, 50) * 1000,
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+            "error_samples": recorder.error_samples[endpoint],
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10, help="Concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of load")
+    parser.add_argument("--chats", type=int, default=3, help="Chat turns per session")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--base-url", help="Target a running API instead of spawning one")
+    parser.add_argument("--api-port", type=int, default=8010)
+    parser.add_argument("--mock-port", type=int, default=8011)
+    parser.add_argument("--mock-latency", type=float, default=0.4, help="Mock LLM seconds to first token")
+    parser.add_argument("--mock-token-latency", type=float, default=0.0, help="Mock LLM seconds per token")
+    parser.add_argument("--mock-error-rate", type=float, default=0.0, help="Share of mock LLM calls answered 429")
+    parser.add_argument("--max-backoff", type=float, default=5.0, help="Cap on the Retry-After wait after a 429")
+    parser.add_argument("--json", help="Also write the summary to this file")
+    args = parser.parse_args()
+
+    if args.base_url:
+        recorder, elapsed = asyncio.run(run_load(args.base_url, args.users, args.duration, args.chats, args.seed,
+                                                 args.max_backoff))
+    else:
+        with spawned_servers(args) as base_url:
+            recorder, elapsed = asyncio.run(run_load(base_url, args.users, args.duration, args.chats, args.seed,
+                                                     args.max_backoff))
+
+    summary = summarize(recorder, elapsed)
+    print(f"\n{args.users} users, {elapsed:.1f}s")
+    print(f"{'endpoint':<8} {'requests':>9} {'req/s':>7} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'shed':>7} {'shed p50':>9}")
+    for endpoint, s in summary.items():
+        print(f"{endpoint:<8} {s['requests']:>9} {s['rps']:>7.2f} {s['error_rate']:>7.1%} "
+              f"{s['p50_ms']:>9.1f} {s['p95_ms']:>9.1f} {s['p99_ms']:>9.1f} "
+              f"{s['shed_rate']:>7.1%} {s['shed_p50_ms']:>9.1f}")
+    for endpoint, s in summary.items():
+        for sample in s["error_samples"]:
+            print(f"  {endpoint} error: {sample}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"users": args.users, "elapsed_s": elapsed, "endpoints": summary}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
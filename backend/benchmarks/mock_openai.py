@@ -0,0 +1,251 @@
+"""
+benchmarks/mock_openai.py
+Local stand-in for the OpenAI chat-completions API, for load tests without network access.
+
+Point the backend at it with OPENAI_BASE_URL=http://127.0.0.1:<port>/v1. Replies are
+deterministic and shaped like the real model's for this app:
+- structured output (response_format json_schema, or a forced function call):
+  GuardrailVerdict allows, RouterOutput routes by keywords (each part of an "X and Y"
+  question adds its agent to `also`), other schemas get defaults
+- agents with tools: the first tool is called with IDs (CUST/POL/CLM, email) taken from
+  the conversation, then the tool result is summarized
+Latency is configurable (time to first token + per token), as are SSE token streaming
+("stream": true) and a rate of injected 429 responses.
+
+Usage:
+    cd backend
+    python -m benchmarks.mock_openai --port 8001 --latency 0.4 --token-latency 0.005
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+LATENCY_S = 0.4
+TOKEN_LATENCY_S = 0.0
+JITTER = 0.2
+ERROR_RATE = 0.0
+
+ROUTES = [
+    ("customer_agent", re.compile(r"(?i)who am i|my (name|profile|email|nric)")),
+    ("claims_agent", re.compile(r"(?i)claim|accident")),
+    ("billing_agent", re.compile(r"(?i)\bowe\b|bill|invoice|paid|payment|due")),
+    ("faq_agent", re.compile(r"(?i)^(what is|what does|explain|define|how does|who is)")),
+]
+POLICY_PATTERN = re.compile(r"(?i)polic|premium|coverage|deductible|\bvin\b|vehicle|\bcar\b")
+COMPOUND_SPLIT = re.compile(r"(?i)\s+and\s+|\s*;\s*|\?\s+")
+IDS = {
+    "customer_id": re.compile(r"\bCUST\d+\b"),
+    "policy_number": re.compile(r"\bPOL\d+\b"),
+    "claim_id": re.compile(r"\bCLM\d+\b"),
+    "email": re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+"),
+}
+
+app = FastAPI(title="Mock OpenAI")
+
+
+# --- REPLIES ---
+def _text(message: dict) -> str:
+    content = message.get("content") or ""
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content
+
+
+def _last_user(messages: list) -> str:
+    return next((_text(m) for m in reversed(messages) if m.get("role") == "user"), "")
+
+
+def _find_id(messages: list, field: str):
+    """Most recent value for an ID field anywhere in the conversation."""
+    for m in reversed(messages):
+        found = IDS[field].findall(_text(m))
+        if found:
+            return found[-1]
+    return None
+
+
+def _route(messages: list) -> str:
+    question = _last_user(messages)
+    for route, pattern in ROUTES:
+        if pattern.search(question):
+            return route
+    return "policy_agent"
+
+
+def _also(messages: list, first: str) -> list:
+    """Agents for the other parts of a compound question."""
+    also = []
+    for part in COMPOUND_SPLIT.split(_last_user(messages)):
+        route = next((r for r, pattern in ROUTES if pattern.search(part)),
+                     "policy_agent" if POLICY_PATTERN.search(part) else None)
+        if route and route != first and route not in also:
+            also.append(route)
+    return also
+
+
+def _structured(name: str, schema: dict, messages: list) -> dict:
+    if name == "GuardrailVerdict":
+        return {"is_allowed": True, "reason": ""}
+    if name == "RouterOutput":
+        route = _route(messages)
+        return {"next": route, "also": _also(messages, route)}
+    if name == "ExecutiveSummary":
+        return {"account_status": "Active",
+                "portfolio_narrative": "The customer holds an active portfolio with regular payments.",
+                "key_findings": ["Premiums are mostly paid on time", "Claims history is moderate",
+                                 "Coverage spans the customer's main risks"]}
+    return _schema_args(schema, messages)
+
+
+def _schema_args(schema: dict, messages: list) -> dict:
+    args = {}
+    for field, prop in (schema.get("properties") or {}).items():
+        if field in IDS:
+            value = _find_id(messages, field)
+            if value:
+                args[field] = value
+            continue
+        if field == "query":
+            args[field] = _last_user(messages)
+        elif "enum" in prop:
+            args[field] = prop["enum"][0]
+        elif prop.get("type") in ("integer", "number"):
+            args[field] = 0
+        elif prop.get("type") == "boolean":
+            args[field] = True
+        elif field in (schema.get("required") or []):
+            args[field] = ""
+    return args
+
+
+def reply(body: dict) -> dict:
+    """Returns {"content": str} or {"tool_calls": [...]} for a chat-completions request."""
+    messages = body.get("messages") or []
+    tools = body.get("tools") or []
+
+    response_format = body.get("response_format") or {}
+    if response_format.get("type") == "json_schema":
+        spec = response_format["json_schema"]
+        return {"content": json.dumps(_structured(spec.get("name", ""), spec.get("schema") or {}, messages))}
+
+    forced = body.get("tool_choice")
+    if isinstance(forced, dict) or (forced in ("required", "any") and len(tools) == 1):
+        name = forced["function"]["name"] if isinstance(forced, dict) else tools[0]["function"]["name"]
+        fn = next(t["function"] for t in tools if t["function"]["name"] == name)
+        return {"tool_calls": [_tool_call(name, _structured(name, fn.get("parameters") or {}, messages))]}
+
+    last = messages[-1] if messages else {}
+    if tools and last.get("role") == "user":
+        fn = tools[0]["function"]
+        return {"tool_calls": [_tool_call(fn["name"], _schema_args(fn.get("parameters") or {}, messages))]}
+    if last.get("role") == "tool":
+        return {"content": f"Here is what I found: {_text(last)[:300]}"}
+    return {"content": "How else can I help with your insurance today?"}
+
+
+def _tool_call(name: str, args: dict) -> dict:
+    return {"id": f"call_{uuid.uuid4().hex[:12]}", "type": "function",
+            "function": {"name": name, "arguments": json.dumps(args)}}
+
+
+# --- ENDPOINT ---
+def _tokens(text: str) -> list:
+    return re.findall(r"\S+\s*", text) or [text]
+
+
+def _usage(body: dict, completion: str) -> dict:
+    prompt_tokens = sum(len(_text(m)) for m in body.get("messages") or []) // 4
+    completion_tokens = max(1, len(completion) // 4)
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens}
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    if ERROR_RATE and random.random() < ERROR_RATE:
+        return JSONResponse(status_code=429, headers={"retry-after": "0.2"},
+                            content={"error": {"message": "Rate limit reached (mock)", "type": "rate_limit_error"}})
+
+    await asyncio.sleep(LATENCY_S * random.uniform(1 - JITTER, 1 + JITTER))
+    out = reply(body)
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:16]}"
+    created = int(time.time())
+    model = body.get("model", "mock")
+    content = out.get("content")
+    serialized = content if content is not None else json.dumps(out["tool_calls"])
+
+    if body.get("stream"):
+        return StreamingResponse(_stream(completion_id, created, model, out, body, serialized),
+                                 media_type="text/event-stream")
+
+    if TOKEN_LATENCY_S:
+        await asyncio.sleep(TOKEN_LATENCY_S * len(_tokens(serialized)))
+    message = {"role": "assistant", "content": content}
+    if "tool_calls" in out:
+        message["tool_calls"] = out["tool_calls"]
+    return {
+        "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+        "choices": [{"index": 0, "message": message,
+                     "finish_reason": "tool_calls" if "tool_calls" in out else "stop"}],
+        "usage": _usage(body, serialized),
+    }
+
+
+async def _stream(completion_id, created, model, out, body, serialized):
+    def chunk(delta, finish=None, usage=None):
+        data = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish}]}
+        if usage:
+            data["usage"] = usage
+        return f"data: {json.dumps(data)}\n\n"
+
+    yield chunk({"role": "assistant", "content": ""})
+    if "tool_calls" in out:
+        for i, tc in enumerate(out["tool_calls"]):
+            yield chunk({"tool_calls": [{"index": i, "id": tc["id"], "type": "function",
+                                         "function": {"name": tc["function"]["name"], "arguments": ""}}]})
+            for token in _tokens(tc["function"]["arguments"]):
+                await asyncio.sleep(TOKEN_LATENCY_S)
+                yield chunk({"tool_calls": [{"index": i, "function": {"arguments": token}}]})
+        finish = "tool_calls"
+    else:
+        for token in _tokens(out["content"]):
+            await asyncio.sleep(TOKEN_LATENCY_S)
+            yield chunk({"content": token})
+        finish = "stop"
+    include_usage = (body.get("stream_options") or {}).get("include_usage")
+    yield chunk({}, finish, _usage(body, serialized) if include_usage else None)
+    yield "data: [DONE]\n\n"
+
+
+@app.get("/v1/models")
+def models():
+    return {"object": "list", "data": [{"id": "gpt-4o-mini", "object": "model", "owned_by": "mock"}]}
+
+
+def main():
+    global LATENCY_S, TOKEN_LATENCY_S, JITTER, ERROR_RATE
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=LATENCY_S, help="Seconds before the first token")
+    parser.add_argument("--token-latency", type=float, default=TOKEN_LATENCY_S, help="Seconds per output token")
+    parser.add_argument("--jitter", type=float, default=JITTER, help="Relative latency jitter (0.2 = +/-20%%)")
+    parser.add_argument("--error-rate", type=float, default=ERROR_RATE, help="Share of requests answered with 429")
+    args = parser.parse_args()
+    LATENCY_S, TOKEN_LATENCY_S, JITTER, ERROR_RATE = args.latency, args.token_latency, args.jitter, args.error_rate
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+benchmarks/replay.py
+Replays recorded conversations (cassettes, see cassette.py) through the guardrail and
+agent_supervisor.graph with no network.
+
+Every LLM call is answered from the cassette (optionally after the recorded latency,
+--llm-latency-scale) and every tool call from the recorded tool results, unless
+--live-tools runs the real tools against a generated database. Sessions replay in
+parallel (--concurrency) and can keep the recorded arrival times (--speed), so a day's
+traffic shape can be rerun offline.
+
+Reports per-endpoint latency percentiles and LLM / tool call counts, plus divergences
+from the recording:
+- llm_missing / llm_unused: the graph called a node the recording did not, or skipped
+  one it did (a routing change)
+- request_drift: an LLM request differs from the recorded one (prompt or context change).
+  Digests are taken over redacted text, so context that was truncated before redaction
+  (the guardrail's recent-message snippets) or live tool results can drift on their own.
+- tool_missing, reply_changed, error
+
+Usage:
+    cd backend
+    python -m benchmarks.replay cassettes/2026-10-19.jsonl
+    python -m benchmarks.replay cassettes/ --concurrency 8 --speed 10 --llm-latency-scale 1
+    python -m benchmarks.replay cassettes/ --save before.json
+    python -m benchmarks.replay cassettes/ --compare before.json --check
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from benchmarks.common import generated_db, percentile
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+import agent_supervisor
+import cassette
+import guardrails
+from vectordb import vector_db
+
+# The session email is redacted in cassettes; the guardrail sees the same placeholder
+REDACTED_EMAIL = "<EMAIL>"
+DIVERGENCES = ("llm_missing", "llm_unused", "request_drift", "tool_missing", "reply_changed", "error")
+
+
+# --- REPLAY ---
+def run_turn(turn: dict, history: list) -> str:
+    """Runs one recorded API turn; updates the session history like api.py does."""
+    state = turn.get("state") or {}
+    if turn["endpoint"] in ("login", "clear_history"):
+        history.clear()
+    message = HumanMessage(content=turn["input"])
+
+    # Served without the graph when recorded: response cache hit, token budget reached
+    if turn.get("cached") or turn.get("budget_exceeded"):
+        history.extend([message, AIMessage(content=turn["reply"])])
+        return turn["reply"]
+
+    if turn["endpoint"] == "chat":
+        validation = guardrails.validate_input(turn["input"], REDACTED_EMAIL, list(history))
+        if not validation["valid"]:
+            history.extend([message, AIMessage(content=validation["message"])])
+            return validation["message"]
+
+    history.append(message)
+    response = agent_supervisor.graph.invoke({
+        "messages": list(history),
+        "authenticated_customer_id": turn.get("customer_id", ""),
+        "policy_types": state.get("policy_types", []),
+        "prefer_templates": state.get("prefer_templates", False),
+    })
+    history[:] = response["messages"]
+    return response["messages"][-1].content
+
+
+def replay_turn(turn: dict, history: list, live_tools: bool, latency_scale: float) -> dict:
+    outcome = {"endpoint": turn["endpoint"], "session": turn.get("session"), "ts": turn["ts"],
+               "input": turn["input"][:80], "recorded_ms": turn.get("ms"), "divergences": {}}
+    with cassette.replaying(turn, tools=not live_tools, latency_scale=latency_scale) as replay:
+        start = time.perf_counter()
+        try:
+            reply = run_turn(turn, history)
+        except Exception as e:
+            reply = None
+            outcome["divergences"]["error"] = [f"{type(e).__name__}: {e}"]
+        outcome["ms"] = (time.perf_counter() - start) * 1000
+
+    outcome["llm_calls"] = replay.llm_calls
+    outcome["tool_calls"] = replay.tool_calls
+    found = {"llm_missing": replay.llm_missing, "llm_unused": replay.llm_unused(),
+             "request_drift": replay.request_drift, "tool_missing": replay.tool_missing}
+    if reply is not None and cassette.redact(reply) != turn.get("reply", ""):
+        found["reply_changed"] = [reply[:80]]
+    outcome["divergences"].update({k: v for k, v in found.items() if v})
+    return outcome
+
+
+def replay_all(turns: list, concurrency: int, speed: float, live_tools: bool, latency_scale: float) -> tuple:
+    """Replays sessions in parallel, turns within a session in order. Returns (outcomes, wall seconds)."""
+    sessions = defaultdict(list)
+    for turn in turns:
+        sessions[turn.get("session")].append(turn)
+    t0 = datetime.fromisoformat(turns[0]["ts"])
+    wall_start = time.perf_counter()
+    outcomes, lock = [], threading.Lock()
+
+    def run_session(session_turns):
+        history = []
+        for turn in session_turns:
+            if speed:
+                # Keep the recorded arrival time, compressed by `speed`
+                due = (datetime.fromisoformat(turn["ts"]) - t0).total_seconds() / speed
+                time.sleep(max(0.0, due - (time.perf_counter() - wall_start)))
+            outcome = replay_turn(turn, history, live_tools, latency_scale)
+            with lock:
+                outcomes.append(outcome)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(run_session, sessions.values()))
+    return outcomes, time.perf_counter() - wall_start
+
+
+# --- REPORT ---
+def summarize(outcomes: list, wall_s: float) -> dict:
+    by_endpoint = defaultdict(list)
+    for o in outcomes:
+        by_endpoint[o["endpoint"]].append(o)
+    endpoints = {}
+    for name, items in sorted(by_endpoint.items()):
+        ms = [o["ms"] for o in items]
+        recorded = [o["recorded_ms"] for o in items if o["recorded_ms"] is not None]
+        endpoints[name] = {
+            "turns": len(items),
+            "p50_ms": percentile(ms, 50), "p95_ms": percentile(ms, 95), "p99_ms": percentile(ms, 99),
+            "recorded_p50_ms": percentile(recorded, 50),
+            "llm_calls": sum(o["llm_calls"] for o in items),
+            "tool_calls": sum(o["tool_calls"] for o in items),
+        }
+    divergences = Counter()
+    for o in outcomes:
+        divergences.update({kind: 1 for kind in o["divergences"]})
+    return {"turns": len(outcomes), "sessions": len({o["session"] for o in outcomes}),
+            "wall_s": wall_s, "endpoints": endpoints,
+            "divergences": {kind: divergences.get(kind, 0) for kind in DIVERGENCES}}
+
+
+def compare(summary: dict, previous: dict, tolerance: float) -> list:
+    """Latency regressions and call-count changes against a saved summary."""
+    changes = []
+    for name, r in summary["endpoints"].items():
+        base = previous.get("endpoints", {}).get(name)
+        if not base:
+            continue
+        for metric in ("p50_ms", "p95_ms"):
+            if base[metric] and r[metric] > base[metric] * (1 + tolerance):
+                changes.append(f"{name} {metric}: {base[metric]:.2f} -> {r[metric]:.2f}")
+        for metric in ("llm_calls", "tool_calls"):
+            if r[metric] != base[metric]:
+                changes.append(f"{name} {metric}: {base[metric]} -> {r[metric]}")
+    return changes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("cassettes", nargs="+", help="Cassette files or directories")
+    parser.add_argument("--concurrency", type=int, default=1, help="Sessions replayed in parallel")
+    parser.add_argument("--speed", type=float, default=0.0,
+                        help="Keep recorded arrival times, N x faster (0 = back to back)")
+    parser.add_argument("--llm-latency-scale", type=float, default=0.0,
+                        help="Sleep this fraction of each recorded LLM latency (0 = instant)")
+    parser.add_argument("--live-tools", action="store_true",
+                        help="Run tools against a generated database instead of the recorded results")
+    parser.add_argument("--save", help="Write the summary JSON here")
+    parser.add_argument("--compare", help="Summary JSON from an earlier build to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown vs. --compare (0.25 = 25%%)")
+    parser.add_argument("--check", action="store_true", help="Exit 1 on divergences (other than request_drift) or changes vs. --compare")
+    parser.add_argument("--examples", type=int, default=5, help="Divergent turns to print")
+    args = parser.parse_args()
+
+    turns = cassette.load(args.cassettes)
+    if not turns:
+        sys.exit("No turns in the given cassettes.")
+    if args.live_tools:
+        generated_db()
+        # BM25-only FAQ search: no embedding model download needed offline
+        vector_db.RETRIEVAL_MODE = "lexical"
+
+    outcomes, wall_s = replay_all(turns, args.concurrency, args.speed, args.live_tools, args.llm_latency_scale)
+    summary = summarize(outcomes, wall_s)
+
+    print(f"\nReplayed {summary['turns']} turns from {summary['sessions']} sessions in {wall_s:.2f}s "
+          f"({summary['turns'] / wall_s:.1f} turns/s)")
+    print(f"\n{'endpoint':<14} {'turns':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'rec p50':>8} {'LLM calls':>10} {'tool calls':>10}")
+    for name, r in summary["endpoints"].items():
+        print(f"{name:<14} {r['turns']:>6} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f} "
+              f"{r['recorded_p50_ms']:>8.1f} {r['llm_calls']:>10} {r['tool_calls']:>10}")
+    print("\ndivergences: " + ", ".join(f"{k}={v}" for k, v in summary["divergences"].items()))
+    divergent = [o for o in outcomes if o["divergences"]]
+    for o in divergent[:args.examples]:
+        print(f"  {o['ts']} {o['session']} {o['endpoint']} {o['input']!r}: {o['divergences']}")
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2, sort_keys=True)
+        print(f"\nSummary saved to {args.save}")
+
+    changes = []
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            changes = compare(summary, json.load(f), args.tolerance)
+        print(f"\nChanges vs. {args.compare}:" if changes else f"\nNo changes vs. {args.compare}.")
+        for line in changes:
+            print(f"  {line}")
+    # request_drift alone is informational; everything else means the build behaves differently
+    failing = [o for o in divergent if set(o["divergences"]) - {"request_drift"}]
+    if args.check and (failing or changes):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+benchmarks/session_memory_bench.py
+Process memory (RSS) of in-memory session histories: LangChain message objects vs the
+compact encoding in session_memory.py, with and without a memory ceiling (spill to disk).
+
+Every session gets the silent-login exchange plus --turns tool-calling turns (policies,
+claims, claim status, billing) with real tool output for a different customer of the
+generated database, and the response metadata ChatOpenAI attaches to each AI message.
+Each mode is measured in a fresh subprocess: RSS after building all sessions minus RSS
+before, scaled to 10k sessions. The compact modes also time one checkout (decode + store).
+
+Usage:
+    cd backend
+    python -m benchmarks.session_memory_bench --sessions 10000 --turns 4
+"""
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = ("objects", "compact", "ceiling")
+
+
+def rss_bytes() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+# --- WORKLOAD ---
+def tool_outputs(db_path: str, limit: int) -> list:
+    """Per customer: [(tool, args, result)] for the turns of one session."""
+    import sqlite3
+    from benchmarks.common import DB_MODULES
+    for name in DB_MODULES:
+        __import__(name).DB_PATH = db_path
+    from billing_tools import get_billing_history
+    from claims_tools import check_claim_status, get_customer_claims
+    from customer_tools import lookup_customer
+    from policy_tools import get_customer_policies
+    tools = {t.name: t for t in (lookup_customer, get_customer_policies, get_customer_claims,
+                                 check_claim_status, get_billing_history)}
+
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("""
+        SELECT cu.customer_id, cu.email, MIN(c.claim_id)
+        FROM customers cu
+        LEFT JOIN policies p ON p.customer_id = cu.customer_id
+        LEFT JOIN claims c ON c.policy_number = p.policy_number
+        GROUP BY cu.customer_id ORDER BY cu.customer_id LIMIT ?
+    """, (limit,)).fetchall()
+    conn.close()
+
+    outputs = []
+    for customer_id, email, claim_id in rows:
+        calls = [("lookup_customer", {"email": email}),
+                 ("get_customer_policies", {"customer_id": customer_id}),
+                 ("get_customer_claims", {"customer_id": customer_id}),
+                 ("check_claim_status", {"claim_id": claim_id or "CLM-000000"}),
+                 ("get_billing_history", {"customer_id": customer_id})]
+        outputs.append((email, [(name, args, tools[name].invoke(args)) for name, args in calls]))
+    return outputs
+
+
+def _llm_metadata() -> dict:
+    """What ChatOpenAI attaches to every AIMessage."""
+    return {
+        "response_metadata": {
+            "token_usage": {"completion_tokens": 42, "prompt_tokens": 1830, "total_tokens": 1872,
+                            "completion_tokens_details": {"accepted_prediction_tokens": 0, "audio_tokens": 0,
+                                                          "reasoning_tokens": 0, "rejected_prediction_tokens": 0},
+                            "prompt_tokens_details": {"audio_tokens": 0, "cached_tokens": 1536}},
+            "model_name": "gpt-4o-mini-2024-07-18", "system_fingerprint": "fp_" + uuid.uuid4().hex[:10],
+            "id": "chatcmpl-" + uuid.uuid4().hex[:29], "service_tier": "default", "finish_reason": "stop",
+            "logprobs": None,
+        },
+        "additional_kwargs": {"refusal": None},
+        "usage_metadata": {"input_tokens": 1830, "output_tokens": 42, "total_tokens": 1872,
+                           "input_token_details": {"audio": 0, "cache_read": 1536},
+                           "output_token_details": {"audio": 0, "reasoning": 0}},
+    }
+
+
+def build_history(email: str, calls: list, turns: int) -> list:
+    from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+    def new_id() -> str:
+        return str(uuid.uuid4())
+
+    questions = {"lookup_customer": f"I am {email}. Who am I?", "get_customer_policies": "What policies do I have?",
+                 "get_customer_claims": "How are my claims going?", "check_claim_status": "What's the status of my claim?",
+                 "get_billing_history": "Do I owe anything?"}
+    messages = []
+    for name, args, result in calls[:1] + calls[1:][:turns]:
+        call_id = "call_" + uuid.uuid4().hex[:24]
+        content = result if isinstance(result, str) else json.dumps(result, ensure_ascii=False)  # as ToolNode does
+        messages += [
+            HumanMessage(content=questions[name], id=new_id()),
+            AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": call_id}], id=new_id(),
+                      **_llm_metadata()),
+            ToolMessage(content=content, name=name, tool_call_id=call_id, id=new_id()),
+            AIMessage(content=f"Here is what I found: {content[:300]}", id=new_id(), **_llm_metadata()),
+        ]
+    return messages
+
+
+# --- CHILD: one mode, fresh process ---
+def child(mode: str, db_path: str, sessions: int, turns: int, ceiling_mb: float):
+    os.environ["SESSION_SPILL_DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="insure-spill-"), "spill.db")
+    import session_memory
+    outputs = tool_outputs(db_path, 1000)
+    histories = session_memory.SessionHistories(
+        ceiling_bytes=int(ceiling_mb * 1024 * 1024) if mode == "ceiling" else 1 << 62)
+    build_history(*outputs[0], turns)  # import / warm everything before measuring
+    gc.collect()
+    before = rss_bytes()
+
+    store = {}
+    start = time.perf_counter()
+    for i in range(sessions):
+        email, calls = outputs[i % len(outputs)]
+        messages = build_history(email, calls, turns)
+        if mode == "objects":
+            store[f"s{i}"] = {"messages": messages}
+        else:
+            histories.store(f"s{i}", messages)
+    build_s = time.perf_counter() - start
+    gc.collect()
+    after = rss_bytes()
+
+    result = {"mode": mode, "rss_bytes": after - before, "build_s": build_s, "messages": len(messages)}
+    if mode != "objects":
+        session = {}
+        samples = []
+        for i in range(0, sessions, max(1, sessions // 200)):
+            t = time.perf_counter()
+            with histories.checkout(f"s{i}", session):
+                pass
+            samples.append(time.perf_counter() - t)
+        samples.sort()
+        result.update(tracked_bytes=histories.total_bytes, checkout_ms=samples[len(samples) // 2] * 1000,
+                      **{k: v for k, v in histories.stats().items() if k in ("in_memory", "spilled")})
+    print(json.dumps(result))
+
+
+def run_child(mode: str, args, db_path: str) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.session_memory_bench", "--child", mode, "--db", db_path,
+         "--sessions", str(args.sessions), "--turns", str(args.turns), "--ceiling-mb", str(args.ceiling_mb)],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=10000)
+    parser.add_argument("--turns", type=int, default=4, help="Tool-calling turns per session after login")
+    parser.add_argument("--ceiling-mb", type=float, default=16, help="SESSION_MEMORY_MB for the ceiling mode")
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--db", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        from benchmarks import common  # noqa: F401  (sys.path)
+        child(args.child, args.db, args.sessions, args.turns, args.ceiling_mb)
+        return
+
+    from benchmarks.common import generated_db
+    db_path = generated_db()
+    scale = 10000 / args.sessions
+    print(f"\n{args.sessions} sessions, {args.turns} turns each\n")
+    print(f"{'mode':<9} {'RSS MB/10k':>11} {'tracked MB':>11} {'in memory':>10} {'spilled':>8} "
+          f"{'build s':>8} {'checkout ms':>12}")
+    for mode in MODES:
+        r = run_child(mode, args, db_path)
+        tracked = f"{r['tracked_bytes'] / 2**20:.1f}" if "tracked_bytes" in r else "-"
+        checkout = f"{r['checkout_ms']:.2f}" if "checkout_ms" in r else "-"
+        print(f"{mode:<9} {r['rss_bytes'] * scale / 2**20:>11.1f} {tracked:>11} {r.get('in_memory', args.sessions):>10} "
+              f"{r.get('spilled', 0):>8} {r['build_s']:>8.1f} {checkout:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+benchmarks/templates_bench.py
+Compares end-to-end latency and LLM calls per turn with response templates off vs on.
+
+Usage:
+    cd backend
+    python -m benchmarks.templates_bench --llm-latency 0.4 --rounds 5
+"""
+import argparse
+import time
+
+from benchmarks.common import generated_db, pick_customer, percentile
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+import agent_supervisor
+import llm_gateway
+import response_templates
+from fake_llm import FakeChatModel
+
+
+def build_workload(ids: dict) -> list:
+    """(question, route, tool name, tool args) for deterministic lookups."""
+    return [
+        ("What's my VIN?", "policy_agent", "get_vehicle_details", {"policy_number": ids["motor_policy"]}),
+        ("What is my licence plate?", "policy_agent", "get_vehicle_details", {"policy_number": ids["motor_policy"]}),
+        (f"Status of {ids['claim_id']}?", "claims_agent", "check_claim_status", {"claim_id": ids["claim_id"]}),
+        ("Do I owe anything?", "billing_agent", "get_billing_history", {"customer_id": ids["customer_id"]}),
+        (f"What is the premium for {ids['motor_policy']}?", "policy_agent", "get_policy_details", {"policy_number": ids["motor_policy"]}),
+    ]
+
+
+def make_responder(turn: dict):
+    def respond(messages, tools):
+        if tools and tools[0]["function"]["name"] == "RouterOutput":
+            return {"next": turn["route"]}
+        if isinstance(messages[-1], HumanMessage):
+            return AIMessage(content="", tool_calls=[{"name": turn["tool"], "args": turn["args"], "id": f"call_{time.time_ns()}"}])
+        if isinstance(messages[-1], ToolMessage):
+            return f"Here is what I found:\n{messages[-1].content}"
+        return "OK"
+    return respond
+
+
+def run(workload, fake, customer_id, rounds) -> dict:
+    latencies, calls, templated = [], [], 0
+    for _ in range(rounds):
+        for question, route, tool, args in workload:
+            turn = {"route": route, "tool": tool, "args": args}
+            fake.responder = make_responder(turn)
+            fake.reset_calls()
+            start = time.perf_counter()
+            out = agent_supervisor.graph.invoke({
+                "messages": [HumanMessage(content=question)],
+                "authenticated_customer_id": customer_id,
+            })
+            latencies.append(time.perf_counter() - start)
+            calls.append(fake.calls)
+            templated += bool(out["messages"][-1].response_metadata.get("templated"))
+    return {
+        "turns": len(latencies),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "llm_calls_per_turn": sum(calls) / len(calls),
+        "templated_turns": templated,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--llm-latency", type=float, default=0.4, help="Simulated seconds per LLM call")
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    db_path = generated_db()
+    ids = pick_customer(db_path)
+    fake = FakeChatModel(latency_s=args.llm_latency)
+    llm_gateway.use_model(fake)
+    workload = build_workload(ids)
+
+    results = {}
+    for enabled in (False, True):
+        response_templates.ENABLED = enabled
+        results["on" if enabled else "off"] = run(workload, fake, ids["customer_id"], args.rounds)
+
+    print(f"\n{'templates':<10} {'turns':>6} {'p50 ms':>9} {'p95 ms':>9} {'LLM calls/turn':>15} {'templated':>10}")
+    for label, r in results.items():
+        print(f"{label:<10} {r['turns']:>6} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} "
+              f"{r['llm_calls_per_turn']:>15.2f} {r['templated_turns']:>10}")
+
+
+if __name__ == "__main__":
+    main()
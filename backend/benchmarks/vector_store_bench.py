@@ -0,0 +1,112 @@
+"""
+benchmarks/vector_store_bench.py
+Compares FAQ vector store backends (chroma, numpy): startup time, RSS and
+top-k query latency. Uses random unit vectors, so no embedding model is needed
+and only the store itself is measured.
+
+Each backend is built once, then measured in a fresh subprocess.
+
+Usage:
+    cd backend
+    python -m benchmarks.vector_store_bench --docs 2000 --queries 500
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DIM = 384  # all-MiniLM-L6-v2
+
+BUILD = r"""
+import sys, numpy as np
+backend, path, docs, dim = sys.argv[1], sys.argv[2], int(sys.argv[3]), int(sys.argv[4])
+rng = np.random.default_rng(7)
+vectors = rng.standard_normal((docs, dim)).astype("float32")
+ids = [f"faq{i}" for i in range(docs)]
+documents = [f"Question: synthetic {i}\nAnswer: text" for i in range(docs)]
+metadatas = [{"question": f"synthetic {i}", "answer": "text"} for i in range(docs)]
+if backend == "numpy":
+    from vectordb.stores import NumpyVectorStore
+    store = NumpyVectorStore(path)
+else:
+    import chromadb
+    from chromadb.config import Settings
+    from vectordb.stores import ChromaVectorStore
+    client = chromadb.PersistentClient(path=path, settings=Settings(anonymized_telemetry=False))
+    store = ChromaVectorStore(client.get_or_create_collection("bench", metadata={"hnsw:space": "cosine"}))
+for i in range(0, docs, 500):
+    store.upsert(ids[i:i+500], vectors[i:i+500], documents[i:i+500], metadatas[i:i+500])
+"""
+
+PROBE = r"""
+import json, sys, time
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+backend, path, queries, dim = sys.argv[1], sys.argv[2], int(sys.argv[3]), int(sys.argv[4])
+base_rss = rss_mb()
+t0 = time.perf_counter()
+import numpy as np
+if backend == "numpy":
+    from vectordb.stores import NumpyVectorStore
+    store = NumpyVectorStore(path)
+else:
+    import chromadb
+    from chromadb.config import Settings
+    from vectordb.stores import ChromaVectorStore
+    client = chromadb.PersistentClient(path=path, settings=Settings(anonymized_telemetry=False))
+    store = ChromaVectorStore(client.get_or_create_collection("bench", metadata={"hnsw:space": "cosine"}))
+store.count()
+startup = time.perf_counter() - t0
+rng = np.random.default_rng(11)
+qs = rng.standard_normal((queries, dim)).astype("float32")
+store.query(qs[:1], 8)
+first = time.perf_counter() - t0
+lat = []
+for q in qs:
+    s = time.perf_counter()
+    store.query(q[None, :], 8)
+    lat.append(time.perf_counter() - s)
+lat.sort()
+print(json.dumps({
+    "startup_ms": startup * 1000,
+    "first_query_ready_ms": first * 1000,
+    "p50_us": lat[len(lat) // 2] * 1e6,
+    "p95_us": lat[int(len(lat) * 0.95)] * 1e6,
+    "rss_mb": rss_mb(),
+    "rss_delta_mb": rss_mb() - base_rss,
+}))
+"""
+
+
+def _run(script: str, *args) -> str:
+    out = subprocess.run([sys.executable, "-c", script, *map(str, args)],
+                         cwd=BACKEND_DIR, capture_output=True, text=True, check=True)
+    return out.stdout.strip().splitlines()[-1] if out.stdout.strip() else ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--backends", nargs="+", default=["chroma", "numpy"])
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="vector-store-bench-")
+    print(f"{'backend':<8} {'startup ms':>11} {'1st query ms':>13} {'p50 us':>9} {'p95 us':>9} {'RSS MB':>8} {'ΔRSS MB':>8}")
+    for backend in args.backends:
+        path = os.path.join(workdir, backend)
+        _run(BUILD, backend, path, args.docs, DIM)
+        r = json.loads(_run(PROBE, backend, path, args.queries, DIM))
+        print(f"{backend:<8} {r['startup_ms']:>11.1f} {r['first_query_ready_ms']:>13.1f} {r['p50_us']:>9.1f} "
+              f"{r['p95_us']:>9.1f} {r['rss_mb']:>8.1f} {r['rss_delta_mb']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
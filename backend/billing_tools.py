@@ -1,6 +1,9 @@
 """
 billing_tools.py
 Domain: Smart Invoices (Read-Only Connection to Existing DB)
+
+Totals (what is outstanding / overdue) come from customer_rollup.py, not from
+summing the listed bills.
 """
 import os
 import sqlite3
@@ -8,6 +11,8 @@ from langchain_core.tools import tool
 from langchain_core.runnables import RunnableConfig
 from pydantic import BaseModel, Field
 
+import customer_rollup
+
 DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "db", "insurance_support.db")
 
 def get_conn():
@@ -25,6 +30,11 @@ def dict_factory(cursor, row):
 class HistoryInput(BaseModel):
     customer_id: str = Field(description="The internal Customer ID (e.g., CUST001)")
 
+def outstanding_line(totals: dict) -> str:
+    """Summary line closing the bill list (parsed by response_templates._render_owe)."""
+    return (f"Outstanding: ${totals['outstanding_amount']:.2f} across {totals['outstanding_bills']} unpaid bill(s); "
+            f"overdue: ${totals['overdue_amount']:.2f} across {totals['overdue_bills']}")
+
 # --- TOOLS ---
 @tool(args_schema=HistoryInput)
 def get_billing_history(customer_id: str, config: RunnableConfig = None):
@@ -64,7 +74,8 @@ def get_billing_history(customer_id: str, config: RunnableConfig = None):
 
         report = []
         for r in rows:
-            final_status = "PAID" if r.get('payment_status') == 'Success' else r.get('bill_status', 'Unknown')
+            settled = str(r.get('payment_status') or '').lower() in customer_rollup.SETTLING_PAYMENTS
+            final_status = "PAID" if settled else r.get('bill_status', 'Unknown')
 
             detail = f"• {r['due_date']} | {r['policy_type']} (Bill: {r['bill_id']}): ${r['amount']} -> [{final_status}]"
 
@@ -73,6 +84,10 @@ def get_billing_history(customer_id: str, config: RunnableConfig = None):
 
             report.append(detail)
 
+        totals = customer_rollup.get(customer_id)
+        if totals:
+            report.append(outstanding_line(totals))
+
         return "\n".join(report)
     finally:
         conn.close()
@@ -0,0 +1,312 @@
+"""
+cassette.py
+Domain: Conversation Record / Replay
+
+Recording (CASSETTE_RECORD=1): every API turn (login, chat, clear_history) is appended
+as one JSON line to CASSETTE_DIR/<UTC date>.jsonl with:
+- the user input and final reply
+- each LLM call made through llm_gateway: node, a digest of the request messages
+  (plus the last one), the response (content, tool calls, usage) and its latency
+- each tool call with its result
+PII is redacted before anything is written: the customer's own profile values (name,
+NRIC, email, phone, address, date of birth) and pattern matches for emails, NRIC/FIN,
+phone numbers, card numbers, VINs and licence plates. Session IDs are stored as a
+hash. Internal keys (CUST/POL/CLM/BILL IDs) are kept so tool calls stay meaningful.
+
+Replay (benchmarks/replay.py): inside `replaying(turn)`, the gateway answers each LLM
+call and the tool nodes answer each tool call from the recorded turn, so the graph runs
+with no network and no database. Calls the recording cannot answer are counted as
+divergences (a routing or prompt change since the recording).
+"""
+import contextvars
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+
+RECORD = os.getenv("CASSETTE_RECORD", "0").lower() in ("1", "true", "yes")
+CASSETTE_DIR = os.getenv("CASSETTE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cassettes"))
+DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "db", "insurance_support.db")
+
+# Stored request tail / tool results are truncated to keep cassettes compact
+MAX_TEXT = 4000
+
+_recording: contextvars.ContextVar[Optional["_Recorder"]] = contextvars.ContextVar("cassette_recording", default=None)
+_replay: contextvars.ContextVar[Optional["Replay"]] = contextvars.ContextVar("cassette_replay", default=None)
+_write_lock = threading.Lock()
+
+# --- REDACTION ---
+PII_PATTERNS = [
+    ("<EMAIL>", re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")),
+    ("<NRIC>", re.compile(r"\b[STFGM]\d{7}[A-Z]\b")),
+    ("<CARD>", re.compile(r"\b(?:\d[ -]?){13,18}\d\b")),
+    ("<PHONE>", re.compile(r"(?<![\w-])(?:\+65[ -]?)?[689]\d{3}[ -]?\d{4}(?![\w-])")),
+    ("<VIN>", re.compile(r"\b[A-HJ-NPR-Z0-9]{17}\b")),
+    ("<PLATE>", re.compile(r"\b[SEFG][A-HJ-NP-Z]{1,2}\d{1,4}[A-Z]\b")),
+]
+PROFILE_FIELDS = ("nric", "first_name", "last_name", "email", "phone", "date_of_birth", "address", "postal_code")
+
+
+def customer_pii(customer_id: str) -> Optional[re.Pattern]:
+    """Pattern matching the customer's own profile values (whole words), or None."""
+    if not customer_id or not os.path.exists(DB_PATH):
+        return None
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        row = conn.execute(
+            f"SELECT {', '.join(PROFILE_FIELDS)} FROM customers WHERE customer_id = ?", (customer_id,)
+        ).fetchone()
+        conn.close()
+    except sqlite3.Error:
+        return None
+    values = sorted({str(v) for v in (row or ()) if v and len(str(v)) >= 3}, key=len, reverse=True)
+    if not values:
+        return None
+    return re.compile(r"(?<!\w)(?:" + "|".join(re.escape(v) for v in values) + r")(?!\w)")
+
+
+def redact(value, terms: Optional[re.Pattern] = None):
+    """Redacts strings anywhere in a JSON-like value."""
+    if isinstance(value, str):
+        for label, pattern in PII_PATTERNS:
+            value = pattern.sub(label, value)
+        return terms.sub("<PII>", value) if terms is not None else value
+    if isinstance(value, dict):
+        return {k: redact(v, terms) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(v, terms) for v in value]
+    return value
+
+
+# --- SERIALIZATION ---
+def _text(content) -> str:
+    if isinstance(content, str):
+        return content
+    return json.dumps(content, ensure_ascii=False, default=str)
+
+
+def as_messages(llm_input) -> List[BaseMessage]:
+    """Normalizes an LLM input (string, prompt value or message list) to messages."""
+    if isinstance(llm_input, str):
+        return [HumanMessage(content=llm_input)]
+    if hasattr(llm_input, "to_messages"):
+        return llm_input.to_messages()
+    return list(llm_input)
+
+
+def request_summary(llm_input, terms: Optional[re.Pattern] = None) -> dict:
+    """Compact form of an LLM request: message count, digest and the last message."""
+    messages = [(m.type, redact(_text(m.content), terms)) for m in as_messages(llm_input)]
+    digest = hashlib.sha256(json.dumps(messages, ensure_ascii=False).encode()).hexdigest()[:16]
+    last = messages[-1] if messages else ("", "")
+    return {"messages": len(messages), "digest": digest, "last": {"type": last[0], "content": last[1][:MAX_TEXT]}}
+
+
+def response_dict(message: AIMessage, terms: Optional[re.Pattern] = None) -> dict:
+    data = {
+        "content": _text(message.content),
+        "tool_calls": [{"name": tc["name"], "args": tc["args"], "id": tc["id"]} for tc in message.tool_calls],
+    }
+    # json_schema structured output: the provider puts the parsed object next to the content
+    parsed = message.additional_kwargs.get("parsed")
+    if parsed is not None:
+        data["parsed"] = parsed.model_dump() if hasattr(parsed, "model_dump") else parsed
+    return redact(data, terms) | {"usage": dict(message.usage_metadata or {})}
+
+
+def response_message(data: dict) -> AIMessage:
+    return AIMessage(
+        content=data.get("content", ""),
+        additional_kwargs={"parsed": data["parsed"]} if "parsed" in data else {},
+        tool_calls=[{**tc, "type": "tool_call"} for tc in data.get("tool_calls", [])],
+        usage_metadata=data.get("usage") or None,
+    )
+
+
+def _session_key(session_id: str) -> str:
+    return hashlib.sha256(session_id.encode()).hexdigest()[:12]
+
+
+# --- RECORDING ---
+class _Recorder:
+    def __init__(self, endpoint: str, session_id: str, customer_id: str, user_input: str, state: dict):
+        self.terms = customer_pii(customer_id)
+        self.started = datetime.now(timezone.utc)
+        self.entry = {
+            "ts": self.started.isoformat(),
+            "endpoint": endpoint,
+            "session": _session_key(session_id),
+            "customer_id": customer_id,
+            "state": state,
+            "input": redact(user_input, self.terms),
+            "llm": [],
+            "tools": [],
+        }
+
+    def llm(self, node: str, llm_input, message: AIMessage, seconds: float):
+        self.entry["llm"].append({
+            "node": node,
+            "ms": round(seconds * 1000, 1),
+            "request": request_summary(llm_input, self.terms),
+            "response": response_dict(message, self.terms),
+        })
+
+    def finish(self, new_messages: List[BaseMessage], reply: str, **attrs):
+        for m in new_messages:
+            if isinstance(m, ToolMessage):
+                self.entry["tools"].append(redact({
+                    "name": m.name, "id": m.tool_call_id, "status": getattr(m, "status", "success"),
+                    "result": _text(m.content)[:MAX_TEXT],
+                }, self.terms))
+        elapsed = (datetime.now(timezone.utc) - self.started).total_seconds()
+        self.entry.update(reply=redact(reply or "", self.terms), ms=round(elapsed * 1000, 1), **attrs)
+        _append(self.entry)
+
+
+def _append(entry: dict):
+    os.makedirs(CASSETTE_DIR, exist_ok=True)
+    path = os.path.join(CASSETTE_DIR, f"{entry['ts'][:10]}.jsonl")
+    line = json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n"
+    with _write_lock, open(path, "a", encoding="utf-8") as f:
+        f.write(line)
+
+
+@contextmanager
+def recording(endpoint: str, session_id: str, customer_id: str, user_input: str, **state):
+    """
+    Records the enclosed API turn when CASSETTE_RECORD is on (yields None otherwise).
+    The caller ends the turn with recorder.finish(new_messages, reply, **attrs).
+    """
+    if not RECORD:
+        yield None
+        return
+    recorder = _Recorder(endpoint, session_id, customer_id, user_input, state)
+    token = _recording.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _recording.reset(token)
+
+
+def note_state(**state):
+    """Adds graph-state inputs decided mid-turn (e.g. prefer_templates) to the recording."""
+    recorder = _recording.get()
+    if recorder is not None:
+        recorder.entry["state"].update(state)
+
+
+def record_llm(node: str, llm_input, message: AIMessage, seconds: float):
+    """Called by llm_gateway after every LLM response."""
+    recorder = _recording.get()
+    if recorder is not None:
+        recorder.llm(node, llm_input, message, seconds)
+
+
+# --- REPLAY ---
+class Replay:
+    """Recorded answers for one turn, plus what the replayed run did differently."""
+
+    def __init__(self, turn: dict, tools: bool = True, latency_scale: float = 0.0):
+        self.turn = turn
+        self.tools = tools
+        self.latency_scale = latency_scale
+        self.llm: Dict[str, deque] = defaultdict(deque)
+        for call in turn.get("llm", []):
+            self.llm[call["node"]].append(call)
+        self.tool_results = {t["id"]: t for t in turn.get("tools", [])}
+        self.llm_calls = 0
+        self.tool_calls = 0
+        self.llm_missing: List[str] = []
+        self.tool_missing: List[str] = []
+        self.request_drift: List[str] = []
+
+    def answer_llm(self, node: str, llm_input) -> AIMessage:
+        queue = self.llm[node]
+        if not queue:
+            self.llm_missing.append(node)
+            raise CassetteMiss(f"no recorded LLM call left for node '{node}'")
+        call = queue.popleft()
+        self.llm_calls += 1
+        self.tool_calls += len(call["response"].get("tool_calls", []))
+        if self.latency_scale:
+            time.sleep(call["ms"] / 1000 * self.latency_scale)
+        if request_summary(llm_input)["digest"] != call["request"]["digest"]:
+            self.request_drift.append(node)
+        return response_message(call["response"])
+
+    def answer_tools(self, tool_calls: List[dict]) -> List[ToolMessage]:
+        messages = []
+        for tc in tool_calls:
+            recorded = self.tool_results.get(tc["id"])
+            if recorded is None:
+                self.tool_missing.append(tc["name"])
+                messages.append(ToolMessage(content=f"Error: {tc['name']} result not in cassette",
+                                            name=tc["name"], tool_call_id=tc["id"], status="error"))
+            else:
+                messages.append(ToolMessage(content=recorded["result"], name=tc["name"], tool_call_id=tc["id"],
+                                            status=recorded.get("status", "success")))
+        return messages
+
+    def llm_unused(self) -> List[str]:
+        return [node for node, queue in self.llm.items() for _ in queue]
+
+
+class CassetteMiss(Exception):
+    """The replayed run made an LLM call the recording has no answer for."""
+
+
+@contextmanager
+def replaying(turn: dict, tools: bool = True, latency_scale: float = 0.0):
+    """
+    Answers LLM calls (and tool calls, unless tools=False) in the block from `turn`,
+    after latency_scale x the recorded LLM latency. Yields the Replay for divergence counts.
+    """
+    replay = Replay(turn, tools, latency_scale)
+    token = _replay.set(replay)
+    try:
+        yield replay
+    finally:
+        _replay.reset(token)
+
+
+def replayed_llm(node: str, llm_input) -> Optional[AIMessage]:
+    """The recorded response when replaying, else None (call the model)."""
+    replay = _replay.get()
+    return replay.answer_llm(node, llm_input) if replay is not None else None
+
+
+def replaying_tools() -> bool:
+    replay = _replay.get()
+    return replay is not None and replay.tools
+
+
+def replayed_tools(tool_calls: List[dict]) -> Optional[List[ToolMessage]]:
+    """Recorded ToolMessages for `tool_calls` when replaying tools, else None (run them)."""
+    replay = _replay.get()
+    if replay is None or not replay.tools:
+        return None
+    return replay.answer_tools(tool_calls)
+
+
+def load(paths: List[str]) -> List[dict]:
+    """Turns from cassette files (or directories of them), in recording order."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, f) for f in sorted(os.listdir(path)) if f.endswith(".jsonl"))
+        else:
+            files.append(path)
+    turns = []
+    for file in files:
+        with open(file, encoding="utf-8") as f:
+            turns.extend(json.loads(line) for line in f if line.strip())
+    return sorted(turns, key=lambda t: t["ts"])
@@ -0,0 +1,225 @@
+"""
+claim_intake.py
+Domain: Bulk Claim Intake (CSV / JSONL)
+
+Back-office staff and partner garages upload claims in bulk (api.py, POST /api/claims/bulk)
+instead of filing them one by one through chat. One row per claim:
+    customer_id, policy_number, claim_date (YYYY-MM-DD), claim_amount, description[, reference]
+
+The upload is parsed as a stream and handled CHUNK_ROWS rows at a time, so memory stays
+flat however large the file is:
+1. parse and validate each row (fields, date, amount)
+2. one lookup per chunk for its policies (exists, belongs to the row's customer), on a
+   connection opened for that chunk: a streamed response resumes the generator on
+   whichever threadpool thread is free, so nothing SQLite is held across a yield
+3. one claim_writer.file_claims call per chunk (single writer, executemany, idempotent);
+   if it fails (writer timeout or error), that chunk's rows are reported failed and the
+   upload goes on with the next chunk
+4. one result line per row, streamed back as NDJSON, then a summary line, always
+
+Idempotency: a row with a `reference` (the sender's own claim number) is keyed on it,
+scoped to the row's customer and policy so two senders' references cannot collide, and
+that key never expires; otherwise on the same fields as a claim filed in chat
+(claims_tools.file_new_claim), so re-sending a file, or a claim already filed in chat,
+within CLAIM_DEDUPE_WINDOW_S returns the existing claim id (claim_writer.py).
+
+Access: requests must carry X-Intake-Token equal to CLAIM_INTAKE_TOKEN; unset disables it.
+"""
+import codecs
+import csv
+import json
+import logging
+import os
+import secrets
+import sqlite3
+from datetime import date
+from itertools import islice
+from typing import BinaryIO, Dict, Iterator, Optional, Tuple
+
+import claim_writer
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "db", "insurance_support.db")
+
+INTAKE_TOKEN = os.getenv("CLAIM_INTAKE_TOKEN", "")
+CHUNK_ROWS = int(os.getenv("CLAIM_INTAKE_CHUNK_ROWS", "500"))
+MAX_AMOUNT = 1_000_000
+
+FIELDS = ("customer_id", "policy_number", "claim_date", "claim_amount", "description")
+CSV, JSONL = "csv", "jsonl"
+
+# Row outcomes
+CREATED, DUPLICATE, REJECTED, FAILED = "created", "duplicate", "rejected", "failed"
+
+
+class IntakeError(ValueError):
+    """The upload as a whole cannot be read (format, header)."""
+
+
+def authorized(token: Optional[str]) -> bool:
+    return bool(INTAKE_TOKEN and token and secrets.compare_digest(token, INTAKE_TOKEN))
+
+
+def detect_format(filename: Optional[str], content_type: Optional[str]) -> str:
+    name = (filename or "").lower()
+    if name.endswith((".jsonl", ".ndjson")) or "ndjson" in (content_type or "") or "jsonl" in (content_type or ""):
+        return JSONL
+    if name.endswith(".csv") or "csv" in (content_type or ""):
+        return CSV
+    raise IntakeError("Upload a .csv or .jsonl file.")
+
+
+# --- PARSING ---
+def read_rows(stream: BinaryIO, fmt: str) -> Iterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """
+    (row number, raw row or None, parse error or None), one at a time. A CSV header is
+    read and checked here, before the first row, so a bad file fails up front.
+    """
+    text = codecs.getreader("utf-8-sig")(stream, errors="replace")
+    if fmt == CSV:
+        reader = csv.DictReader(text)
+        missing = [f for f in FIELDS if f not in (reader.fieldnames or [])]
+        if missing:
+            raise IntakeError(f"CSV header is missing: {', '.join(missing)}")
+        return ((row_no, row, None) for row_no, row in enumerate(reader, start=1))
+    return _jsonl_rows(text)
+
+
+def _jsonl_rows(text) -> Iterator[Tuple[int, Optional[dict], Optional[str]]]:
+    row_no = 0
+    for line in text:
+        if not line.strip():
+            continue
+        row_no += 1
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield row_no, None, f"invalid JSON: {e.msg}"
+            continue
+        if not isinstance(row, dict):
+            yield row_no, None, "each line must be a JSON object"
+            continue
+        yield row_no, row, None
+
+
+def validate(row: dict) -> Tuple[Optional[dict], Optional[str]]:
+    """Normalized filing fields, or the reason the row is rejected."""
+    values = {f: str(row.get(f) if row.get(f) is not None else "").strip() for f in FIELDS}
+    missing = [f for f in FIELDS if not values[f]]
+    if missing:
+        return None, f"missing {', '.join(missing)}"
+    try:
+        claim_date = date.fromisoformat(values["claim_date"])
+    except ValueError:
+        return None, "claim_date must be YYYY-MM-DD"
+    if claim_date > date.today():
+        return None, "claim_date is in the future"
+    try:
+        amount = round(float(values["claim_amount"]), 2)
+    except ValueError:
+        return None, "claim_amount must be a number"
+    if not 0 < amount <= MAX_AMOUNT:
+        return None, f"claim_amount must be between 0 and {MAX_AMOUNT}"
+    reference = str(row.get("reference") or "").strip()
+    return {**values, "claim_date": claim_date.isoformat(), "claim_amount": amount, "reference": reference}, None
+
+
+def _policy_owners(policy_numbers: set) -> Dict[str, str]:
+    numbers = list(policy_numbers)
+    if not numbers:
+        return {}
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        return dict(conn.execute(
+            f"SELECT policy_number, customer_id FROM policies WHERE policy_number IN ({','.join('?' * len(numbers))})",
+            numbers,
+        ).fetchall())
+    finally:
+        conn.close()
+
+
+# --- PROCESSING ---
+def _idempotency_key(filing: dict) -> str:
+    if filing["reference"]:
+        return claim_writer.idempotency_key("intake", filing["customer_id"], filing["policy_number"],
+                                            filing["reference"])
+    return claim_writer.idempotency_key(filing["customer_id"], filing["policy_number"], filing["claim_date"],
+                                        filing["description"], f"{filing['claim_amount']:.2f}")
+
+
+def _process_chunk(chunk: list) -> Iterator[dict]:
+    checked = []  # (row_no, filing or None, error or None)
+    for row_no, row, error in chunk:
+        filing = None
+        if error is None:
+            filing, error = validate(row)
+        checked.append((row_no, filing, error))
+
+    owners = _policy_owners({f["policy_number"] for _, f, _ in checked if f})
+    accepted = []
+    for i, (row_no, filing, error) in enumerate(checked):
+        if filing is None:
+            continue
+        owner = owners.get(filing["policy_number"])
+        if owner is None:
+            checked[i] = (row_no, None, f"policy {filing['policy_number']} not found")
+        elif owner != filing["customer_id"]:
+            checked[i] = (row_no, None, f"policy {filing['policy_number']} does not belong to {filing['customer_id']}")
+        else:
+            accepted.append(filing)
+
+    filed = iter(_file(accepted))
+
+    for row_no, filing, error in checked:
+        if filing is None:
+            yield {"row": row_no, "status": REJECTED, "error": error}
+            continue
+        result = next(filed)
+        if result["status"] != "success":
+            yield {"row": row_no, "status": FAILED, "error": result["msg"]}
+        else:
+            yield {"row": row_no, "status": DUPLICATE if result.get("duplicate") else CREATED,
+                   "claim_id": result["claim_id"]}
+
+
+def _file(accepted: list) -> list:
+    """
+    claim_writer results for the accepted filings; a failed write fails each of them. A
+    timed-out chunk may still commit later; re-sending its rows is safe (idempotency keys).
+    """
+    try:
+        return claim_writer.file_claims([{
+            "policy_number": f["policy_number"], "claim_date": f["claim_date"], "claim_amount": f["claim_amount"],
+            "description": f["description"],
+            "idempotency_key": _idempotency_key(f),
+            "dedupe_window_s": None if f["reference"] else claim_writer.DEDUPE_WINDOW_S,
+        } for f in accepted])
+    except Exception as e:  # writer timeout (concurrent.futures.TimeoutError) or a failed batch
+        error = str(e) or type(e).__name__
+        logger.error("bulk claim intake chunk failed", extra={"filings": len(accepted), "error": error})
+        return [{"status": "error", "msg": f"Claim could not be filed: {error}"}] * len(accepted)
+
+
+def ingest(rows: Iterator[Tuple[int, Optional[dict], Optional[str]]]) -> Iterator[dict]:
+    """One result per row of read_rows(), chunk by chunk, then {"summary": counts by status}."""
+    counts = {CREATED: 0, DUPLICATE: 0, REJECTED: 0, FAILED: 0}
+    while True:
+        chunk = list(islice(rows, CHUNK_ROWS))
+        if not chunk:
+            break
+        for result in _process_chunk(chunk):
+            counts[result["status"]] += 1
+            yield result
+    logger.info("bulk claim intake finished", extra={"counts": counts})
+    yield {"summary": {"rows": sum(counts.values()), **counts}}
+
+
+def ndjson(rows: Iterator[Tuple[int, Optional[dict], Optional[str]]]) -> Iterator[str]:
+    """ingest() as NDJSON, written out once per chunk of results rather than per line."""
+    lines = []
+    for result in ingest(rows):
+        lines.append(json.dumps(result))
+        if len(lines) >= CHUNK_ROWS or "summary" in result:
+            yield "\n".join(lines) + "\n"
+            lines = []
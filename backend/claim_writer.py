@@ -0,0 +1,273 @@
+"""
+claim_writer.py
+Domain: Transactional Claim Writes (Single Writer)
+
+Every claim insert goes through one writer thread with its own connection, so
+concurrent filings never race each other for the SQLite write lock ("database is
+locked"), and readers on other connections keep reading during writes (WAL mode).
+
+- Claim IDs: sequential CLM000301, CLM000302, ... continuing the seeded CLM###### ids.
+  Only the writer allocates them, so they cannot collide.
+- Idempotency: each filing carries a key, stored in claim_requests in the same
+  transaction as the claim. A filing whose key was stored within its dedupe window
+  (CLAIM_DEDUPE_WINDOW_S, or the filing's own dedupe_window_s; None never expires)
+  returns the existing claim instead of inserting a duplicate (a retried or repeated
+  tool call). Keys hashed from a claim's content expire, so a second genuine claim with
+  the same details filed later is a new claim; its key row then points at the new one.
+- Batching: filings queued while a commit runs (single tool calls, or bulk intake chunks
+  from claim_intake.py) are written together in the next transaction: one key lookup and
+  executemany inserts. If that fails, the transaction is retried row by row, one
+  savepoint each, so a failing row does not undo the others.
+"""
+import hashlib
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "db", "insurance_support.db")
+
+BATCH_MAX = int(os.getenv("CLAIM_WRITE_BATCH_MAX", "64"))
+WRITE_TIMEOUT_S = float(os.getenv("CLAIM_WRITE_TIMEOUT_S", "10"))
+DEDUPE_WINDOW_S = float(os.getenv("CLAIM_DEDUPE_WINDOW_S", "3600"))
+LOOKUP_CHUNK = 500  # keys per IN (...) lookup, under SQLite's bound-parameter limit
+
+ID_PREFIX = "CLM"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS claim_requests (
+    idempotency_key VARCHAR(64) PRIMARY KEY,
+    claim_id VARCHAR(20) NOT NULL,
+    created_at TIMESTAMP NOT NULL,
+    FOREIGN KEY (claim_id) REFERENCES claims(claim_id)
+);
+"""
+
+_lock = threading.Lock()
+_queue: "queue.Queue[tuple]" = queue.Queue()
+_writer: Optional[threading.Thread] = None
+
+
+def idempotency_key(*parts) -> str:
+    """Stable key from the filing's identifying fields (case and whitespace insensitive)."""
+    text = "|".join(" ".join(str(p).lower().split()) for p in parts)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+# --- WRITER ---
+def _connect() -> sqlite3.Connection:
+    # Autocommit mode: transactions are opened and committed explicitly below
+    conn = sqlite3.connect(DB_PATH, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=5000")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _last_sequence(conn: sqlite3.Connection) -> int:
+    row = conn.execute(
+        "SELECT COALESCE(MAX(CAST(SUBSTR(claim_id, ?) AS INTEGER)), 0) FROM claims WHERE claim_id GLOB ?",
+        (len(ID_PREFIX) + 1, f"{ID_PREFIX}[0-9]*"),
+    ).fetchone()
+    return row[0]
+
+
+def _created(claim_id: str) -> dict:
+    return {"status": "success", "claim_id": claim_id, "msg": "Claim filed successfully."}
+
+
+def _duplicate(claim_id: str) -> dict:
+    return {"status": "success", "claim_id": claim_id, "duplicate": True, "msg": "This claim was already filed."}
+
+
+def _failed(error: Exception) -> dict:
+    return {"status": "error", "msg": f"Claim could not be filed: {error}"}
+
+
+def _claim_row(claim_id: str, filing: dict) -> tuple:
+    return (claim_id, filing["policy_number"], filing["claim_date"], filing["claim_amount"], filing["description"])
+
+
+_INSERT_CLAIM = """INSERT INTO claims (claim_id, policy_number, claim_date, claim_amount, status, description)
+                   VALUES (?, ?, ?, ?, 'Pending', ?)"""
+# REPLACE: a key whose dedupe window has passed is reused by the new claim
+_INSERT_REQUEST = "INSERT OR REPLACE INTO claim_requests (idempotency_key, claim_id, created_at) VALUES (?, ?, ?)"
+
+
+def _existing_claims(conn: sqlite3.Connection, keys: list) -> Dict[str, Tuple[str, str]]:
+    """key -> (claim_id, created_at) for the keys already stored."""
+    found = {}
+    for i in range(0, len(keys), LOOKUP_CHUNK):
+        chunk = keys[i:i + LOOKUP_CHUNK]
+        for key, claim_id, created_at in conn.execute(
+            f"SELECT idempotency_key, claim_id, created_at FROM claim_requests "
+            f"WHERE idempotency_key IN ({','.join('?' * len(chunk))})",
+            chunk,
+        ):
+            found[key] = (claim_id, created_at)
+    return found
+
+
+def _duplicate_of(filing: dict, existing: Optional[Tuple[str, str]], now: datetime) -> Optional[str]:
+    """The claim id this filing repeats, if its key was stored within the filing's dedupe window."""
+    if existing is None:
+        return None
+    window = filing.get("dedupe_window_s", DEDUPE_WINDOW_S)
+    if window is not None and (now - datetime.fromisoformat(existing[1])).total_seconds() > window:
+        return None
+    return existing[0]
+
+
+def _insert_all(conn: sqlite3.Connection, seq: int, filings: list) -> Tuple[list, int]:
+    """Set-based path: one key lookup, then executemany for the new claims."""
+    existing = _existing_claims(conn, [f["idempotency_key"] for f in filings])
+    now = datetime.now(timezone.utc)
+    created_at = now.isoformat()
+    results, claims, requests = [], [], []
+    for filing in filings:
+        key = filing["idempotency_key"]
+        duplicate_of = _duplicate_of(filing, existing.get(key), now)
+        if duplicate_of is not None:
+            results.append(_duplicate(duplicate_of))
+            continue
+        seq += 1
+        claim_id = f"{ID_PREFIX}{seq:06d}"
+        existing[key] = (claim_id, created_at)
+        claims.append(_claim_row(claim_id, filing))
+        requests.append((key, claim_id, created_at))
+        results.append(_created(claim_id))
+    conn.executemany(_INSERT_CLAIM, claims)
+    conn.executemany(_INSERT_REQUEST, requests)
+    return results, seq
+
+
+def _insert_each(conn: sqlite3.Connection, seq: int, filings: list) -> Tuple[list, int]:
+    """Row-by-row path, one savepoint each, to isolate the rows that fail."""
+    results = []
+    for filing in filings:
+        conn.execute("SAVEPOINT filing")
+        try:
+            key = filing["idempotency_key"]
+            now = datetime.now(timezone.utc)
+            duplicate_of = _duplicate_of(filing, _existing_claims(conn, [key]).get(key), now)
+            if duplicate_of is not None:
+                result = _duplicate(duplicate_of)
+            else:
+                claim_id = f"{ID_PREFIX}{seq + 1:06d}"
+                conn.execute(_INSERT_CLAIM, _claim_row(claim_id, filing))
+                conn.execute(_INSERT_REQUEST, (key, claim_id, now.isoformat()))
+                result = _created(claim_id)
+                seq += 1
+            conn.execute("RELEASE filing")
+        except sqlite3.Error as e:
+            conn.execute("ROLLBACK TO filing")
+            conn.execute("RELEASE filing")
+            result = _failed(e)
+        results.append(result)
+    return results, seq
+
+
+def _transaction(conn: sqlite3.Connection, seq: int, filings: list, insert) -> Tuple[list, int]:
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        results, new_seq = insert(conn, seq, filings)
+        conn.execute("COMMIT")
+        return results, new_seq
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _write_batch(conn: sqlite3.Connection, seq: int, batch: list) -> int:
+    """Writes a batch of queued requests in one transaction; returns the last claim sequence used."""
+    filings = [f for item_filings, _, _ in batch for f in item_filings]
+    try:
+        results, seq = _transaction(conn, seq, filings, _insert_all)
+    except sqlite3.Error:
+        try:
+            results, seq = _transaction(conn, seq, filings, _insert_each)
+        except sqlite3.Error as e:
+            logger.error("claim batch failed", extra={"filings": len(filings), "error": str(e)})
+            results, seq = [_failed(e)] * len(filings), _last_sequence(conn)
+
+    metrics.CLAIM_WRITE_BATCH.observe(len(filings))
+    now = time.perf_counter()
+    for result in results:
+        outcome = "duplicate" if result.get("duplicate") else ("created" if result["status"] == "success" else "error")
+        metrics.CLAIM_WRITES.inc(outcome=outcome)
+    start = 0
+    for item_filings, future, queued_at in batch:
+        metrics.CLAIM_WRITE_SECONDS.observe(now - queued_at)
+        future.set_result(results[start:start + len(item_filings)])
+        start += len(item_filings)
+    return seq
+
+
+def _write_loop():
+    conn = _connect()
+    seq = _last_sequence(conn)
+    while True:
+        batch = [_queue.get()]
+        size = len(batch[0][0])
+        while size < BATCH_MAX:
+            try:
+                batch.append(_queue.get_nowait())
+            except queue.Empty:
+                break
+            size += len(batch[-1][0])
+        try:
+            seq = _write_batch(conn, seq, batch)
+        except Exception as e:
+            logger.exception("claim writer failed")
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            for _ in batch:
+                _queue.task_done()
+
+
+def _ensure_writer():
+    global _writer
+    if _writer is not None:
+        return
+    with _lock:
+        if _writer is None:
+            _writer = threading.Thread(target=_write_loop, name="claim-writer", daemon=True)
+            _writer.start()
+
+
+# --- API ---
+def file_claims(filings: List[dict]) -> List[dict]:
+    """
+    Queues filings (policy_number, claim_date, claim_amount, description, idempotency_key,
+    optional dedupe_window_s) for the writer and waits for their commit. Returns one tool-style result per filing.
+    """
+    if not filings:
+        return []
+    _ensure_writer()
+    future: Future = Future()
+    _queue.put((filings, future, time.perf_counter()))
+    return future.result(timeout=WRITE_TIMEOUT_S)
+
+
+def file_claim(policy_number: str, claim_date: str, claim_amount: float, description: str,
+               idempotency_key: str) -> dict:
+    return file_claims([{"policy_number": policy_number, "claim_date": claim_date, "claim_amount": claim_amount,
+                         "description": description, "idempotency_key": idempotency_key}])[0]
+
+
+def flush():
+    """Blocks until every queued filing is committed."""
+    if _writer is not None:
+        _queue.join()
@@ -1,14 +1,17 @@
 """
 claims_tools.py
 Domain: Claims Management (Status Checks & Filing)
+
+Filing writes through claim_writer.py (single writer, sequential claim IDs, idempotent).
 """
 import os
 import sqlite3
-import random
 from langchain_core.tools import tool
 from langchain_core.runnables import RunnableConfig
 from pydantic import BaseModel, Field
 
+import claim_writer
+
 DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "db", "insurance_support.db")
 
 def get_conn():
@@ -100,6 +103,7 @@ def file_new_claim(policy_number: str, incident_date: str, reason: str, amount:
     """
     Submits a NEW claim into the database.
     Use this ONLY after you have collected all 4 fields from the user.
+    Filing the same claim again returns the claim already filed.
     """
     auth_id = (config or {}).get("configurable", {}).get("authenticated_customer_id", "")
 
@@ -113,17 +117,11 @@ def file_new_claim(policy_number: str, incident_date: str, reason: str, amount:
                 return {"status": "error", "msg": f"Policy {policy_number} not found."}
             if owner.get("customer_id") != auth_id:
                 return {"status": "denied", "msg": f"Access denied. Policy {policy_number} does not belong to you. You cannot file a claim against it."}
+    finally:
+        conn.close()
 
-        new_id = f"CLM{random.randint(1000,9999)}"
-        query = """
-        INSERT INTO claims (claim_id, policy_number, incident_date, status, amount, reason)
-        VALUES (?, ?, ?, 'Pending', ?, ?)
-        """
-        conn.execute(query, (new_id, policy_number, incident_date, amount, reason))
-        conn.commit()
-
-        return {"status": "success", "claim_id": new_id, "msg": "Claim filed successfully."}
+    try:
+        key = claim_writer.idempotency_key(auth_id, policy_number, incident_date, reason, f"{amount:.2f}")
+        return claim_writer.file_claim(policy_number, incident_date, amount, reason, key)
     except Exception as e:
         return {"status": "error", "msg": str(e)}
-    finally:
-        conn.close()
@@ -0,0 +1,371 @@
+"""
+customer_rollup.py
+Domain: Per-Customer Rollups (Trigger-Maintained)
+
+Reports (report.py) and billing answers (billing_tools.py) need the same per-customer
+aggregates: policy counts, what is outstanding and overdue, and claim totals by status.
+Instead of re-aggregating raw rows on every request, they are kept in two tables that
+SQLite triggers on customers, policies, billing, payments and claims update on every
+write, in the writer's own transaction:
+- customer_rollup: one row per customer
+- customer_claim_rollup: claim count and total per (customer, claim status)
+Reading them is a primary-key lookup (get()).
+
+Definitions (shared by the triggers, rebuild and check):
+- active policy: policies.status = 'Active'
+- outstanding bill: not marked 'paid' and no payment in SETTLING_PAYMENTS
+- overdue bill: outstanding and marked 'overdue' (the stored status; no date arithmetic,
+  which triggers could not keep current)
+- amounts are integer cents, so the running sums do not drift as floats would
+
+Each trigger applies only the row's delta: subtract its old contribution, add its new one.
+The tables and triggers are created, and the rollups built from scratch, the first time a
+database is read; `rebuild` redoes that and `check` compares the tables against a fresh
+aggregation of the raw rows:
+    cd backend
+    python -m customer_rollup rebuild
+    python -m customer_rollup check
+"""
+import argparse
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "db", "insurance_support.db")
+
+SETTLING_PAYMENTS = ("completed", "success")  # payments.status, case-insensitive
+
+COLUMNS = ("policies", "active_policies", "bills", "outstanding_bills", "outstanding_cents",
+           "overdue_bills", "overdue_cents", "claims", "claim_cents")
+POLICY_COLUMNS, BILL_COLUMNS, CLAIM_COLUMNS = COLUMNS[:2], COLUMNS[2:7], COLUMNS[7:]
+
+SCHEMA = [
+    f"""CREATE TABLE IF NOT EXISTS customer_rollup (
+        customer_id VARCHAR(20) PRIMARY KEY,
+        {", ".join(f"{c} INTEGER NOT NULL DEFAULT 0" for c in COLUMNS)}
+    )""",
+    """CREATE TABLE IF NOT EXISTS customer_claim_rollup (
+        customer_id VARCHAR(20) NOT NULL,
+        status VARCHAR(20) NOT NULL,
+        claims INTEGER NOT NULL DEFAULT 0,
+        claim_cents INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (customer_id, status)
+    ) WITHOUT ROWID""",
+]
+
+_lock = threading.Lock()
+_ready: set = set()  # database paths whose rollups are installed
+
+
+# --- SQL FRAGMENTS ---
+def _cents(expr: str) -> str:
+    return f"CAST(ROUND({expr} * 100) AS INTEGER)"
+
+
+def _settles(row: str) -> str:
+    return f"LOWER({row}.status) IN ({', '.join(repr(s) for s in SETTLING_PAYMENTS)})"
+
+
+def _unpaid(skip_payment: str = "", also_settled: str = "") -> str:
+    """1 if bill `b` is outstanding. The arguments describe the payments before a payment write."""
+    skip = f" AND y.payment_id IS NOT {skip_payment}" if skip_payment else ""
+    extra = f" OR {also_settled}" if also_settled else ""
+    return (f"NOT (LOWER(b.status) = 'paid' OR EXISTS (SELECT 1 FROM payments y WHERE y.bill_id = b.bill_id "
+            f"AND {_settles('y')}{skip}){extra})")
+
+
+def _owner(row: str) -> str:
+    return f"(SELECT customer_id FROM policies WHERE policy_number = {row}.policy_number)"
+
+
+def _policy_totals(customer: str, source: str) -> str:
+    return (f"SELECT {customer} AS customer_id, COUNT(*) AS policies, SUM(p.status = 'Active') AS active_policies "
+            f"FROM {source} GROUP BY 1")
+
+
+def _bill_totals(customer: str, source: str) -> str:
+    return f"""SELECT customer_id, COUNT(*) AS bills, SUM(unpaid) AS outstanding_bills,
+               SUM(unpaid * cents) AS outstanding_cents, SUM(unpaid * late) AS overdue_bills,
+               SUM(unpaid * late * cents) AS overdue_cents
+        FROM (SELECT {customer} AS customer_id, {_cents("b.amount")} AS cents, {_unpaid()} AS unpaid,
+                     LOWER(b.status) = 'overdue' AS late
+              FROM {source})
+        GROUP BY customer_id"""
+
+
+def _claim_totals(customer: str, source: str, by_status: bool = False) -> str:
+    status, group = (", c.status AS status", "1, 2") if by_status else ("", "1")
+    return (f"SELECT {customer} AS customer_id{status}, COUNT(*) AS claims, "
+            f"SUM({_cents('c.claim_amount')}) AS claim_cents FROM {source} GROUP BY {group}")
+
+
+def _apply(sign: str, totals: str, columns: tuple) -> str:
+    sets = ", ".join(f"{c} = customer_rollup.{c} {sign} d.{c}" for c in columns)
+    return f"UPDATE customer_rollup SET {sets} FROM ({totals}) AS d WHERE customer_rollup.customer_id = d.customer_id"
+
+
+def _apply_claim_statuses(sign: str, totals: str) -> str:
+    return f"""INSERT INTO customer_claim_rollup (customer_id, status, claims, claim_cents)
+        SELECT customer_id, status, {sign}claims, {sign}claim_cents FROM ({totals})
+        WHERE customer_id IN (SELECT customer_id FROM customer_rollup)
+        ON CONFLICT (customer_id, status) DO UPDATE
+        SET claims = customer_claim_rollup.claims + excluded.claims,
+            claim_cents = customer_claim_rollup.claim_cents + excluded.claim_cents"""
+
+
+# --- DELTAS (trigger bodies) ---
+def _policy_delta(sign: str, row: str) -> List[str]:
+    """The policy row plus its bills and claims, attributed to the row's customer."""
+    customer = f"{row}.customer_id"
+    bills = f"billing b WHERE b.policy_number = {row}.policy_number"
+    claims = f"claims c WHERE c.policy_number = {row}.policy_number"
+    return [
+        _apply(sign, _policy_totals(customer, f"(SELECT {row}.status AS status) AS p"), POLICY_COLUMNS),
+        _apply(sign, _bill_totals(customer, bills), BILL_COLUMNS),
+        _apply(sign, _claim_totals(customer, claims), CLAIM_COLUMNS),
+        _apply_claim_statuses(sign, _claim_totals(customer, claims, by_status=True)),
+    ]
+
+
+def _bill_delta(sign: str, row: str) -> List[str]:
+    source = f"(SELECT {row}.bill_id AS bill_id, {row}.amount AS amount, {row}.status AS status) AS b"
+    return [_apply(sign, _bill_totals(_owner(row), source), BILL_COLUMNS)]
+
+
+def _claim_delta(sign: str, row: str) -> List[str]:
+    source = f"(SELECT {row}.status AS status, {row}.claim_amount AS claim_amount) AS c"
+    return [
+        _apply(sign, _claim_totals(_owner(row), source), CLAIM_COLUMNS),
+        _apply_claim_statuses(sign, _claim_totals(_owner(row), source, by_status=True)),
+    ]
+
+
+def _payment_delta(bills: str, was_unpaid: str) -> List[str]:
+    """Outstanding/overdue change of the bills a payment write touched: unpaid now minus unpaid before."""
+    return [f"""UPDATE customer_rollup SET
+            outstanding_bills = customer_rollup.outstanding_bills + d.outstanding_bills,
+            outstanding_cents = customer_rollup.outstanding_cents + d.outstanding_cents,
+            overdue_bills = customer_rollup.overdue_bills + d.overdue_bills,
+            overdue_cents = customer_rollup.overdue_cents + d.overdue_cents
+        FROM (SELECT customer_id, SUM(change) AS outstanding_bills, SUM(change * cents) AS outstanding_cents,
+                     SUM(change * late) AS overdue_bills, SUM(change * late * cents) AS overdue_cents
+              FROM (SELECT p.customer_id, {_cents("b.amount")} AS cents, LOWER(b.status) = 'overdue' AS late,
+                           ({_unpaid()}) - ({was_unpaid}) AS change
+                    FROM billing b JOIN policies p ON p.policy_number = b.policy_number
+                    WHERE b.bill_id IN ({bills}))
+              GROUP BY customer_id) AS d
+        WHERE customer_rollup.customer_id = d.customer_id"""]
+
+
+def _expected(where: str = "1") -> List[str]:
+    """Fresh aggregation of the raw rows: (customer_rollup rows, customer_claim_rollup rows)."""
+    owned_bills = "billing b JOIN policies p ON p.policy_number = b.policy_number"
+    owned_claims = "claims c JOIN policies p ON p.policy_number = c.policy_number"
+    values = ", ".join(f"IFNULL({c}, 0)" for c in COLUMNS)
+    return [
+        f"""SELECT customer_id, {values} FROM customers
+            LEFT JOIN ({_policy_totals("p.customer_id", "policies p")}) USING (customer_id)
+            LEFT JOIN ({_bill_totals("p.customer_id", owned_bills)}) USING (customer_id)
+            LEFT JOIN ({_claim_totals("p.customer_id", owned_claims)}) USING (customer_id)
+            WHERE {where}""",
+        f"""SELECT customer_id, status, claims, claim_cents
+            FROM ({_claim_totals("p.customer_id", owned_claims, by_status=True)})
+            WHERE customer_id IN (SELECT customer_id FROM customers) AND {where}""",
+    ]
+
+
+def _recompute(customer: str) -> List[str]:
+    rollup, statuses = _expected(f"customer_id = {customer}")
+    return [f"INSERT OR REPLACE INTO customer_rollup (customer_id, {', '.join(COLUMNS)}) {rollup}",
+            f"INSERT OR REPLACE INTO customer_claim_rollup (customer_id, status, claims, claim_cents) {statuses}"]
+
+
+def _forget(customer: str) -> List[str]:
+    return [f"DELETE FROM customer_rollup WHERE customer_id = {customer}",
+            f"DELETE FROM customer_claim_rollup WHERE customer_id = {customer}"]
+
+
+# Writes that keep the rows they change (updates) subtract the OLD row and add the NEW one
+TRIGGERS = {
+    "rollup_customer_insert": ("AFTER INSERT ON customers", _recompute("NEW.customer_id")),
+    "rollup_customer_delete": ("AFTER DELETE ON customers", _forget("OLD.customer_id")),
+    "rollup_customer_update": ("AFTER UPDATE OF customer_id ON customers WHEN OLD.customer_id IS NOT NEW.customer_id",
+                               _forget("OLD.customer_id") + _recompute("NEW.customer_id")),
+    "rollup_policy_insert": ("AFTER INSERT ON policies", _policy_delta("+", "NEW")),
+    "rollup_policy_delete": ("AFTER DELETE ON policies", _policy_delta("-", "OLD")),
+    "rollup_policy_update": ("AFTER UPDATE OF policy_number, customer_id, status ON policies",
+                             _policy_delta("-", "OLD") + _policy_delta("+", "NEW")),
+    "rollup_bill_insert": ("AFTER INSERT ON billing", _bill_delta("+", "NEW")),
+    "rollup_bill_delete": ("AFTER DELETE ON billing", _bill_delta("-", "OLD")),
+    "rollup_bill_update": ("AFTER UPDATE OF bill_id, policy_number, amount, status ON billing",
+                           _bill_delta("-", "OLD") + _bill_delta("+", "NEW")),
+    "rollup_payment_insert": ("AFTER INSERT ON payments",
+                              _payment_delta("NEW.bill_id", _unpaid(skip_payment="NEW.payment_id"))),
+    "rollup_payment_delete": ("AFTER DELETE ON payments",
+                              _payment_delta("OLD.bill_id", _unpaid(also_settled=_settles("OLD")))),
+    "rollup_payment_update": ("AFTER UPDATE OF payment_id, bill_id, status ON payments",
+                              _payment_delta("OLD.bill_id, NEW.bill_id", _unpaid(
+                                  skip_payment="NEW.payment_id",
+                                  also_settled=f"(b.bill_id = OLD.bill_id AND {_settles('OLD')})"))),
+    "rollup_claim_insert": ("AFTER INSERT ON claims", _claim_delta("+", "NEW")),
+    "rollup_claim_delete": ("AFTER DELETE ON claims", _claim_delta("-", "OLD")),
+    "rollup_claim_update": ("AFTER UPDATE OF claim_id, policy_number, claim_amount, status ON claims",
+                            _claim_delta("-", "OLD") + _claim_delta("+", "NEW")),
+}
+
+
+# --- INSTALL / REBUILD / CHECK ---
+def _connect(db_path: Optional[str] = None) -> sqlite3.Connection:
+    # Autocommit mode: transactions are opened and committed explicitly below
+    conn = sqlite3.connect(db_path or DB_PATH, isolation_level=None)
+    conn.execute("PRAGMA busy_timeout=5000")
+    return conn
+
+
+def _installed(conn: sqlite3.Connection) -> bool:
+    names = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")}
+    return {"customer_rollup", "customer_claim_rollup", *TRIGGERS} <= names
+
+
+def _install(conn: sqlite3.Connection):
+    for statement in SCHEMA:
+        conn.execute(statement)
+    for name, (event, body) in TRIGGERS.items():
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        conn.execute(f"CREATE TRIGGER {name} {event} BEGIN {'; '.join(body)}; END")
+
+
+def _fill(conn: sqlite3.Connection):
+    rollup, statuses = _expected()
+    conn.execute("DELETE FROM customer_rollup")
+    conn.execute("DELETE FROM customer_claim_rollup")
+    conn.execute(f"INSERT INTO customer_rollup (customer_id, {', '.join(COLUMNS)}) {rollup}")
+    conn.execute(f"INSERT INTO customer_claim_rollup (customer_id, status, claims, claim_cents) {statuses}")
+
+
+def rebuild(db_path: Optional[str] = None) -> int:
+    """(Re)creates the tables and triggers and rebuilds every rollup from raw rows, in one transaction."""
+    conn = _connect(db_path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            _install(conn)
+            _fill(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return conn.execute("SELECT COUNT(*) FROM customer_rollup").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def ensure(db_path: Optional[str] = None):
+    """Installs and builds the rollups the first time a database is used (e.g. after db/setup.py)."""
+    path = db_path or DB_PATH
+    if path in _ready:
+        return
+    with _lock:
+        if path in _ready:
+            return
+        conn = _connect(path)
+        try:
+            missing = not _installed(conn)
+        finally:
+            conn.close()
+        if missing:
+            customers = rebuild(path)
+            logger.info("customer rollups built", extra={"customers": customers})
+        _ready.add(path)
+
+
+def check(db_path: Optional[str] = None) -> dict:
+    """Compares the rollup tables with a fresh aggregation; lists the customers that differ."""
+    ensure(db_path)
+    rollup, statuses = _expected()
+    conn = _connect(db_path)
+    try:
+        conn.execute("BEGIN")  # one snapshot for both sides
+        columns = ", ".join(COLUMNS)
+        stored = f"SELECT customer_id, {columns} FROM customer_rollup"
+        stored_statuses = "SELECT customer_id, status, claims, claim_cents FROM customer_claim_rollup WHERE claims != 0"
+        differ = {r[0] for q in (f"{rollup} EXCEPT {stored}", f"{stored} EXCEPT {rollup}",
+                                 f"{statuses} EXCEPT {stored_statuses}", f"{stored_statuses} EXCEPT {statuses}")
+                  for r in conn.execute(q)}
+        customers = conn.execute("SELECT COUNT(*) FROM customers").fetchone()[0]
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+    if differ:
+        logger.warning("customer rollups out of date", extra={"customers": len(differ)})
+    return {"customers": customers, "mismatched": sorted(differ)}
+
+
+# --- READ ---
+def get(customer_id: str) -> Optional[dict]:
+    """The customer's rollup (amounts in dollars) with claims by status, or None for an unknown customer."""
+    ensure()
+    conn = _connect()
+    try:
+        try:
+            row = conn.execute(f"SELECT {', '.join(COLUMNS)} FROM customer_rollup WHERE customer_id = ?",
+                               (customer_id,)).fetchone()
+        except sqlite3.OperationalError:
+            # Tables dropped since they were built (database re-seeded): build them again
+            _ready.discard(DB_PATH)
+            ensure()
+            row = conn.execute(f"SELECT {', '.join(COLUMNS)} FROM customer_rollup WHERE customer_id = ?",
+                               (customer_id,)).fetchone()
+        if row is None:
+            return None
+        statuses = conn.execute(
+            "SELECT status, claims, claim_cents FROM customer_claim_rollup WHERE customer_id = ? AND claims != 0",
+            (customer_id,),
+        ).fetchall()
+    finally:
+        conn.close()
+    r = dict(zip(COLUMNS, row))
+    return {
+        "policies": r["policies"],
+        "active_policies": r["active_policies"],
+        "bills": r["bills"],
+        "outstanding_bills": r["outstanding_bills"],
+        "outstanding_amount": r["outstanding_cents"] / 100,
+        "overdue_bills": r["overdue_bills"],
+        "overdue_amount": r["overdue_cents"] / 100,
+        "claims": r["claims"],
+        "claimed_amount": r["claim_cents"] / 100,
+        "claims_by_status": {status: {"count": n, "amount": cents / 100} for status, n, cents in statuses},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or verify the per-customer rollup tables.")
+    parser.add_argument("command", choices=["rebuild", "check"])
+    parser.add_argument("--db", default=DB_PATH, help="SQLite database (default: %(default)s)")
+    args = parser.parse_args()
+    if not os.path.exists(args.db):
+        parser.error(f"database not found: {args.db}")
+
+    if args.command == "rebuild":
+        start = time.perf_counter()
+        customers = rebuild(args.db)
+        _ready.add(args.db)
+        print(f"Rebuilt rollups for {customers} customers in {time.perf_counter() - start:.2f} s")
+        return
+    result = check(args.db)
+    if result["mismatched"]:
+        print(f"{len(result['mismatched'])} of {result['customers']} customers differ: "
+              f"{', '.join(result['mismatched'][:20])}")
+        sys.exit(1)
+    print(f"Rollups match the raw rows for all {result['customers']} customers")
+
+
+if __name__ == "__main__":
+    main()
@@ -227,6 +227,10 @@ def setup_insurance_database(db_path: Optional[str] = None) -> bool:
     cursor.execute("PRAGMA foreign_keys = ON;")
 
     cursor.executescript("""
+        -- Rollups (customer_rollup.py) are rebuilt from the new rows on first use
+        DROP TABLE IF EXISTS customer_claim_rollup;
+        DROP TABLE IF EXISTS customer_rollup;
+        DROP TABLE IF EXISTS claim_requests;
         DROP TABLE IF EXISTS claims;
         DROP TABLE IF EXISTS payments;
         DROP TABLE IF EXISTS billing;
@@ -301,6 +305,14 @@ def setup_insurance_database(db_path: Optional[str] = None) -> bool:
             FOREIGN KEY (policy_number) REFERENCES policies(policy_number)
         );
 
+        -- Idempotency keys of filed claims (claim_writer.py): a retried filing returns the same claim
+        CREATE TABLE claim_requests (
+            idempotency_key VARCHAR(64) PRIMARY KEY,
+            claim_id VARCHAR(20) NOT NULL,
+            created_at TIMESTAMP NOT NULL,
+            FOREIGN KEY (claim_id) REFERENCES claims(claim_id)
+        );
+
         CREATE INDEX idx_policies_customer ON policies(customer_id);
         CREATE INDEX idx_policies_type ON policies(policy_type);
         CREATE INDEX idx_billing_policy ON billing(policy_number);
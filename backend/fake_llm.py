@@ -0,0 +1,126 @@
+"""
+fake_llm.py
+Domain: Offline Chat Model
+
+Deterministic stand-in for ChatOpenAI used by benchmarks and local runs without
+network access. Supports bind_tools() and with_structured_output() like the real
+model, so agent nodes, the supervisor router and the guardrail chain run unchanged.
+
+Replies come from, in order:
+1. the scripted queue (`script`), if non-empty
+2. the `responder` callable, if set
+3. a neutral default (structured output -> schema defaults, chat -> short text)
+
+A `timeout` call kwarg (set by llm_gateway) shorter than latency_s raises TimeoutError.
+"""
+import threading
+import time
+from typing import Any, Callable, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import BaseModel, PrivateAttr
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    A scriptable fake chat model.
+    responder(messages, tools) -> AIMessage | str | BaseModel | dict
+      `tools` is the list of OpenAI-format tool schemas bound for this call.
+      Returning a BaseModel/dict answers a structured-output call.
+    """
+    script: List[Any] = []
+    responder: Optional[Callable] = None
+    latency_s: float = 0.0
+    default_reply: str = "OK"
+
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _calls: int = PrivateAttr(default=0)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    @property
+    def calls(self) -> int:
+        return self._calls
+
+    def reset_calls(self):
+        with self._lock:
+            self._calls = 0
+
+    def bind_tools(self, tools, *, tool_choice: Optional[str] = None, **kwargs):
+        formatted = [convert_to_openai_tool(t) for t in tools]
+        return self.bind(tools=formatted, tool_choice=tool_choice, **kwargs)
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs) -> ChatResult:
+        tools = kwargs.get("tools") or []
+        with self._lock:
+            self._calls += 1
+            scripted = self.script.pop(0) if self.script else None
+
+        if self.latency_s:
+            # Like the real client: a per-call timeout shorter than the latency fails the call
+            timeout = kwargs.get("timeout")
+            if timeout is not None and timeout < self.latency_s:
+                time.sleep(max(0.0, timeout))
+                raise TimeoutError(f"fake LLM call timed out after {timeout:.3f}s")
+            time.sleep(self.latency_s)
+
+        reply = scripted
+        if reply is None and self.responder is not None:
+            reply = self.responder(messages, tools)
+        if reply is None:
+            reply = self._default(tools, kwargs.get("tool_choice"))
+        if callable(reply) and not isinstance(reply, (BaseModel, type)):
+            reply = reply(messages, tools)
+
+        message = self._to_message(reply, tools)
+        # Rough token counts so usage accounting has something to record offline
+        prompt_tokens = sum(len(str(m.content)) for m in messages) // 4
+        completion_tokens = max(1, len(str(message.content)) // 4)
+        message.usage_metadata = {
+            "input_tokens": prompt_tokens,
+            "output_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    # --- Helpers ---
+    def _default(self, tools, tool_choice):
+        if tool_choice == "any" and len(tools) == 1:
+            return _schema_defaults(tools[0]["function"]["parameters"])
+        return self.default_reply
+
+    def _to_message(self, reply, tools) -> AIMessage:
+        if isinstance(reply, AIMessage):
+            return reply
+        if isinstance(reply, (BaseModel, dict)):
+            # Structured output: answer as a call to the single bound schema tool
+            args = reply.model_dump() if isinstance(reply, BaseModel) else reply
+            name = tools[0]["function"]["name"] if tools else type(reply).__name__
+            return AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": f"call_{self._calls}"}])
+        return AIMessage(content=str(reply))
+
+
+def _schema_defaults(parameters: dict) -> dict:
+    """Builds a minimal valid argument dict from a JSON schema."""
+    args = {}
+    for name, prop in (parameters.get("properties") or {}).items():
+        if "default" in prop:
+            args[name] = prop["default"]
+        elif "enum" in prop:
+            args[name] = prop["enum"][0]
+        elif prop.get("type") == "boolean":
+            args[name] = True
+        elif prop.get("type") in ("integer", "number"):
+            args[name] = 0
+        elif prop.get("type") == "array":
+            items = prop.get("items") or {}
+            args[name] = [items["enum"][0]] if "enum" in items else []
+        else:
+            args[name] = ""
+    return args
+
@@ -0,0 +1,140 @@
+"""
+fan_out.py
+Domain: Multi-Agent Fan-Out for Compound Questions
+
+A compound question ("show my policies and anything I still owe") needs more than one
+agent. The supervisor names them (RouterOutput.next plus RouterOutput.also); each agent
+then runs in its own parallel graph branch (LangGraph Send), and merge_answers_node
+combines the branch answers into one reply.
+
+Each branch runs its agent / tool loop on a private copy of the conversation, so the
+branches never see each other's tool calls. Only the tool exchanges and the merged
+reply are written back to the shared message history.
+
+Opt-out: set AGENT_FAN_OUT=0 to route compound questions to the first agent only.
+"""
+import logging
+import os
+from typing import Callable, Dict, List, Optional
+
+from langchain_core.messages import AIMessage, SystemMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.types import Send
+
+from response_templates import render
+import metrics
+import turn_budget
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("AGENT_FAN_OUT", "1").lower() in ("1", "true", "yes")
+MAX_AGENTS = int(os.getenv("AGENT_FAN_OUT_MAX", "3"))
+
+# agent -> (section title in the merged reply, part of the question it answers)
+TOPICS = {
+    "customer_agent": ("Your Profile", "the customer's profile"),
+    "policy_agent": ("Policies", "policies, coverage and insured vehicles"),
+    "claims_agent": ("Claims", "claims"),
+    "billing_agent": ("Billing", "bills, payments and amounts owed"),
+    "faq_agent": ("General Information", "general insurance terms and how things work"),
+}
+
+
+# --- ROUTING ---
+def branch_agents(state) -> List[str]:
+    """
+    The agents to run in parallel for this turn, or [] for a single-agent turn. A turn the
+    router ended (next is FINISH, or anything but an agent) never fans out, whatever `also` says.
+    """
+    if not ENABLED or state.get("next", "") not in TOPICS:
+        return []
+    agents = []
+    for agent in [state["next"]] + list(state.get("also") or []):
+        if agent in TOPICS and agent not in agents:
+            agents.append(agent)
+    agents = agents[:MAX_AGENTS]
+    return agents if len(agents) > 1 else []
+
+
+def sends(state, agents: List[str]) -> List[Send]:
+    """One Send per agent; each branch gets the turn's state plus its agent and position."""
+    metrics.ROUTES.inc(route="fan_out")
+    logger.info("fan-out", extra={"agents": agents})
+    return [Send("agent_branch", {**state, "branch_agent": agent, "branch_order": i})
+            for i, agent in enumerate(agents)]
+
+
+# --- STATE REDUCER ---
+def merge_branches(left: Optional[list], right: Optional[list]) -> list:
+    """Collects branch results. Returning None from a node clears them."""
+    if right is None:
+        return []
+    return (left or []) + right
+
+
+# --- BRANCH NODE ---
+def _focus(agent: str) -> SystemMessage:
+    topic = TOPICS[agent][1]
+    return SystemMessage(content=(
+        f"The customer's latest message covers several topics, answered by different agents in parallel. "
+        f"Answer ONLY the part about {topic}; do not mention the other topics."
+    ))
+
+
+def make_branch_node(agent_nodes: Dict[str, Callable], tool_nodes: Dict[str, Callable]) -> Callable:
+    """Builds the node that runs one agent's tool loop for a fan-out branch."""
+    def agent_branch_node(state, config: RunnableConfig = None) -> dict:
+        agent = state["branch_agent"]
+        history = list(state["messages"])
+        # Focus note just before the question, so the question stays the last message
+        messages = history[:-1] + [_focus(agent), history[-1]]
+        scratch = {**state, "messages": messages}
+        start = len(messages)
+        metrics.FAN_OUT_BRANCHES.inc(agent=agent)
+
+        try:
+            # Same limits as the single-agent loop (turn_budget.py); agent nodes degrade on their own
+            while True:
+                reply = agent_nodes[agent](scratch)["messages"][-1]
+                messages.append(reply)
+                if not getattr(reply, "tool_calls", None):
+                    break
+                limit = turn_budget.exhausted(scratch)
+                if limit:
+                    turn_budget.record(limit, agent)
+                    messages[-1] = turn_budget.fallback_reply(scratch)
+                    break
+                messages.extend(tool_nodes[agent](scratch, config)["messages"])
+                templated = render(scratch)
+                if templated is not None:
+                    messages.append(templated)
+                    break
+        except Exception:
+            # The merged reply says this part could not be looked up
+            metrics.FAN_OUT_BRANCH_ERRORS.inc(agent=agent)
+            logger.exception("fan-out branch failed", extra={"agent": agent})
+
+        last = messages[-1]
+        answer = last.content if isinstance(last, AIMessage) and not last.tool_calls else ""
+        # Only complete tool exchanges go into the shared history; the branch's own answer is merged
+        answered = {m.tool_call_id for m in messages[start:] if isinstance(m, ToolMessage)}
+        exchanges = [m for m in messages[start:] if isinstance(m, ToolMessage) or (
+            isinstance(m, AIMessage) and m.tool_calls and all(tc["id"] in answered for tc in m.tool_calls))]
+        return {"branches": [{"agent": agent, "order": state["branch_order"],
+                              "answer": answer, "messages": exchanges}]}
+    return agent_branch_node
+
+
+# --- MERGE NODE ---
+def merge_answers_node(state) -> dict:
+    """Combines the branch answers, in routing order, into one reply."""
+    branches = sorted(state.get("branches") or [], key=lambda b: b["order"])
+    sections, exchanges = [], []
+    for b in branches:
+        title, topic = TOPICS[b["agent"]]
+        answer = b["answer"].strip() or f"I couldn't look up {topic} just now. Please ask again in a moment."
+        sections.append(f"**{title}**\n{answer}")
+        exchanges.extend(b["messages"])
+    reply = AIMessage(content="\n\n".join(sections),
+                      response_metadata={"fan_out": [b["agent"] for b in branches]})
+    return {"messages": exchanges + [reply], "branches": None}
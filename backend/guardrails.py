@@ -3,13 +3,16 @@ guardrails.py
 Description: Security & Relevance Filter (The "Firewall")
 Acts as a barrier BEFORE the LangGraph Agent is invoked.
 """
+import logging
 import re
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from pydantic import BaseModel, Field
 
-# Initialize a fast, cheap model for guarding
-llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+import llm_gateway
+import metrics
+import tracing
+
+logger = logging.getLogger(__name__)
 
 # --- 1. STRUCTURED OUTPUT DEFINITION ---
 class GuardrailVerdict(BaseModel):
@@ -58,26 +61,43 @@ Recent Conversation (for follow-up context):
 If the message is not clearly about insurance, the user's own account, or a valid interaction listed above, BLOCK it.
 """
 
-guard_chain = ChatPromptTemplate.from_messages([
+guard_prompt = ChatPromptTemplate.from_messages([
     ("system", system_prompt),
     ("human", "{input}")
-]).pipe(llm.with_structured_output(GuardrailVerdict))
+])
+
+# A fast, cheap model for guarding (model per node: LLM_MODEL_GUARDRAIL)
+llm_gateway.register("guardrail", schema=GuardrailVerdict)
 
 # --- 3. MAIN VALIDATION FUNCTION ---
-def validate_input(user_input: str, current_user: str, recent_messages: list = None) -> dict:
+def quick_check(user_input: str):
     """
-    Returns {'valid': True} or {'valid': False, 'message': '...'}
-    recent_messages: last few conversation messages for context (helps with follow-up questions)
+    A. Fast Regex Check (Pre-LLM) for obvious attacks.
+    Returns the blocking verdict, or None when the LLM check is still needed.
     """
-    # A. Fast Regex Check (Pre-LLM) for obvious attacks
     sql_patterns = r"(?i)(select\s+\*|drop\s+table|insert\s+into|delete\s+from)"
     jailbreak_patterns = r"(?i)(ignore\s+previous|system\s+override)"
 
     if re.search(sql_patterns, user_input):
+        metrics.GUARDRAIL_BLOCKS.inc(layer="regex_sql")
         return {"valid": False, "message": "Security Alert: Malformed request detected."}
 
     if re.search(jailbreak_patterns, user_input):
+        metrics.GUARDRAIL_BLOCKS.inc(layer="regex_jailbreak")
         return {"valid": False, "message": "Security Alert: Invalid instruction format."}
+    return None
+
+
+@metrics.timed(metrics.GUARDRAIL_SECONDS)
+def validate_input(user_input: str, current_user: str, recent_messages: list = None, checked: bool = False) -> dict:
+    """
+    Returns {'valid': True} or {'valid': False, 'message': '...'}
+    recent_messages: last few conversation messages for context (helps with follow-up questions)
+    checked: quick_check() already passed, skip the regex layer
+    """
+    blocked = None if checked else quick_check(user_input)
+    if blocked:
+        return blocked
 
     # Build recent context summary for the guardrail LLM
     recent_context = "No prior conversation."
@@ -93,17 +113,19 @@ def validate_input(user_input: str, current_user: str, recent_messages: list = N
 
     # B. LLM Semantic Check
     try:
-        verdict = guard_chain.invoke({
+        prompt = guard_prompt.invoke({
             "input": user_input,
             "current_user": current_user,
             "recent_context": recent_context
         })
+        verdict = llm_gateway.get("guardrail").invoke(prompt, {"callbacks": tracing.callbacks()})
 
         if not verdict.is_allowed:
+            metrics.GUARDRAIL_BLOCKS.inc(layer="llm")
             return {"valid": False, "message": f"Request Blocked: {verdict.reason}"}
 
         return {"valid": True}
 
     except Exception as e:
-        print(f"GUARDRAIL ERROR: {e}")
+        logger.error("guardrail LLM check failed, allowing message", extra={"error": str(e)})
         return {"valid": True}  # Fallback
@@ -0,0 +1,378 @@
+"""
+llm_gateway.py
+Domain: Shared LLM Client Gateway
+
+Every LLM call in the backend goes through runnables built here:
+- One pooled HTTP client (sync + async) shared by all ChatOpenAI instances.
+- One chat model per (provider, model, endpoint), shared by every node that uses it.
+- Per-node runnables (tools bound / structured output) built once at registration,
+  not on every invocation.
+- A global concurrency limit plus a per-endpoint limit on in-flight calls. The endpoint
+  slot is taken first, so a call queued behind a saturated endpoint does not hold one of
+  the global slots that calls to other endpoints need.
+- Retry with exponential backoff and jitter on HTTP 429 (up to LLM_MAX_RETRIES), and
+  on the transient failures the OpenAI SDK retries by default: connection errors,
+  timeouts, 408, 409 and 5xx (up to LLM_TRANSIENT_RETRIES). The concurrency slot is
+  released while waiting, so a throttled call does not block others.
+- Token usage of every response is recorded in the usage ledger (usage_ledger.py).
+  Structured-output nodes run the model and the output parser as separate steps so
+  the raw message (and its usage_metadata) is seen before parsing.
+- Cassettes (cassette.py): each response is recorded when recording is on, and
+  answered from the cassette instead of the model during replay.
+- Timeouts: each call's timeout is the node's LLM_TIMEOUT_S_<NODE> (else the client's
+  LLM_TIMEOUT_S), capped by the time left before the turn's deadline (turn_budget.py,
+  passed as configurable.deadline). Past the deadline no call is started.
+
+Configuration (env):
+- LLM_PROVIDER: openai (default) or fake (offline FakeChatModel, see fake_llm.py)
+- LLM_MODEL: default model; LLM_MODEL_<NODE> overrides it per node (e.g. LLM_MODEL_SUPERVISOR)
+- LLM_BASE_URL_<NODE>: per-node endpoint (defaults to OPENAI_BASE_URL / the OpenAI API)
+- LLM_TIMEOUT_S_<NODE>: per-node call timeout in seconds (e.g. LLM_TIMEOUT_S_GUARDRAIL=5)
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+import httpx
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.runnables import Runnable, RunnableLambda, RunnableSequence
+from pydantic import BaseModel
+
+import cassette
+import metrics
+import turn_budget
+import usage_ledger
+
+PROVIDER = os.getenv("LLM_PROVIDER", "openai").lower()
+DEFAULT_MODEL = os.getenv("LLM_MODEL", "gpt-4o-mini")
+TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0"))
+TIMEOUT_S = float(os.getenv("LLM_TIMEOUT_S", "60"))
+MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "50"))
+MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+ENDPOINT_CONCURRENCY = int(os.getenv("LLM_ENDPOINT_CONCURRENCY", "8"))
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+TRANSIENT_RETRIES = int(os.getenv("LLM_TRANSIENT_RETRIES", "2"))  # the OpenAI SDK's default
+BACKOFF_BASE_S = float(os.getenv("LLM_BACKOFF_BASE_S", "0.5"))
+BACKOFF_MAX_S = float(os.getenv("LLM_BACKOFF_MAX_S", "20"))
+
+DEFAULT_ENDPOINT = os.getenv("OPENAI_BASE_URL") or "https://api.openai.com/v1"
+
+_lock = threading.Lock()
+_http_client: Optional[httpx.Client] = None
+_http_async_client: Optional[httpx.AsyncClient] = None
+_models: Dict[Tuple[str, str, str], BaseChatModel] = {}
+_model_override: Optional[BaseChatModel] = None
+
+# node -> (tools, schema); node -> built runnable
+_specs: Dict[str, Tuple[Optional[List[Any]], Optional[Type[BaseModel]]]] = {}
+_runnables: Dict[str, Runnable] = {}
+
+_global_slots = threading.BoundedSemaphore(MAX_CONCURRENCY)
+_endpoint_slots: Dict[str, threading.BoundedSemaphore] = {}
+
+_stats_lock = threading.Lock()
+_stats = {"calls": 0, "in_flight": 0, "rate_limited": 0, "transient": 0, "failed": 0}
+
+metrics.gauge("insure_llm_in_flight", "LLM calls currently holding a gateway slot.", fn=lambda: _stats["in_flight"])
+
+
+def _record(field: str, delta: int = 1):
+    with _stats_lock:
+        _stats[field] += delta
+
+
+def get_llm_stats() -> dict:
+    """Returns call counts, in-flight calls, and retries after 429s and transient errors."""
+    with _stats_lock:
+        return {**_stats, "nodes": sorted(_runnables)}
+
+
+# --- NODE CONFIG ---
+def node_model(node: str) -> str:
+    return os.getenv(f"LLM_MODEL_{node.upper()}", DEFAULT_MODEL)
+
+
+def node_endpoint(node: str) -> str:
+    return os.getenv(f"LLM_BASE_URL_{node.upper()}", DEFAULT_ENDPOINT)
+
+
+def node_timeout(node: str) -> Optional[float]:
+    value = os.getenv(f"LLM_TIMEOUT_S_{node.upper()}")
+    return float(value) if value else None
+
+
+# --- HTTP CLIENTS ---
+def _limits() -> httpx.Limits:
+    return httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS)
+
+
+def http_client() -> httpx.Client:
+    global _http_client
+    with _lock:
+        if _http_client is None:
+            _http_client = httpx.Client(limits=_limits(), timeout=TIMEOUT_S)
+        return _http_client
+
+
+def http_async_client() -> httpx.AsyncClient:
+    global _http_async_client
+    with _lock:
+        if _http_async_client is None:
+            _http_async_client = httpx.AsyncClient(limits=_limits(), timeout=TIMEOUT_S)
+        return _http_async_client
+
+
+# --- CHAT MODELS ---
+def chat_model(model: str = DEFAULT_MODEL, endpoint: str = DEFAULT_ENDPOINT) -> BaseChatModel:
+    """Shared chat model for (provider, model, endpoint)."""
+    if _model_override is not None:
+        return _model_override
+    # The fake provider is a single offline model regardless of node config
+    key = (PROVIDER, "", "") if PROVIDER == "fake" else (PROVIDER, model, endpoint)
+    with _lock:
+        existing = _models.get(key)
+    if existing is not None:
+        return existing
+
+    if PROVIDER == "fake":
+        from fake_llm import FakeChatModel
+        built = FakeChatModel()
+    else:
+        from langchain_openai import ChatOpenAI
+        built = ChatOpenAI(
+            model=model,
+            temperature=TEMPERATURE,
+            base_url=endpoint,
+            http_client=http_client(),
+            http_async_client=http_async_client(),
+            max_retries=0,  # retried here instead, outside the concurrency slot
+        )
+    with _lock:
+        return _models.setdefault(key, built)
+
+
+def use_model(model: Optional[BaseChatModel]):
+    """
+    Routes every node to `model` (e.g. a FakeChatModel in benchmarks) and rebuilds
+    the node runnables. use_model(None) restores the configured provider.
+    """
+    global _model_override
+    _model_override = model
+    for node in list(_specs):
+        _build(node)
+
+
+# --- NODE RUNNABLES ---
+def register(node: str, tools: Optional[List[Any]] = None, schema: Optional[Type[BaseModel]] = None) -> Runnable:
+    """
+    Builds the runnable for a node once: tools bound, or structured output for `schema`,
+    wrapped in the concurrency limits and retries.
+    """
+    _specs[node] = (tools, schema)
+    return _build(node)
+
+
+def get(node: str) -> Runnable:
+    """The pre-built runnable for a registered node."""
+    return _runnables[node]
+
+
+def _build(node: str) -> Runnable:
+    tools, schema = _specs[node]
+    endpoint = node_endpoint(node)
+    model = chat_model(node_model(node), endpoint)
+    parser = None
+    if tools:
+        bound = model.bind_tools(tools)
+    elif schema is not None:
+        bound, parser = _split_structured(model.with_structured_output(schema))
+    else:
+        bound = model
+    model_name = getattr(model, "model_name", None) or model._llm_type
+    runnable = _gated(bound, parser, endpoint, node, model_name)
+    _runnables[node] = runnable
+    return runnable
+
+
+# --- CONCURRENCY + RETRY ---
+def _endpoint_slot(endpoint: str) -> threading.BoundedSemaphore:
+    with _lock:
+        if endpoint not in _endpoint_slots:
+            _endpoint_slots[endpoint] = threading.BoundedSemaphore(ENDPOINT_CONCURRENCY)
+        return _endpoint_slots[endpoint]
+
+
+@contextmanager
+def _slot(endpoint: str):
+    with _endpoint_slot(endpoint), _global_slots:
+        _record("in_flight")
+        try:
+            yield
+        finally:
+            _record("in_flight", -1)
+
+
+async def _acquire(semaphore: threading.BoundedSemaphore):
+    """Waits for a thread semaphore off the event loop. A wait cancelled mid-way gives the slot back."""
+    waiter = asyncio.ensure_future(asyncio.to_thread(semaphore.acquire))
+    try:
+        await asyncio.shield(waiter)
+    except asyncio.CancelledError:
+        # The thread still acquires eventually; release as soon as it does
+        waiter.add_done_callback(lambda w: semaphore.release() if not w.cancelled() and w.result() else None)
+        raise
+
+
+@asynccontextmanager
+async def _aslot(endpoint: str):
+    endpoint_slot = _endpoint_slot(endpoint)
+    await _acquire(endpoint_slot)
+    try:
+        await _acquire(_global_slots)
+        try:
+            _record("in_flight")
+            try:
+                yield
+            finally:
+                _record("in_flight", -1)
+        finally:
+            _global_slots.release()
+    finally:
+        endpoint_slot.release()
+
+
+def _is_rate_limited(error: Exception) -> bool:
+    return getattr(error, "status_code", None) == 429
+
+
+def _is_transient(error: Exception) -> bool:
+    """Connection errors, timeouts, 408, 409 and 5xx: what the OpenAI SDK retries by default."""
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in (408, 409) or status >= 500
+    # openai.APIConnectionError (and its APITimeoutError), or a raw httpx transport error
+    return isinstance(error, httpx.TransportError) or any(c.__name__ == "APIConnectionError" for c in type(error).__mro__)
+
+
+def _retry_reason(error: Exception, attempt: int, transient_retries: int) -> Optional[str]:
+    """"rate_limited" or "transient" when the call should be tried again, else None."""
+    if attempt >= MAX_RETRIES:
+        return None
+    if _is_rate_limited(error):
+        return "rate_limited"
+    if _is_transient(error) and transient_retries < TRANSIENT_RETRIES:
+        return "transient"
+    return None
+
+
+def _backoff_s(attempt: int, error: Exception) -> float:
+    # Honour Retry-After when the server sends one, otherwise exponential with full jitter
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), BACKOFF_MAX_S)
+        except ValueError:
+            pass
+    return random.uniform(0, min(BACKOFF_MAX_S, BACKOFF_BASE_S * 2 ** attempt))
+
+
+def _split_structured(structured: Runnable) -> Tuple[Runnable, Optional[Runnable]]:
+    """
+    Splits with_structured_output() into (model step, output parser). Cheaper than
+    include_raw=True, which wraps the model in a parallel map plus a fallback chain.
+    """
+    if isinstance(structured, RunnableSequence) and len(structured.steps) >= 2:
+        steps = structured.steps
+        model_step = steps[0] if len(steps) == 2 else RunnableSequence(*steps[:-1])
+        return model_step, steps[-1]
+    return structured, None
+
+
+def _gated(bound: Runnable, parser: Optional[Runnable], endpoint: str, node: str, model_name: str) -> Runnable:
+    timeout_s = node_timeout(node)
+
+    def account(input, message, seconds):
+        usage_ledger.record(node, model_name, getattr(message, "usage_metadata", None))
+        cassette.record_llm(node, input, message, seconds)
+
+    def call_kwargs(config) -> dict:
+        """{"timeout": s} when the node or the turn's deadline limits this call."""
+        left = turn_budget.remaining((config.get("configurable") or {}).get("deadline"))
+        if left is not None and left <= 0:
+            turn_budget.record(turn_budget.DEADLINE, node)
+            raise turn_budget.DeadlineExceeded(f"turn deadline passed before the {node} LLM call")
+        limits = [t for t in (timeout_s, left) if t is not None]
+        return {"timeout": min(limits)} if limits else {}
+
+    def timed_out(error: Exception):
+        if turn_budget.is_timeout(error) and not isinstance(error, turn_budget.DeadlineExceeded):
+            turn_budget.record(turn_budget.LLM_TIMEOUT, node)
+
+    def call(input, config):
+        transient = 0
+        for attempt in range(MAX_RETRIES + 1):
+            kwargs = call_kwargs(config)
+            with _slot(endpoint):
+                _record("calls")
+                try:
+                    start = time.perf_counter()
+                    with metrics.LLM_SECONDS.time(node=node):
+                        message = cassette.replayed_llm(node, input)
+                        if message is None:
+                            message = bound.invoke(input, config, **kwargs)
+                    account(input, message, time.perf_counter() - start)
+                    return parser.invoke(message, config) if parser is not None else message
+                except Exception as e:
+                    reason = _retry_reason(e, attempt, transient)
+                    if reason is None:
+                        _record("failed")
+                        timed_out(e)
+                        raise
+                    error = e
+            _record(reason)
+            transient += reason == "transient"
+            time.sleep(_backoff_s(attempt, error))
+
+    async def acall(input, config):
+        transient = 0
+        for attempt in range(MAX_RETRIES + 1):
+            kwargs = call_kwargs(config)
+            async with _aslot(endpoint):
+                _record("calls")
+                try:
+                    start = time.perf_counter()
+                    with metrics.LLM_SECONDS.time(node=node):
+                        message = cassette.replayed_llm(node, input)
+                        if message is None:
+                            message = await bound.ainvoke(input, config, **kwargs)
+                    account(input, message, time.perf_counter() - start)
+                    return await parser.ainvoke(message, config) if parser is not None else message
+                except Exception as e:
+                    reason = _retry_reason(e, attempt, transient)
+                    if reason is None:
+                        _record("failed")
+                        timed_out(e)
+                        raise
+                    error = e
+            _record(reason)
+            transient += reason == "transient"
+            await asyncio.sleep(_backoff_s(attempt, error))
+
+    return RunnableLambda(call, afunc=acall, name=f"llm:{node}")
+
+
+async def aclose():
+    """Closes the pooled HTTP clients (app shutdown)."""
+    global _http_client, _http_async_client
+    with _lock:
+        client, async_client = _http_client, _http_async_client
+        _http_client = _http_async_client = None
+    if client is not None:
+        client.close()
+    if async_client is not None:
+        await async_client.aclose()
@@ -0,0 +1,265 @@
+"""
+metrics.py
+Domain: Process Metrics (Prometheus text format)
+
+Counters, gauges and histograms kept in process and rendered at /api/metrics.
+Recording is a dict lookup plus a short locked update, so it is cheap enough
+for every request, node and tool call.
+
+- Histograms: guardrail, supervisor, agent, tool, LLM and report latency (seconds)
+- Counters: routes, guardrail blocks, cache lookups, tool errors
+- Gauges: active sessions, session history bytes, in-flight LLM calls (read from a callback at scrape time)
+"""
+import bisect
+import threading
+import time
+from functools import wraps
+from typing import Callable, Dict, List, Optional, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+# Seconds; covers DB-only tools (ms) through slow LLM turns
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _key(labels: dict) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _fmt_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _fmt_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        super().__init__(name, help_text)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = _key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_key(labels), 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_fmt_labels(k)} {_fmt_value(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """A set/inc/dec gauge, or one read from `fn` at scrape time."""
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, fn: Optional[Callable[[], float]] = None):
+        super().__init__(name, help_text)
+        self._values: Dict[LabelKey, float] = {}
+        self.fn = fn
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[_key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = _key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def render(self) -> List[str]:
+        if self.fn is not None:
+            try:
+                items = [((), float(self.fn()))]
+            except Exception:
+                items = []
+        else:
+            with self._lock:
+                items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_fmt_labels(k)} {_fmt_value(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(sorted(buckets))
+        # label key -> [per-bucket counts (+Inf last), sum, count]
+        self._values: Dict[LabelKey, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = _key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def time(self, **labels):
+        """Context manager that observes the elapsed seconds of its block."""
+        return _Timer(self, labels)
+
+    def count(self, **labels) -> int:
+        entry = self._values.get(_key(labels))
+        return entry[2] if entry else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self._values.items())
+        lines = self.header()
+        for key, (counts, total, n) in items:
+            cumulative = 0
+            for bound, c in zip(self.buckets, counts):
+                cumulative += c
+                lines.append(f"{self.name}_bucket{_fmt_labels(key, ('le', _fmt_value(bound)))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_fmt_labels(key, ('le', '+Inf'))} {n}")
+            lines.append(f"{self.name}_sum{_fmt_labels(key)} {_fmt_value(total)}")
+            lines.append(f"{self.name}_count{_fmt_labels(key)} {n}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: dict):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+# --- REGISTRY ---
+_registry: Dict[str, _Metric] = {}
+
+
+def _register(metric):
+    _registry[metric.name] = metric
+    return metric
+
+
+def counter(name: str, help_text: str) -> Counter:
+    return _registry.get(name) or _register(Counter(name, help_text))
+
+
+def gauge(name: str, help_text: str, fn: Optional[Callable[[], float]] = None) -> Gauge:
+    return _registry.get(name) or _register(Gauge(name, help_text, fn))
+
+
+def histogram(name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+    return _registry.get(name) or _register(Histogram(name, help_text, buckets))
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    for name in sorted(_registry):
+        lines.extend(_registry[name].render())
+    return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# --- APPLICATION METRICS ---
+GUARDRAIL_SECONDS = histogram("insure_guardrail_seconds", "Guardrail validation latency.")
+SUPERVISOR_SECONDS = histogram("insure_supervisor_seconds", "Supervisor routing latency.")
+AGENT_SECONDS = histogram("insure_agent_seconds", "Agent node latency (one LLM step).")
+TOOL_SECONDS = histogram("insure_tool_seconds", "Tool call latency.")
+LLM_SECONDS = histogram("insure_llm_seconds", "LLM call latency through the gateway, per node.")
+REPORT_SECONDS = histogram("insure_report_seconds", "Executive summary report generation latency.")
+ADMISSION_WAIT_SECONDS = histogram("insure_admission_wait_seconds", "Time queued before admission, per endpoint.")
+SESSION_LOCK_WAIT_SECONDS = histogram("insure_session_lock_wait_seconds", "Time a turn waited for its session's previous turn.")
+CLAIM_WRITE_SECONDS = histogram("insure_claim_write_seconds", "Claim filing latency through the single writer (queue + commit).")
+CLAIM_WRITE_BATCH = histogram("insure_claim_write_batch_size", "Claim filings committed per transaction.",
+                              buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+
+ROUTES = counter("insure_routes_total", "Supervisor routing decisions by target.")
+GUARDRAIL_BLOCKS = counter("insure_guardrail_blocks_total", "Messages blocked by the guardrail, by layer.")
+CACHE_LOOKUPS = counter("insure_cache_lookups_total", "Cache lookups by cache and result (hit/miss).")
+TOOL_ERRORS = counter("insure_tool_errors_total", "Tool calls that raised, by tool.")
+ADMISSIONS = counter("insure_admissions_total", "Admission decisions for LLM-bound requests, by endpoint and outcome.")
+COALESCED = counter("insure_coalesced_requests_total", "Duplicate requests answered from another execution, by endpoint and source.")
+SESSION_SPILLS = counter("insure_session_spills_total", "Session histories spilled to disk, loaded back or evicted, by direction.")
+CLAIM_WRITES = counter("insure_claim_writes_total", "Claim filings by outcome (created, duplicate, error).")
+TURN_LIMITS = counter("insure_turn_limits_total", "Turn limits that fired (deadline, llm_timeout, tool_rounds, recursion), by node.")
+FAN_OUT_BRANCHES = counter("insure_fan_out_branches_total", "Agent branches run in parallel for compound questions, by agent.")
+FAN_OUT_BRANCH_ERRORS = counter("insure_fan_out_branch_errors_total", "Fan-out agent branches that raised and were answered with a placeholder, by agent.")
+
+
+def timed(hist: Histogram, **labels):
+    """Decorator observing a function's latency in `hist`."""
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with hist.time(**labels):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class ToolMetricsHandler(BaseCallbackHandler):
+    """
+    Callback handler recording tool latency and errors. Chain and LLM events are ignored;
+    tool events are gated by ignore_agent, so that flag stays False.
+    """
+    ignore_chain = True
+    ignore_llm = True
+    ignore_chat_model = True
+    ignore_retriever = True
+    ignore_custom_event = True
+
+    def __init__(self):
+        self._started: Dict = {}
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        name = kwargs.get("name") or (serialized or {}).get("name", "unknown")
+        self._started[run_id] = (name, time.perf_counter())
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._finish(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        name = self._finish(run_id)
+        if name:
+            TOOL_ERRORS.inc(tool=name)
+
+    def _finish(self, run_id) -> Optional[str]:
+        entry = self._started.pop(run_id, None)
+        if entry is None:
+            return None
+        TOOL_SECONDS.observe(time.perf_counter() - entry[1], tool=entry[0])
+        return entry[0]
@@ -0,0 +1,127 @@
+"""
+prefetch.py
+Domain: Speculative Tool Prefetch
+
+When the supervisor routes to an agent whose first tool call is predictable,
+the tool is started in a parallel graph branch while the agent makes its first
+LLM call. SecureToolNode then serves the stored result instead of querying again.
+"""
+import json
+import logging
+import threading
+from typing import Dict, List, Optional
+
+from langchain_core.messages import ToolMessage
+
+from billing_tools import get_billing_history
+from claims_tools import get_customer_claims
+import cassette
+import metrics
+import tracing
+
+logger = logging.getLogger(__name__)
+
+# --- POLICY TABLE ---
+# agent -> tools to prefetch. Each tool is called with the authenticated customer's ID.
+PREFETCH_POLICY = {
+    "billing_agent": [get_billing_history],
+    "claims_agent": [get_customer_claims],
+}
+
+# Tools that change customer data; running any of them discards prefetched results.
+WRITE_TOOLS = {"file_new_claim"}
+
+# --- HIT-RATE METRICS ---
+_stats_lock = threading.Lock()
+_stats: Dict[str, Dict[str, int]] = {}
+
+
+def _record(agent: str, field: str, count: int = 1):
+    with _stats_lock:
+        entry = _stats.setdefault(agent, {"issued": 0, "hits": 0})
+        entry[field] += count
+
+
+def get_prefetch_stats() -> dict:
+    """Returns per-agent prefetch counts and hit rate."""
+    with _stats_lock:
+        return {
+            agent: {**s, "hit_rate": round(s["hits"] / s["issued"], 3) if s["issued"] else 0.0}
+            for agent, s in _stats.items()
+        }
+
+
+# --- STATE REDUCER ---
+def merge_prefetched(left: Optional[dict], right: Optional[dict]) -> dict:
+    """
+    Merges prefetched results. Returning None from a node clears them all;
+    a None value for a tool name removes that one result (consumed).
+    """
+    if right is None:
+        return {}
+    return {name: entry for name, entry in {**(left or {}), **right}.items() if entry is not None}
+
+
+def needs_prefetch(agent: str) -> bool:
+    return agent in PREFETCH_POLICY
+
+
+# --- PREFETCH NODE ---
+def prefetch_node(state) -> dict:
+    """Runs the policy tools for the routed agent and stores results in state."""
+    agent = state.get("next", "")
+    customer_id = state.get("authenticated_customer_id", "")
+    tools = PREFETCH_POLICY.get(agent, [])
+    if not customer_id or not tools or cassette.replaying_tools():
+        return {}
+
+    config = {"configurable": {"authenticated_customer_id": customer_id}}
+    results = {}
+    for t in tools:
+        args = {"customer_id": customer_id}
+        try:
+            output = t.invoke(args, config)
+        except Exception as e:
+            logger.warning("prefetch failed", extra={"tool": t.name, "error": str(e)})
+            continue
+        results[t.name] = {"agent": agent, "args": args, "result": output}
+        _record(agent, "issued")
+    return {"prefetched": results}
+
+
+def take_prefetched(state, tool_calls: List[dict]):
+    """
+    Splits tool calls into prefetched hits and misses.
+    Returns (hits, misses, consumed): hits maps tool_call_id -> ToolMessage, and
+    consumed ({tool name: None}) is the state update that drops the results used.
+    Each prefetched result serves one call; a repeated call runs the tool again.
+    """
+    prefetched = state.get("prefetched") or {}
+    hits, misses, consumed = {}, [], {}
+    for tc in tool_calls:
+        entry = prefetched.get(tc["name"])
+        if entry and tc["name"] not in consumed and entry["args"] == tc.get("args"):
+            consumed[tc["name"]] = None
+            hits[tc["id"]] = ToolMessage(
+                content=_to_content(entry["result"]),
+                name=tc["name"],
+                tool_call_id=tc["id"],
+            )
+            _record(entry["agent"], "hits")
+            metrics.CACHE_LOOKUPS.inc(cache="prefetch", result="hit")
+            tracing.event(tc["name"], "tool", cache_hit=True, source="prefetch")
+        else:
+            misses.append(tc)
+            if prefetched:
+                metrics.CACHE_LOOKUPS.inc(cache="prefetch", result="miss")
+    return hits, misses, consumed
+
+
+def _to_content(result) -> str:
+    # Same serialization ToolNode applies to non-string tool outputs
+    if isinstance(result, str):
+        return result
+    try:
+        return json.dumps(result, ensure_ascii=False)
+    except Exception:
+        return str(result)
@@ -0,0 +1,226 @@
+"""
+profiling.py
+Domain: On-Demand Request Profiling
+
+A statistical (sampling) profiler around single /api/chat and /api/report requests.
+A sampler thread reads the Python stack of every thread working on the request every
+PROFILE_INTERVAL_MS: the request thread itself, plus the LangGraph / ToolNode worker
+threads, which register through ThreadTracker callbacks while they run a node or tool.
+
+A request is profiled when:
+- it carries X-Profile: 1 and X-Profile-Token equal to PROFILE_ADMIN_TOKEN, or
+- it is picked by PROFILE_SAMPLE_RATE (0.0 - 1.0, default 0)
+When neither applies the cost is one header check and one random() call.
+
+Each profile writes two files to PROFILE_DIR:
+- <stamp>-<endpoint>-<id>.collapsed: folded stacks ("outer;inner;leaf count"), for
+  flamegraph.pl, speedscope or inferno
+- <stamp>-<endpoint>-<id>.txt: wall time and the top-N functions by self and total samples
+Time inside C calls (sqlite3, JSON encoding, socket reads) is charged to the Python
+frame that made the call.
+"""
+import contextvars
+import logging
+import os
+import random
+import secrets
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles"))
+SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+ADMIN_TOKEN = os.getenv("PROFILE_ADMIN_TOKEN", "")
+INTERVAL_S = float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000
+TOP_N = int(os.getenv("PROFILE_TOP_N", "25"))
+MAX_DEPTH = 128
+
+_current: contextvars.ContextVar[Optional["Profiler"]] = contextvars.ContextVar("profiler", default=None)
+
+
+def requested(profile_header: Optional[str], token_header: Optional[str]) -> bool:
+    """Whether this request should be profiled (admin header or sampling)."""
+    if profile_header and ADMIN_TOKEN and token_header and secrets.compare_digest(token_header, ADMIN_TOKEN):
+        return profile_header.lower() in ("1", "true", "yes")
+    return SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE
+
+
+# --- SAMPLER ---
+def _label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _fold(frame) -> str:
+    """The stack as "outer;...;leaf"."""
+    labels = []
+    while frame is not None and len(labels) < MAX_DEPTH:
+        labels.append(_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class Profiler:
+    """Samples the stacks of the registered threads until stopped."""
+
+    def __init__(self, endpoint: str, interval_s: float = INTERVAL_S):
+        self.endpoint = endpoint
+        self.interval_s = interval_s
+        self.id = uuid.uuid4().hex[:8]
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.duration_s = 0.0
+        self._threads: Dict[int, int] = {threading.get_ident(): 1}  # thread id -> active runs
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._run, name=f"profiler-{self.id}", daemon=True)
+        self.handler = ThreadTracker(self)
+
+    def enter_thread(self):
+        tid = threading.get_ident()
+        with self._lock:
+            self._threads[tid] = self._threads.get(tid, 0) + 1
+
+    def exit_thread(self, tid: int):
+        with self._lock:
+            remaining = self._threads.get(tid, 0) - 1
+            if remaining > 0:
+                self._threads[tid] = remaining
+            else:
+                self._threads.pop(tid, None)
+
+    def start(self):
+        self._t0 = time.perf_counter()
+        self._sampler.start()
+
+    def stop(self):
+        self._stop.set()
+        self._sampler.join()
+        self.duration_s = time.perf_counter() - self._t0
+
+    def _run(self):
+        while not self._stop.wait(self.interval_s):
+            frames = sys._current_frames()
+            with self._lock:
+                threads = list(self._threads)
+            for tid in threads:
+                frame = frames.get(tid)
+                if frame is not None:
+                    self.stacks[_fold(frame)] += 1
+                    self.samples += 1
+
+    # --- OUTPUT ---
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def summary(self, top_n: int = TOP_N) -> str:
+        self_counts, total_counts = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            self_counts[frames[-1]] += count
+            for label in set(frames):
+                total_counts[label] += count
+        ms = self.interval_s * 1000
+        lines = [
+            f"endpoint: {self.endpoint}",
+            f"wall: {self.duration_s * 1000:.1f} ms, samples: {self.samples} every {ms:g} ms "
+            f"(across {len(self.stacks)} distinct stacks)",
+            "",
+        ]
+        for title, counts in (("SELF (leaf frame)", self_counts), ("TOTAL (frame on stack)", total_counts)):
+            lines.append(f"{title:<60} {'samples':>8} {'~ms':>8} {'%':>6}")
+            for label, count in counts.most_common(top_n):
+                share = count / self.samples * 100 if self.samples else 0.0
+                lines.append(f"{label[:60]:<60} {count:>8} {count * ms:>8.1f} {share:>6.1f}")
+            lines.append("")
+        return "\n".join(lines)
+
+    def write(self, directory: str = PROFILE_DIR) -> str:
+        """Writes the .collapsed and .txt files; returns their common path prefix."""
+        os.makedirs(directory, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        prefix = os.path.join(directory, f"{stamp}-{self.endpoint}-{self.id}")
+        with open(prefix + ".collapsed", "w", encoding="utf-8") as f:
+            f.write(self.collapsed())
+        with open(prefix + ".txt", "w", encoding="utf-8") as f:
+            f.write(self.summary())
+        return prefix
+
+
+class ThreadTracker(BaseCallbackHandler):
+    """
+    Adds the thread running each graph node / tool to the profiled set while it runs.
+    Tool events are gated by ignore_agent, so that flag stays False.
+    """
+    ignore_llm = True
+    ignore_chat_model = True
+    ignore_retriever = True
+    ignore_custom_event = True
+
+    def __init__(self, profiler: Profiler):
+        self.profiler = profiler
+        self._runs: Dict = {}  # run_id -> thread id
+
+    def _enter(self, run_id):
+        self._runs[run_id] = threading.get_ident()
+        self.profiler.enter_thread()
+
+    def _exit(self, run_id):
+        tid = self._runs.pop(run_id, None)
+        if tid is not None:
+            self.profiler.exit_thread(tid)
+
+    def on_chain_start(self, serialized, inputs, *, run_id, **kwargs):
+        self._enter(run_id)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._exit(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._exit(run_id)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        self._enter(run_id)
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._exit(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._exit(run_id)
+
+
+def callbacks() -> list:
+    """Callback handlers for a LangChain/LangGraph invoke under the current profile."""
+    profiler = _current.get()
+    return [profiler.handler] if profiler else []
+
+
+@contextmanager
+def profile(endpoint: str, enabled: bool):
+    """Profiles the block when enabled; yields the Profiler (or None)."""
+    if not enabled:
+        yield None
+        return
+    profiler = Profiler(endpoint)
+    token = _current.set(profiler)
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        _current.reset(token)
+        try:
+            prefix = profiler.write()
+            logger.info("request profiled", extra={"endpoint": endpoint, "profile": prefix,
+                                                   "samples": profiler.samples})
+        except OSError as e:
+            logger.error("profile write failed", extra={"endpoint": endpoint, "error": str(e)})
@@ -2,13 +2,22 @@
 rag_tools.py
 Domain: Tool Definition for RAG Search
 """
+import time
+
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
 from langchain_core.tools import tool
+from langgraph.prebuilt import ToolNode
+from langgraph.prebuilt.tool_node import TOOL_CALL_ERROR_TEMPLATE
 
 # Import directly from your subfolder package
 from vectordb.vector_db import query_faqs
+import cassette
+import metrics
+import tracing
 
 @tool
-def search_faq(query: str):
+def search_faq(query: str, config: RunnableConfig = None):
     """
     Searches the Knowledge Base for insurance definitions, Singapore terms, and general policies.
     Use this for questions like:
@@ -19,4 +28,55 @@ def search_faq(query: str):
 
     DO NOT use this for personal user data (like "What is *my* policy number?").
     """
-    return query_faqs(query)
+    # Narrow the search to FAQs for the customer's policy types (set at login)
+    policy_types = (config or {}).get("configurable", {}).get("policy_types")
+    return query_faqs(query, policy_types=policy_types)
+
+
+# --- BATCHED TOOL NODE ---
+class FaqToolNode:
+    """
+    Tool node for the FAQ agent.
+    All search_faq calls in one AI message ("Explain PayNow and GIRO" -> two calls)
+    are answered by a single batched query_faqs call: one embedding pass and one
+    store query instead of one per call. Any other tool call goes through ToolNode.
+    Searches are narrowed to the session's policy types (state["policy_types"]).
+    """
+    def __init__(self, tools=None):
+        self.tool_node = ToolNode(tools or [search_faq])
+
+    def __call__(self, state, config: RunnableConfig = None):
+        policy_types = state.get("policy_types") or []
+        config = config or {}
+        config = {**config, "configurable": {**config.get("configurable", {}), "policy_types": policy_types}}
+
+        last = state["messages"][-1]
+        tool_calls = getattr(last, "tool_calls", None) or []
+        replayed = cassette.replayed_tools(tool_calls)
+        if replayed is not None:
+            return {"messages": replayed}
+        searches = [tc for tc in tool_calls if tc["name"] == search_faq.name and isinstance(tc["args"].get("query"), str)]
+        if not searches:
+            return self.tool_node.invoke(state, config)
+
+        # Batched searches bypass the tool callbacks; record their span and metrics here
+        start = time.perf_counter()
+        try:
+            with tracing.span(search_faq.name, "tool", batched=len(searches)):
+                answers = query_faqs([tc["args"]["query"] for tc in searches], policy_types=policy_types)
+            status = "success"
+        except Exception as e:
+            # As ToolNode does: the agent gets the error as the tool result and can still answer
+            metrics.TOOL_ERRORS.inc(tool=search_faq.name)
+            answers, status = [TOOL_CALL_ERROR_TEMPLATE.format(error=repr(e))] * len(searches), "error"
+        metrics.TOOL_SECONDS.observe(time.perf_counter() - start, tool=search_faq.name)
+        tool_messages = {
+            tc["id"]: ToolMessage(content=answer, name=tc["name"], tool_call_id=tc["id"], status=status)
+            for tc, answer in zip(searches, answers)
+        }
+        others = [tc for tc in tool_calls if tc["id"] not in tool_messages]
+        if others:
+            partial = AIMessage(content=last.content, tool_calls=others, id=last.id)
+            for m in self.tool_node.invoke({**state, "messages": [partial]}, config)["messages"]:
+                tool_messages[m.tool_call_id] = m
+        return {"messages": [tool_messages[tc["id"]] for tc in tool_calls if tc["id"] in tool_messages]}
@@ -2,13 +2,19 @@
 report.py
 Executive Summary Report generation.
 Gathers customer data from the database and uses LLM for narrative generation.
+Account totals (policies, outstanding / overdue bills, claims by status) are read
+from customer_rollup.py rather than aggregated per report.
 """
 import os
 import sqlite3
 from datetime import date
-from langchain_openai import ChatOpenAI
 from pydantic import BaseModel, Field
 
+import customer_rollup
+import llm_gateway
+import metrics
+import usage_ledger
+
 DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "db", "insurance_support.db")
 
 
@@ -30,6 +36,9 @@ class ExecutiveSummary(BaseModel):
     key_findings: list[str] = Field(description="3-5 key findings about payment behavior, claims, and coverage")
 
 
+llm_gateway.register("report", schema=ExecutiveSummary)
+
+
 # --- Data gathering functions ---
 
 def get_customer_profile(customer_id: str) -> dict:
@@ -127,13 +136,27 @@ def get_claims_history(customer_id: str) -> list[dict]:
         conn.close()
 
 
-def generate_executive_summary(profile: dict, policies: list, claims: list) -> dict:
-    """Use GPT-4o-mini with structured output to produce the executive summary narrative."""
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+def get_account_summary(customer_id: str) -> dict:
+    """Policy, billing and claim totals from the customer's rollup row."""
+    totals = customer_rollup.get(customer_id)
+    if not totals:
+        return {}
+    return {
+        "active_policies": totals["active_policies"],
+        "total_policies": totals["policies"],
+        "outstanding": {"amount": totals["outstanding_amount"], "bills": totals["outstanding_bills"], "currency": "SGD"},
+        "overdue": {"amount": totals["overdue_amount"], "bills": totals["overdue_bills"], "currency": "SGD"},
+        "claims": {"count": totals["claims"], "amount": totals["claimed_amount"],
+                   "by_status": totals["claims_by_status"]},
+    }
+
 
+def generate_executive_summary(profile: dict, policies: list, claims: list, summary: dict = None) -> dict:
+    """Use GPT-4o-mini with structured output to produce the executive summary narrative."""
     prompt = f"""You are an insurance analyst writing an executive summary for a customer report.
 
 Customer: {profile.get('name', 'Unknown')}
+Account totals: {summary or {}}
 Policies: {policies}
 Claims: {claims}
 
@@ -143,30 +166,45 @@ Rules:
 3. key_findings: 3-5 key observations about payment patterns, claims history, coverage gaps, or risk indicators
 """
 
+    # Over the token budget: skip the LLM and use the templated summary
+    if usage_ledger.current_budget_status() == usage_ledger.BUDGET_EXCEEDED:
+        return fallback_summary(policies, claims, summary)
+
     try:
-        result = llm.with_structured_output(ExecutiveSummary).invoke(prompt)
+        result = llm_gateway.get("report").invoke(prompt)
         return result.model_dump()
-    except Exception as e:
+    except Exception:
         # Fallback if LLM fails
-        has_active = any(p.get("status") == "Active" for p in policies)
-        return {
-            "account_status": "Active" if has_active else "Inactive",
-            "portfolio_narrative": f"Customer holds {len(policies)} policy(ies) with {len(claims)} claim(s) on record.",
-            "key_findings": [
-                f"Total policies: {len(policies)}",
-                f"Total claims: {len(claims)}",
-            ],
-        }
+        return fallback_summary(policies, claims, summary)
+
+
+def fallback_summary(policies: list, claims: list, summary: dict = None) -> dict:
+    """Templated executive summary built from the data alone (no LLM)."""
+    has_active = summary["active_policies"] > 0 if summary else any(p.get("status") == "Active" for p in policies)
+    findings = [
+        f"Total policies: {len(policies)}",
+        f"Total claims: {len(claims)}",
+    ]
+    if summary:
+        findings.append(f"Outstanding: SGD {summary['outstanding']['amount']:.2f} across "
+                        f"{summary['outstanding']['bills']} bill(s), SGD {summary['overdue']['amount']:.2f} overdue")
+    return {
+        "account_status": "Active" if has_active else "Inactive",
+        "portfolio_narrative": f"Customer holds {len(policies)} policy(ies) with {len(claims)} claim(s) on record.",
+        "key_findings": findings,
+    }
 
 
 # --- Main orchestrator ---
 
+@metrics.timed(metrics.REPORT_SECONDS)
 def generate_report(customer_id: str) -> dict:
     """Assemble the full executive summary report."""
     profile = get_customer_profile(customer_id)
     policies = get_policy_portfolio(customer_id)
     claims = get_claims_history(customer_id)
-    executive_summary = generate_executive_summary(profile, policies, claims)
+    summary = get_account_summary(customer_id)
+    executive_summary = generate_executive_summary(profile, policies, claims, summary)
 
     return {
         "report_metadata": {
@@ -176,6 +214,7 @@ def generate_report(customer_id: str) -> dict:
         },
         "executive_summary": executive_summary,
         "customer_profile": profile,
+        "account_summary": summary,
         "policy_portfolio": policies,
         "claims_history": claims,
     }
@@ -0,0 +1,190 @@
+"""
+response_cache.py
+Domain: Per-Customer Response Cache for Read-Only Questions
+
+Answers to self-contained, read-only questions ("what is my premium?", "show my claims")
+are cached per customer and returned without invoking the graph.
+
+Key: (authenticated_customer_id, normalized question, data-version stamp)
+- The data-version stamp hashes the customer's rows, so any change to their
+  policies, bills, payments, claims or profile misses the cache.
+- Turns that call a write tool (e.g. file_new_claim) are never cached and drop
+  the customer's entries.
+- Optional paraphrase matching by embedding similarity (RESPONSE_CACHE_SEMANTIC=1),
+  using the FAQ store's warm embedding model (vector_db.get_embedding_function).
+- A message the regex guardrail (guardrails.quick_check) blocks is never served
+  from the cache (api.py runs it before the lookup).
+- Only self-contained questions are looked up or stored: at least
+  RESPONSE_CACHE_MIN_WORDS words, no pronouns pointing at earlier turns, and not a
+  reply to a question the assistant just asked ("yes", a bare policy number). The
+  data-version stamp is computed only for those turns.
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from langchain_core.messages import AIMessage
+
+DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "db", "insurance_support.db")
+
+ENABLED = os.getenv("RESPONSE_CACHE", "1").lower() in ("1", "true", "yes")
+SEMANTIC = os.getenv("RESPONSE_CACHE_SEMANTIC", "0").lower() in ("1", "true", "yes")
+SIMILARITY_THRESHOLD = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.92"))
+TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_S", "900"))
+MAX_ENTRIES_PER_CUSTOMER = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "50"))
+MIN_QUESTION_WORDS = int(os.getenv("RESPONSE_CACHE_MIN_WORDS", "3"))
+
+# Tools that only read. A turn is cacheable only if every tool it called is listed here.
+READ_ONLY_TOOLS = {
+    "lookup_customer", "get_customer_policies", "get_policy_details", "get_vehicle_details",
+    "get_customer_claims", "check_claim_status", "get_billing_history", "search_faq",
+}
+WRITE_TOOLS = {"file_new_claim"}
+
+# Questions that lean on earlier turns ("tell me more about that one") depend on context
+_CONTEXTUAL = re.compile(r"\b(that|this|it|its|those|these|them|more|above|previous|again|same|else)\b")
+_NON_WORD = re.compile(r"[^a-z0-9\s]")
+
+_lock = threading.Lock()
+_entries: Dict[str, "OrderedDict[str, dict]"] = {}
+
+
+def normalize(question: str) -> str:
+    text = _NON_WORD.sub(" ", (question or "").lower())
+    return " ".join(text.split())
+
+
+def data_version(customer_id: str) -> str:
+    """Hashes the customer's rows across all tables into a short stamp."""
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        rows = conn.execute(
+            """
+            SELECT 'u', customer_id, email || phone || IFNULL(address, ''), '' FROM customers WHERE customer_id = :cid
+            UNION ALL
+            SELECT 'p', policy_number, status, premium_amount FROM policies WHERE customer_id = :cid
+            UNION ALL
+            SELECT 'b', b.bill_id, b.status, b.amount
+            FROM billing b JOIN policies p ON b.policy_number = p.policy_number WHERE p.customer_id = :cid
+            UNION ALL
+            SELECT 'y', pay.payment_id, pay.status, pay.amount
+            FROM payments pay JOIN billing b ON pay.bill_id = b.bill_id
+            JOIN policies p ON b.policy_number = p.policy_number WHERE p.customer_id = :cid
+            UNION ALL
+            SELECT 'c', c.claim_id, c.status, c.claim_amount
+            FROM claims c JOIN policies p ON c.policy_number = p.policy_number WHERE p.customer_id = :cid
+            ORDER BY 1, 2
+            """,
+            {"cid": customer_id},
+        ).fetchall()
+    finally:
+        conn.close()
+    return hashlib.md5(repr(rows).encode()).hexdigest()[:16]
+
+
+def _embed(text: str):
+    # The FAQ store's warm model (vector_db.py): one loaded ONNX session per process
+    from vectordb.vector_db import get_embedding_function
+    import numpy as np
+    vector = np.asarray(get_embedding_function()([text])[0], dtype="float32")
+    return vector / (np.linalg.norm(vector) or 1.0)
+
+
+# --- LOOKUP / STORE ---
+def lookup(customer_id: str, question: str, version: str) -> Optional[dict]:
+    """Returns the cached entry for this question, or None."""
+    if not ENABLED or not customer_id:
+        return None
+    key = normalize(question)
+    now = time.time()
+    with _lock:
+        bucket = _entries.get(customer_id)
+        if not bucket:
+            return None
+        entry = bucket.get(key)
+        if entry and entry["version"] == version and now - entry["created"] < TTL_SECONDS:
+            bucket.move_to_end(key)
+            return entry
+        candidates = [e for e in bucket.values()
+                      if e["version"] == version and now - e["created"] < TTL_SECONDS and e.get("embedding") is not None]
+
+    if not SEMANTIC or not candidates or not is_cacheable_question(question):
+        return None
+    vector = _embed(key)
+    best = max(candidates, key=lambda e: float(vector @ e["embedding"]))
+    if float(vector @ best["embedding"]) >= SIMILARITY_THRESHOLD:
+        return best
+    return None
+
+
+def answers_question(history: List) -> bool:
+    """True if the assistant's last reply asked something: the next message is likely the answer."""
+    for m in reversed(history):
+        if isinstance(m, AIMessage) and m.content and not m.tool_calls:
+            return "?" in str(m.content)
+    return False
+
+
+def is_cacheable_question(question: str, history: Optional[List] = None) -> bool:
+    """A self-contained question: long enough to carry its own intent, and not a reply to the assistant."""
+    key = normalize(question)
+    if not key or len(key) > 200 or len(key.split()) < MIN_QUESTION_WORDS or _CONTEXTUAL.search(key):
+        return False
+    return not answers_question(history or [])
+
+
+def is_cacheable_turn(turn_messages: List) -> bool:
+    """A turn is cacheable if it used at least one tool and every tool was read-only."""
+    names = [tc["name"] for m in turn_messages if isinstance(m, AIMessage) for tc in (m.tool_calls or [])]
+    return bool(names) and all(n in READ_ONLY_TOOLS for n in names)
+
+
+def turn_has_write(turn_messages: List) -> bool:
+    return any(tc["name"] in WRITE_TOOLS
+               for m in turn_messages if isinstance(m, AIMessage) for tc in (m.tool_calls or []))
+
+
+def store(customer_id: str, question: str, version: Optional[str], turn_messages: List,
+          answer: str, agent_name: Optional[str], tool_calls: list):
+    """
+    Caches the answer if the question was cacheable (a data-version stamp was taken for it,
+    else version is None) and the turn was read-only. A turn that wrote drops the customer's entries.
+    """
+    if not ENABLED or not customer_id:
+        return
+    if turn_has_write(turn_messages):
+        invalidate_customer(customer_id)
+        return
+    if version is None or not answer or not is_cacheable_question(question) or not is_cacheable_turn(turn_messages):
+        return
+
+    key = normalize(question)
+    entry = {
+        "answer": answer,
+        "agent_name": agent_name,
+        "tool_calls": tool_calls,
+        "version": version,
+        "created": time.time(),
+        "embedding": _embed(key) if SEMANTIC else None,
+    }
+    with _lock:
+        bucket = _entries.setdefault(customer_id, OrderedDict())
+        bucket[key] = entry
+        bucket.move_to_end(key)
+        while len(bucket) > MAX_ENTRIES_PER_CUSTOMER:
+            bucket.popitem(last=False)
+
+
+def invalidate_customer(customer_id: str):
+    with _lock:
+        _entries.pop(customer_id, None)
+
+
+def clear():
+    with _lock:
+        _entries.clear()
@@ -0,0 +1,169 @@
+"""
+response_templates.py
+Domain: Templated Replies for Deterministic Lookups
+
+For simple lookups ("What's my VIN?", "Status of CLM000123?", "Do I owe anything?")
+the answer is fully determined by the tool output. When enabled, the final AIMessage
+is rendered here instead of making a second agent LLM call.
+
+Opt-in: set RESPONSE_TEMPLATES=1. A turn can also opt in through the graph state
+(prefer_templates), which the API sets when a session nears its token budget.
+"""
+import json
+import os
+import re
+from typing import Callable, Dict, Optional, Tuple
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+ENABLED = os.getenv("RESPONSE_TEMPLATES", "0").lower() in ("1", "true", "yes")
+
+# --- INTENTS ---
+# Checked in order against the user's latest message; the first match wins.
+INTENT_PATTERNS = [
+    ("vin", re.compile(r"(?i)\bvin\b|chassis")),
+    ("plate", re.compile(r"(?i)licen[cs]e\s*plate|\bplate\b|car\s*number")),
+    ("owe", re.compile(r"(?i)\bowe\b|outstanding|unpaid|overdue|anything\s+due")),
+    ("claim_status", re.compile(r"(?i)\bstatus\b|progress|update\s+on")),
+    ("premium", re.compile(r"(?i)\bpremium\b")),
+    ("vehicle", re.compile(r"(?i)\b(car|vehicle)\b")),
+]
+
+
+def detect_intent(text: str) -> Optional[str]:
+    for intent, pattern in INTENT_PATTERNS:
+        if pattern.search(text or ""):
+            return intent
+    return None
+
+
+# --- PARSERS ---
+def _as_dict(content: str) -> Optional[dict]:
+    try:
+        data = json.loads(content)
+    except (TypeError, ValueError):
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _vehicle_field(content: str, label: str) -> Optional[str]:
+    match = re.search(rf"^- {label}: (.+)$", content, re.MULTILINE)
+    return match.group(1).strip() if match else None
+
+
+_BILL_LINE = re.compile(r"^• (\S+) \| (.+?) \(Bill: (\w+)\): \$([\d.]+) -> \[(\w+)\]")
+_BILL_TOTALS = re.compile(r"^Outstanding: \$([\d.]+) across (\d+) unpaid bill\(s\); overdue: \$([\d.]+) across (\d+)$")
+
+
+# --- TEMPLATES ---
+# Each renderer takes the tool output text and returns the reply, or None to defer to the LLM.
+def _render_vin(content: str) -> Optional[str]:
+    vin = _vehicle_field(content, "VIN")
+    header = content.splitlines()[0] if content.startswith("Vehicle Details for") else None
+    if not vin or not header:
+        return None
+    policy = header.replace("Vehicle Details for", "").strip(" :")
+    return f"The VIN of the vehicle insured under {policy} is **{vin}**."
+
+
+def _render_plate(content: str) -> Optional[str]:
+    plate = _vehicle_field(content, "Plate")
+    car = _vehicle_field(content, "Car")
+    if not plate or not car:
+        return None
+    return f"Your {car} is registered under licence plate **{plate}**."
+
+
+def _render_vehicle(content: str) -> Optional[str]:
+    # get_vehicle_details already returns a formatted summary
+    return content if content.startswith("Vehicle Details for") else None
+
+
+def _render_claim_status(content: str) -> Optional[str]:
+    data = _as_dict(content)
+    if not data or data.get("status") != "found":
+        return None
+    claim = data.get("data") or {}
+    return (
+        f"Claim **{claim.get('claim_id')}** on policy {claim.get('policy_number')} "
+        f"is currently **{claim.get('status')}**. "
+        f"It was filed on {claim.get('claim_date')} for ${claim.get('claim_amount')}."
+    )
+
+
+def _render_owe(content: str) -> Optional[str]:
+    if content == "No billing history found.":
+        return "You have no bills on record, so there is nothing outstanding."
+    lines = content.splitlines()
+    totals = _BILL_TOTALS.match(lines.pop()) if lines else None
+    bills = [_BILL_LINE.match(line) for line in lines]
+    if not totals or not bills or not all(bills):
+        return None
+    if int(totals.group(2)) == 0:
+        return "You don't owe anything. All of your bills are paid."
+    unpaid = [b for b in bills if b.group(5).upper() != "PAID"]
+    lines = [f"• {b.group(3)} ({b.group(2)}) due {b.group(1)}: ${b.group(4)} [{b.group(5)}]" for b in unpaid]
+    overdue = f" (${totals.group(3)} of it overdue)" if int(totals.group(4)) else ""
+    return (
+        f"You have {totals.group(2)} unpaid bill(s) totalling ${totals.group(1)}{overdue}:\n" + "\n".join(lines)
+        + "\n\nIf you would like to pay, I will connect you to a secure human agent for payment."
+    )
+
+
+def _render_premium(content: str) -> Optional[str]:
+    data = _as_dict(content)
+    if not data or "premium_amount" not in data:
+        return None
+    return (
+        f"The premium for your {data.get('policy_type')} policy {data.get('policy_number')} "
+        f"is ${data.get('premium_amount')}, billed {str(data.get('billing_frequency', '')).lower()}."
+    )
+
+
+TEMPLATES: Dict[Tuple[str, str], Callable[[str], Optional[str]]] = {
+    ("get_vehicle_details", "vin"): _render_vin,
+    ("get_vehicle_details", "plate"): _render_plate,
+    ("get_vehicle_details", "vehicle"): _render_vehicle,
+    ("check_claim_status", "claim_status"): _render_claim_status,
+    ("get_billing_history", "owe"): _render_owe,
+    ("get_policy_details", "premium"): _render_premium,
+}
+
+
+# --- GRAPH HOOKS ---
+def render(state) -> Optional[AIMessage]:
+    """
+    Renders the final reply from the latest tool result, or returns None.
+    Only applies when the agent made exactly one tool call this round and a
+    template exists for (tool name, intent of the user's latest message).
+    """
+    if not (ENABLED or state.get("prefer_templates")):
+        return None
+    messages = state["messages"]
+    if len(messages) < 3 or not isinstance(messages[-1], ToolMessage):
+        return None
+    tool_msg, ai_msg = messages[-1], messages[-2]
+    if not isinstance(ai_msg, AIMessage) or len(ai_msg.tool_calls) != 1:
+        return None
+    if getattr(tool_msg, "status", "success") == "error":
+        return None
+
+    human = next((m for m in reversed(messages) if isinstance(m, HumanMessage)), None)
+    intent = detect_intent(human.content if human else "")
+    template = TEMPLATES.get((tool_msg.name, intent))
+    if not template:
+        return None
+
+    text = template(tool_msg.content if isinstance(tool_msg.content, str) else str(tool_msg.content))
+    if not text:
+        return None
+    return AIMessage(content=text, response_metadata={"templated": True, "template": f"{tool_msg.name}:{intent}"})
+
+
+def templated_reply_node(state):
+    return {"messages": [render(state)]}
+
+
+def after_tools(state, agent_node: str) -> str:
+    """Routes a tool node to the templated reply when one applies, else back to its agent."""
+    return "templated_reply" if render(state) is not None else agent_node
@@ -0,0 +1,152 @@
+"""
+session_gate.py
+Domain: Per-Session Turn Serialization and Duplicate Coalescing
+
+Each session holds one SessionGate (api.py, session["gate"]):
+- turn(): one chat / clear-history turn at a time per session, so a turn always reads
+  the history the previous one wrote. This is where ADMISSION_SESSION_LIMIT applies to
+  these endpoints: a session holds at most that many running + waiting turns, and a
+  turn beyond it is rejected at once as session_busy (HTTP 429, like admission.py)
+  instead of taking a server thread to wait. A turn waiting longer than
+  SESSION_LOCK_TIMEOUT_S is rejected the same way.
+- run(): duplicate submissions share one execution. A request whose key matches one in
+  flight waits for that result instead of running the pipeline again. Keys come from a
+  client idempotency key (ChatRequest.idempotency_key or the Idempotency-Key header);
+  clients that send none are keyed on the message text. The web client sends a fresh key
+  per message but reuses it while the same text is still awaiting its reply (a
+  double-clicked quick action, ChatPage.tsx). Successful results of keyed requests are
+  kept for IDEMPOTENCY_TTL_S, so a client retry after completion gets the same answer;
+  an error reply is not, so a retry after a transient failure runs the turn again.
+  A key is bound to its message: reusing it for a different message raises
+  KeyReused (HTTP 422) instead of returning the other message's reply.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import admission
+import metrics
+
+logger = logging.getLogger(__name__)
+
+LOCK_TIMEOUT_S = float(os.getenv("SESSION_LOCK_TIMEOUT_S", "30"))
+IDEMPOTENCY_TTL_S = float(os.getenv("IDEMPOTENCY_TTL_S", "600"))
+MAX_REMEMBERED = 32
+
+
+class KeyReused(ValueError):
+    """An idempotency key was sent again with a different message."""
+
+
+def message_digest(message: str) -> str:
+    return hashlib.sha256(message.strip().encode("utf-8")).hexdigest()[:16]
+
+
+def request_key(message: str, idempotency_key: Optional[str]) -> str:
+    if idempotency_key:
+        return f"key:{idempotency_key}"
+    return "msg:" + message_digest(message)
+
+
+class _Flight:
+    __slots__ = ("digest", "done", "result", "error")
+
+    def __init__(self, digest: str):
+        self.digest = digest
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class SessionGate:
+    def __init__(self):
+        self._turn = threading.Lock()
+        self._lock = threading.Lock()
+        self._turns = 0  # running + waiting turns
+        self._in_flight: Dict[str, _Flight] = {}
+        self._completed: "OrderedDict[str, Tuple[float, str, Any]]" = OrderedDict()  # key -> (at, digest, result)
+
+    @contextmanager
+    def turn(self, endpoint: str):
+        """Serializes the block with every other turn of this session."""
+        with self._lock:
+            if admission.ENABLED and self._turns >= admission.SESSION_LIMIT:
+                self._reject(endpoint, "turn limit")
+            self._turns += 1
+        try:
+            start = time.perf_counter()
+            if not self._turn.acquire(timeout=LOCK_TIMEOUT_S):
+                self._reject(endpoint, "lock timeout")
+            metrics.SESSION_LOCK_WAIT_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint)
+            try:
+                yield
+            finally:
+                self._turn.release()
+        finally:
+            with self._lock:
+                self._turns -= 1
+
+    @staticmethod
+    def _reject(endpoint: str, cause: str):
+        metrics.ADMISSIONS.inc(endpoint=endpoint, outcome=f"rejected_{admission.SESSION_BUSY}")
+        logger.warning("request rejected", extra={"endpoint": endpoint, "reason": admission.SESSION_BUSY,
+                                                  "cause": cause, "retry_after": 1})
+        raise admission.Overloaded(admission.SESSION_BUSY, retry_after=1)
+
+    def _remembered(self, key: str):
+        entry = self._completed.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[0] > IDEMPOTENCY_TTL_S:
+            del self._completed[key]
+            return None
+        return entry
+
+    def run(self, endpoint: str, key: str, fn: Callable[[], Any],
+            remember: Optional[Callable[[Any], bool]] = None, digest: str = "") -> Tuple[Any, bool]:
+        """
+        Runs fn() unless an identical request is in flight, or completed recently with a
+        result that remember(result) accepted. Returns (result, coalesced). `digest`
+        identifies the request's content; a matching key with another digest raises KeyReused.
+        """
+        with self._lock:
+            done = self._remembered(key)
+            flight = self._in_flight.get(key)
+            seen = done[1] if done is not None else flight.digest if flight is not None else digest
+            if seen != digest:
+                logger.warning("idempotency key reused for a different request", extra={"endpoint": endpoint})
+                raise KeyReused(key)
+            if done is not None:
+                metrics.COALESCED.inc(endpoint=endpoint, source="completed")
+                return done[2], True
+            leader = flight is None
+            if leader:
+                flight = self._in_flight[key] = _Flight(digest)
+
+        if not leader:
+            metrics.COALESCED.inc(endpoint=endpoint, source="in_flight")
+            logger.info("duplicate request coalesced", extra={"endpoint": endpoint})
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            flight.result = fn()
+            return flight.result, False
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+                if remember is not None and flight.error is None and remember(flight.result):
+                    self._completed[key] = (time.monotonic(), flight.digest, flight.result)
+                    while len(self._completed) > MAX_REMEMBERED:
+                        self._completed.popitem(last=False)
+            flight.done.set()
@@ -0,0 +1,293 @@
+"""
+session_memory.py
+Domain: Compact Session History, Memory Accounting and Spill
+
+Between turns a session's conversation is not kept as LangChain message objects
+(whose tool results, response metadata and pydantic internals dominate the memory of
+a long-lived session) but as compact records:
+- one slotted _Record per message, with type, tool and tool-call names interned and
+  UUID message ids as 16 bytes
+- tool results (ToolMessage content: whole claim rows, policy lists, billing history)
+  and long replies zlib-compressed above COMPRESS_MIN_BYTES, decoded only when the
+  history is next used
+- response_metadata / additional_kwargs / usage_metadata are dropped; nothing reads
+  them from earlier turns
+A turn checks the history out (api.py: `with session_memory.checkout(...)`), which
+decodes it into session["messages"] for the guardrail and the graph, and stores the
+result back when the turn ends.
+
+Accounting: the approximate bytes of each session's records are tracked, and their
+total is kept under SESSION_MEMORY_MB. Above it, the least recently used idle histories
+are spilled to SQLite (SESSION_SPILL_DB_PATH) and read back on their next turn; with an
+empty SESSION_SPILL_DB_PATH they are evicted instead (the session stays logged in with
+an empty history). Histories checked out by a running turn are never spilled.
+"""
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+MEMORY_CEILING_BYTES = int(float(os.getenv("SESSION_MEMORY_MB", "256")) * 1024 * 1024)
+SPILL_DB_PATH = os.getenv("SESSION_SPILL_DB_PATH",
+                          os.path.join(os.path.dirname(os.path.abspath(__file__)), "db", "session_spill.db"))
+COMPRESS_MIN_BYTES = int(os.getenv("SESSION_COMPRESS_MIN_BYTES", "200"))
+
+_TYPES = {"human": HumanMessage, "ai": AIMessage, "tool": ToolMessage, "system": SystemMessage}
+_RECORD_BYTES = sys.getsizeof(object()) + 8 * 8  # object header + 8 slots
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS session_spill (
+    session_id TEXT PRIMARY KEY,
+    history BLOB NOT NULL,
+    spilled_at REAL NOT NULL
+);
+"""
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def _pack_text(text):
+    if isinstance(text, str) and len(text) >= COMPRESS_MIN_BYTES:
+        return zlib.compress(text.encode("utf-8"))
+    return text
+
+
+def _unpack_text(text):
+    return zlib.decompress(text).decode("utf-8") if isinstance(text, bytes) else text
+
+
+def _pack_id(message_id: Optional[str]):
+    """graph-assigned ids are str(uuid4()); anything else is kept as is."""
+    if message_id is not None and len(message_id) == 36:
+        try:
+            return uuid.UUID(message_id).bytes
+        except ValueError:
+            pass
+    return message_id
+
+
+def _unpack_id(message_id) -> Optional[str]:
+    return str(uuid.UUID(bytes=message_id)) if isinstance(message_id, bytes) else message_id
+
+
+# --- RECORDS ---
+class _Record:
+    """One stored message. `content` is str, or zlib-compressed UTF-8 bytes when long."""
+    __slots__ = ("type", "content", "id", "name", "tool_call_id", "tool_calls", "status", "nbytes")
+
+    def __init__(self, type: str, content, id: Optional[str] = None, name: Optional[str] = None,
+                 tool_call_id: Optional[str] = None, tool_calls: Optional[tuple] = None,
+                 status: Optional[str] = None):
+        self.type = _intern(type)
+        self.content = content
+        self.id = id
+        self.name = _intern(name)
+        self.tool_call_id = tool_call_id
+        self.tool_calls = tool_calls
+        self.status = _intern(status)
+        self.nbytes = self._size()
+
+    def _size(self) -> int:
+        size = _RECORD_BYTES + sys.getsizeof(self.content)
+        for value in (self.id, self.tool_call_id):
+            if value is not None:
+                size += sys.getsizeof(value)
+        for name, args, call_id in self.tool_calls or ():
+            size += sys.getsizeof(args) + sys.getsizeof(call_id)
+        return size
+
+    @classmethod
+    def encode(cls, message: BaseMessage) -> "_Record":
+        tool_calls = None
+        if isinstance(message, AIMessage) and message.tool_calls:
+            tool_calls = tuple((_intern(tc["name"]), json.dumps(tc["args"], separators=(",", ":")), tc.get("id"))
+                               for tc in message.tool_calls)
+        return cls(message.type, _pack_text(message.content), id=_pack_id(message.id), name=message.name,
+                   tool_call_id=getattr(message, "tool_call_id", None), tool_calls=tool_calls,
+                   status=getattr(message, "status", None) if message.type == "tool" else None)
+
+    def decode(self) -> BaseMessage:
+        kwargs = {"content": _unpack_text(self.content), "id": _unpack_id(self.id)}
+        if self.name is not None:
+            kwargs["name"] = self.name
+        if self.type == "tool":
+            kwargs.update(tool_call_id=self.tool_call_id, status=self.status or "success")
+        elif self.tool_calls:
+            kwargs["tool_calls"] = [{"name": name, "args": json.loads(args), "id": call_id}
+                                    for name, args, call_id in self.tool_calls]
+        return _TYPES[self.type](**kwargs)
+
+    def to_row(self) -> list:
+        return [self.type, _unpack_text(self.content), _unpack_id(self.id), self.name, self.tool_call_id,
+                [list(tc) for tc in self.tool_calls] if self.tool_calls else None, self.status]
+
+    @classmethod
+    def from_row(cls, row: list) -> "_Record":
+        type, content, id, name, tool_call_id, tool_calls, status = row
+        return cls(type, _pack_text(content), id=_pack_id(id), name=name, tool_call_id=tool_call_id,
+                   tool_calls=tuple((_intern(n), a, i) for n, a, i in tool_calls) if tool_calls else None,
+                   status=status)
+
+
+def encode(messages: List[BaseMessage]) -> List[_Record]:
+    return [_Record.encode(m) for m in messages]
+
+
+def decode(records: List[_Record]) -> List[BaseMessage]:
+    return [r.decode() for r in records]
+
+
+# --- STORE ---
+class _Entry:
+    __slots__ = ("records", "nbytes", "spilled", "checked_out")
+
+    def __init__(self):
+        self.records: List[_Record] = []
+        self.nbytes = 0
+        self.spilled = False
+        self.checked_out = 0
+
+
+class SessionHistories:
+    """Compact histories by session id under a global byte ceiling, spilling least recently used first."""
+
+    def __init__(self, ceiling_bytes: int = MEMORY_CEILING_BYTES, spill_path: str = SPILL_DB_PATH):
+        self.ceiling_bytes = ceiling_bytes
+        self.spill_path = spill_path
+        self.total_bytes = 0
+        self.spilled = 0
+        self._entries: Dict[str, _Entry] = {}
+        self._resident: "OrderedDict[str, _Entry]" = OrderedDict()  # in memory, least recently used first
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    # Spill table: scratch space for this process only, so it starts empty and skips fsync
+    def _spill_conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.spill_path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.spill_path, check_same_thread=False)
+            self._conn.executescript("PRAGMA journal_mode=WAL; PRAGMA synchronous=OFF;"
+                                     + SCHEMA + "DELETE FROM session_spill;")
+        return self._conn
+
+    def _set_records(self, session_id: str, entry: _Entry, records: List[_Record]):
+        nbytes = sum(r.nbytes for r in records)
+        self.total_bytes += nbytes - entry.nbytes
+        entry.records, entry.nbytes = records, nbytes
+        self._resident[session_id] = entry
+        self._resident.move_to_end(session_id)
+
+    def _unspill(self, session_id: str, entry: _Entry) -> List[_Record]:
+        conn = self._spill_conn()
+        row = conn.execute("SELECT history FROM session_spill WHERE session_id = ?", (session_id,)).fetchone()
+        conn.execute("DELETE FROM session_spill WHERE session_id = ?", (session_id,))
+        conn.commit()
+        entry.spilled = False
+        self.spilled -= 1
+        metrics.SESSION_SPILLS.inc(direction="load")
+        return [_Record.from_row(r) for r in json.loads(zlib.decompress(row[0]))] if row else []
+
+    def _enforce_ceiling(self):
+        """Spills (or evicts) least recently used idle histories until under the ceiling."""
+        if self.total_bytes <= self.ceiling_bytes:
+            return
+        for session_id, entry in list(self._resident.items()):
+            if self.total_bytes <= self.ceiling_bytes:
+                return
+            if entry.checked_out:
+                continue
+            if self.spill_path:
+                blob = zlib.compress(json.dumps([r.to_row() for r in entry.records],
+                                                separators=(",", ":")).encode("utf-8"))
+                conn = self._spill_conn()
+                conn.execute("INSERT OR REPLACE INTO session_spill (session_id, history, spilled_at) VALUES (?, ?, ?)",
+                             (session_id, blob, time.time()))
+                conn.commit()
+                entry.spilled = True
+                self.spilled += 1
+                metrics.SESSION_SPILLS.inc(direction="spill")
+            else:
+                metrics.SESSION_SPILLS.inc(direction="evict")
+                logger.warning("session history evicted", extra={"session_id": session_id, "bytes": entry.nbytes})
+            self.total_bytes -= entry.nbytes
+            entry.records, entry.nbytes = [], 0
+            del self._resident[session_id]
+
+    def store(self, session_id: str, messages: List[BaseMessage]):
+        """Replaces a session's history."""
+        records = encode(messages)
+        with self._lock:
+            entry = self._entries.setdefault(session_id, _Entry())
+            if entry.spilled:
+                self._unspill(session_id, entry)
+            self._set_records(session_id, entry, records)
+            self._enforce_ceiling()
+
+    def load(self, session_id: str) -> List[BaseMessage]:
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return []
+            records = self._unspill(session_id, entry) if entry.spilled else entry.records
+            self._set_records(session_id, entry, records)
+        return decode(records)
+
+    @contextmanager
+    def checkout(self, session_id: str, session: dict):
+        """Decodes the history into session["messages"] for the block, then stores it back."""
+        with self._lock:
+            entry = self._entries.setdefault(session_id, _Entry())
+            entry.checked_out += 1
+        try:
+            session["messages"] = self.load(session_id)
+            yield session["messages"]
+        finally:
+            messages = session.pop("messages", [])
+            with self._lock:
+                entry.checked_out -= 1
+            self.store(session_id, messages)
+
+    def session_bytes(self, session_id: str) -> int:
+        entry = self._entries.get(session_id)
+        return entry.nbytes if entry else 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"sessions": len(self._entries), "in_memory": len(self._resident), "spilled": self.spilled,
+                    "bytes": self.total_bytes, "ceiling_bytes": self.ceiling_bytes, "spill": bool(self.spill_path)}
+
+
+histories = SessionHistories()
+metrics.gauge("insure_session_history_bytes", "Approximate bytes of compact session histories in memory.",
+              fn=lambda: histories.total_bytes)
+
+
+def store(session_id: str, messages: List[BaseMessage]):
+    histories.store(session_id, messages)
+
+
+def checkout(session_id: str, session: dict):
+    return histories.checkout(session_id, session)
+
+
+def get_session_memory_stats(session_id: Optional[str] = None) -> dict:
+    stats = histories.stats()
+    if session_id is not None:
+        stats["session_bytes"] = histories.session_bytes(session_id)
+    return stats
@@ -0,0 +1,38 @@
+"""
+Shared fixtures. Run from the backend directory:
+    python -m pytest -q
+"""
+import os
+import queue
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "db"))
+os.environ.setdefault("OPENAI_API_KEY", "sk-offline-test")
+
+from setup import setup_insurance_database
+
+# Modules that open their own connection to the insurance DB via a module-level DB_PATH
+DB_MODULES = ["claim_writer", "claim_intake", "billing_tools", "customer_rollup"]
+
+
+@pytest.fixture
+def insurance_db(tmp_path, monkeypatch) -> str:
+    """A freshly generated database, with the tool modules pointed at it."""
+    path = str(tmp_path / "insurance_support.db")
+    setup_insurance_database(path)
+    for name in DB_MODULES:
+        monkeypatch.setattr(__import__(name), "DB_PATH", path)
+    return path
+
+
+@pytest.fixture
+def writer(insurance_db, monkeypatch):
+    """A claim writer thread of this test's own, on insurance_db (the previous one idles on its old queue)."""
+    import claim_writer
+    monkeypatch.setattr(claim_writer, "_queue", queue.Queue())
+    monkeypatch.setattr(claim_writer, "_writer", None)
+    return claim_writer
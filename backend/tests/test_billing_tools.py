@@ -0,0 +1,55 @@
+import sqlite3
+
+import pytest
+
+import billing_tools
+import customer_rollup
+
+
+@pytest.fixture
+def pending_bill(insurance_db) -> dict:
+    """A bill marked 'pending' with no payment, and its customer."""
+    conn = sqlite3.connect(insurance_db)
+    try:
+        customer_id, bill_id, amount = conn.execute("""
+            SELECT p.customer_id, b.bill_id, b.amount FROM billing b
+            JOIN policies p ON p.policy_number = b.policy_number
+            WHERE b.status = 'pending' AND NOT EXISTS (SELECT 1 FROM payments pay WHERE pay.bill_id = b.bill_id)
+            ORDER BY b.bill_id LIMIT 1
+        """).fetchone()
+        return {"customer_id": customer_id, "bill_id": bill_id, "amount": amount}
+    finally:
+        conn.close()
+
+
+def _pay(db_path: str, bill: dict, status: str):
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute("INSERT INTO payments VALUES (?, ?, '2025-06-02', ?, ?, 'Card')",
+                     (f"PAYT{status}", bill["bill_id"], bill["amount"], status))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _bill_line(customer_id: str, bill_id: str) -> str:
+    history = billing_tools.get_billing_history.invoke({"customer_id": customer_id})
+    return next(line for line in history.splitlines() if f"(Bill: {bill_id})" in line)
+
+
+# payments.status is 'completed' in the generated data; this used to match only 'Success'
+@pytest.mark.parametrize("status", ["completed", "Success"])
+def test_settling_payment_shows_bill_as_paid(insurance_db, pending_bill, status):
+    before = customer_rollup.get(pending_bill["customer_id"])["outstanding_bills"]
+
+    _pay(insurance_db, pending_bill, status)
+
+    line = _bill_line(pending_bill["customer_id"], pending_bill["bill_id"])
+    assert line.endswith("-> [PAID] (via Card on 2025-06-02)")
+    assert customer_rollup.get(pending_bill["customer_id"])["outstanding_bills"] == before - 1
+
+
+def test_failed_payment_keeps_bill_status(insurance_db, pending_bill):
+    _pay(insurance_db, pending_bill, "failed")
+
+    assert _bill_line(pending_bill["customer_id"], pending_bill["bill_id"]).endswith("-> [pending]")
@@ -0,0 +1,62 @@
+import io
+import json
+import sqlite3
+
+import pytest
+
+import claim_intake
+
+
+def _upload(rows: list) -> list:
+    stream = io.BytesIO("".join(json.dumps(row) + "\n" for row in rows).encode("utf-8"))
+    return list(claim_intake.ingest(claim_intake.read_rows(stream, claim_intake.JSONL)))
+
+
+@pytest.fixture
+def policies(insurance_db) -> list:
+    """Two (customer_id, policy_number) pairs of different customers."""
+    conn = sqlite3.connect(insurance_db)
+    try:
+        return conn.execute("""
+            SELECT customer_id, MIN(policy_number) FROM policies GROUP BY customer_id ORDER BY customer_id LIMIT 2
+        """).fetchall()
+    finally:
+        conn.close()
+
+
+def _row(customer_id: str, policy_number: str, **fields) -> dict:
+    return {"customer_id": customer_id, "policy_number": policy_number, "claim_date": "2025-06-01",
+            "claim_amount": 250, "description": "Hail damage", **fields}
+
+
+def test_reference_is_scoped_to_customer_and_policy(writer, policies):
+    (customer_a, policy_a), (customer_b, policy_b) = policies
+
+    first = _upload([_row(customer_a, policy_a, reference="GAR-1"), _row(customer_b, policy_b, reference="GAR-1")])
+    again = _upload([_row(customer_a, policy_a, reference="GAR-1")])
+
+    assert [r["status"] for r in first[:2]] == [claim_intake.CREATED, claim_intake.CREATED]
+    assert first[0]["claim_id"] != first[1]["claim_id"]
+    assert again[0] == {"row": 1, "status": claim_intake.DUPLICATE, "claim_id": first[0]["claim_id"]}
+
+
+def test_failed_write_fails_its_chunk_and_still_summarizes(writer, policies, monkeypatch):
+    (customer_a, policy_a), _ = policies
+    monkeypatch.setattr(claim_intake, "CHUNK_ROWS", 1)
+    real_file_claims = writer.file_claims
+    calls = []
+
+    def file_claims(filings):
+        calls.append(filings)
+        if len(calls) == 1:
+            raise TimeoutError()
+        return real_file_claims(filings)
+
+    monkeypatch.setattr(writer, "file_claims", file_claims)
+
+    results = _upload([_row(customer_a, policy_a, reference="GAR-1"), _row(customer_a, policy_a, reference="GAR-2")])
+
+    assert results[0]["status"] == claim_intake.FAILED
+    assert results[1]["status"] == claim_intake.CREATED
+    assert results[-1] == {"summary": {"rows": 2, claim_intake.CREATED: 1, claim_intake.DUPLICATE: 0,
+                                       claim_intake.REJECTED: 0, claim_intake.FAILED: 1}}
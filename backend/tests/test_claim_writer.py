@@ -0,0 +1,116 @@
+import sqlite3
+from concurrent.futures import Future
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import claim_writer
+
+
+@pytest.fixture
+def conn(insurance_db):
+    conn = claim_writer._connect()
+    yield conn
+    conn.close()
+
+
+def _policy(conn) -> str:
+    return conn.execute("SELECT policy_number FROM policies ORDER BY policy_number LIMIT 1").fetchone()[0]
+
+
+def _filing(policy_number: str, n: int, **overrides) -> dict:
+    filing = {"policy_number": policy_number, "claim_date": "2025-06-01", "claim_amount": 100.0 + n,
+              "description": f"Test incident {n}", "idempotency_key": claim_writer.idempotency_key("test", n)}
+    filing.update(overrides)
+    return filing
+
+
+def _write(conn, seq: int, *items) -> tuple:
+    """Runs one writer batch of queued requests; returns (results per request, last sequence)."""
+    batch = [(filings, Future(), 0.0) for filings in items]
+    seq = claim_writer._write_batch(conn, seq, batch)
+    return [future.result() for _, future, _ in batch], seq
+
+
+def _claim_count(conn) -> int:
+    return conn.execute("SELECT COUNT(*) FROM claims").fetchone()[0]
+
+
+def test_claim_ids_continue_the_seeded_sequence(conn):
+    seq = claim_writer._last_sequence(conn)
+    policy = _policy(conn)
+
+    (first, second), last = _write(conn, seq, [_filing(policy, 1), _filing(policy, 2)], [_filing(policy, 3)])
+
+    assert [r["claim_id"] for r in first + second] == [f"CLM{seq + i:06d}" for i in (1, 2, 3)]
+    assert last == seq + 3 == claim_writer._last_sequence(conn)
+
+
+def test_in_batch_duplicates_share_one_claim(conn):
+    seq = claim_writer._last_sequence(conn)
+    before = _claim_count(conn)
+    filing = _filing(_policy(conn), 1)
+
+    (first, second), last = _write(conn, seq, [filing], [dict(filing)])
+
+    assert first[0] == claim_writer._created(f"CLM{seq + 1:06d}")
+    assert second[0] == claim_writer._duplicate(f"CLM{seq + 1:06d}")
+    assert last == seq + 1
+    assert _claim_count(conn) == before + 1
+
+
+def test_failing_row_falls_back_to_row_by_row(conn):
+    seq = claim_writer._last_sequence(conn)
+    before = _claim_count(conn)
+    policy = _policy(conn)
+
+    (results,), last = _write(conn, seq, [_filing(policy, 1), _filing(policy, 2, claim_date=None), _filing(policy, 3)])
+
+    assert results[0] == claim_writer._created(f"CLM{seq + 1:06d}")
+    assert results[1]["status"] == "error"
+    assert results[2] == claim_writer._created(f"CLM{seq + 2:06d}")
+    assert last == seq + 2
+    assert _claim_count(conn) == before + 2
+    # The failed row left no idempotency key behind, so a corrected retry is filed
+    (retry,), _ = _write(conn, last, [_filing(policy, 2)])
+    assert retry[0] == claim_writer._created(f"CLM{seq + 3:06d}")
+
+
+def test_repeated_filing_returns_the_existing_claim(conn):
+    seq = claim_writer._last_sequence(conn)
+    filing = _filing(_policy(conn), 1)
+
+    (first,), seq = _write(conn, seq, [filing])
+    (again,), seq = _write(conn, seq, [filing])
+
+    assert again[0] == claim_writer._duplicate(first[0]["claim_id"])
+
+
+def _age_keys(conn, seconds: float):
+    old = (datetime.now(timezone.utc) - timedelta(seconds=seconds)).isoformat()
+    conn.execute("UPDATE claim_requests SET created_at = ?", (old,))
+
+
+@pytest.mark.parametrize("insert", [claim_writer._insert_all, claim_writer._insert_each])
+def test_key_expires_after_the_dedupe_window(conn, insert):
+    seq = claim_writer._last_sequence(conn)
+    filing = _filing(_policy(conn), 1)
+    (first,), seq = claim_writer._transaction(conn, seq, [filing], insert)
+    _age_keys(conn, claim_writer.DEDUPE_WINDOW_S + 60)
+
+    (second,), seq = claim_writer._transaction(conn, seq, [filing], insert)
+    (third,), seq = claim_writer._transaction(conn, seq, [filing], insert)
+
+    assert second == claim_writer._created(f"CLM{seq:06d}") != first
+    assert third == claim_writer._duplicate(second["claim_id"])
+
+
+def test_key_without_window_never_expires(conn):
+    seq = claim_writer._last_sequence(conn)
+    filing = _filing(_policy(conn), 1, dedupe_window_s=None)
+    (first,), seq = claim_writer._transaction(conn, seq, [filing], claim_writer._insert_all)
+    _age_keys(conn, claim_writer.DEDUPE_WINDOW_S * 100)
+
+    (again,), _ = claim_writer._transaction(conn, seq, [filing], claim_writer._insert_all)
+
+    assert again == claim_writer._duplicate(first["claim_id"])
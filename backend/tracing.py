@@ -0,0 +1,299 @@
+"""
+tracing.py
+Domain: Per-Request Execution Traces
+
+A trace collects spans for one /api/chat request under a request id:
+- guardrail: the whole validation (regex + LLM check)
+- node: each graph node run (supervisor, agents, tool nodes, prefetch)
+- tool: each tool call, including prefetched results served from state (cache_hit)
+- llm: each chat-model call, with input/output token counts
+- cache: response-cache hits that skip the graph
+
+Spans are recorded by TraceCallbackHandler (graph nodes, tools, LLM calls) and by
+tracing.span() / tracing.event() for work outside LangChain callbacks. The active trace
+lives in a contextvar, which LangGraph copies into the threads that run nodes.
+
+Finished traces are returned in ChatResponse.trace and appended, one JSON object per
+line, to a size-rotated store in TRACE_DIR for offline slow-request analysis:
+    python tracing.py --slowest 10
+
+Set TRACING=0 to disable, TRACE_STORE=0 to keep traces out of the store.
+"""
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+from typing import Any, Dict, Iterator, List, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+ENABLED = os.getenv("TRACING", "1").lower() in ("1", "true", "yes")
+STORE_ENABLED = os.getenv("TRACE_STORE", "1").lower() in ("1", "true", "yes")
+TRACE_DIR = os.getenv("TRACE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "traces"))
+TRACE_FILE = "traces.jsonl"
+MAX_BYTES = int(os.getenv("TRACE_MAX_BYTES", str(5 * 1024 * 1024)))
+BACKUP_COUNT = int(os.getenv("TRACE_BACKUPS", "5"))
+
+_current: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("trace", default=None)
+# Span opened by tracing.span(); callback spans started inside it become its children
+_current_span: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("trace_span", default=None)
+
+
+class Trace:
+    """Spans of one request. Times are milliseconds from the start of the request."""
+    def __init__(self, request_id: str, endpoint: str):
+        self.request_id = request_id
+        self.endpoint = endpoint
+        self.started_at = datetime.now(timezone.utc)
+        self._t0 = time.perf_counter()
+        self._lock = threading.Lock()
+        self.spans: List[Dict[str, Any]] = []
+        self.attributes: Dict[str, Any] = {}
+        self.duration_ms: Optional[float] = None
+        self.handler = TraceCallbackHandler(self)
+
+    def now_ms(self) -> float:
+        return (time.perf_counter() - self._t0) * 1000
+
+    def add(self, name: str, kind: str, start_ms: float, duration_ms: float,
+            span_id: Optional[str] = None, parent: Optional[str] = None, **attrs) -> dict:
+        span = {"id": span_id or uuid.uuid4().hex[:8], "parent": parent, "name": name, "kind": kind,
+                "start_ms": round(start_ms, 3), "duration_ms": round(duration_ms, 3)}
+        span.update({k: v for k, v in attrs.items() if v is not None})
+        with self._lock:
+            self.spans.append(span)
+        return span
+
+    def finish(self) -> dict:
+        self.duration_ms = self.now_ms()
+        return self.to_dict()
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s["start_ms"])
+        return {
+            "request_id": self.request_id,
+            "endpoint": self.endpoint,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(self.duration_ms if self.duration_ms is not None else self.now_ms(), 3),
+            **self.attributes,
+            "spans": spans,
+        }
+
+
+# --- ACTIVE TRACE ---
+@contextmanager
+def start(endpoint: str, request_id: Optional[str] = None) -> Iterator[Optional[Trace]]:
+    """Makes a new trace current for the block; yields None when tracing is off."""
+    if not ENABLED:
+        yield None
+        return
+    trace = Trace(request_id or uuid.uuid4().hex, endpoint)
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+
+def current() -> Optional[Trace]:
+    return _current.get()
+
+
+def callbacks() -> list:
+    """Callback handlers for a LangChain/LangGraph invoke under the current trace."""
+    trace = _current.get()
+    return [trace.handler] if trace else []
+
+
+@contextmanager
+def span(name: str, kind: str, **attrs):
+    """Records the block as a span of the current trace (no-op without one)."""
+    trace = _current.get()
+    if trace is None:
+        yield None
+        return
+    span_id = uuid.uuid4().hex[:8]
+    parent = _current_span.get()
+    token = _current_span.set(span_id)
+    start_ms = trace.now_ms()
+    error = None
+    try:
+        yield attrs
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        trace.add(name, kind, start_ms, trace.now_ms() - start_ms, span_id=span_id, parent=parent,
+                  error=error, **attrs)
+
+
+def event(name: str, kind: str, **attrs):
+    """Records a zero-duration span, e.g. a result served from a cache."""
+    trace = _current.get()
+    if trace is not None:
+        trace.add(name, kind, trace.now_ms(), 0.0, parent=_current_span.get(), **attrs)
+
+
+# --- CALLBACK HANDLER ---
+class TraceCallbackHandler(BaseCallbackHandler):
+    """Turns LangChain callback events into spans: graph nodes, tools and LLM calls."""
+    def __init__(self, trace: Trace):
+        self.trace = trace
+        self._open: Dict[Any, tuple] = {}  # run_id -> (name, kind, start_ms, parent run_id)
+        self._span_ids: Dict[Any, str] = {}  # run_id of open node/tool/llm runs -> span id
+        self._llm_nodes: Dict[Any, str] = {}  # run_id of an llm_gateway runnable -> gateway node
+        self._models: Dict[Any, Optional[str]] = {}  # run_id of an open LLM call -> model name
+
+    def _parent_span(self, parent_run_id) -> Optional[str]:
+        # Chain runs between a node and its LLM/tool call are not spans; map them to the node
+        return self._span_ids.get(parent_run_id) or _current_span.get()
+
+    def _begin(self, run_id, parent_run_id, name: str, kind: str):
+        self._span_ids[run_id] = uuid.uuid4().hex[:8]
+        self._open[run_id] = (name, kind, self.trace.now_ms(), self._parent_span(parent_run_id))
+
+    def _end(self, run_id, **attrs):
+        entry = self._open.pop(run_id, None)
+        span_id = self._span_ids.pop(run_id, None)
+        if entry is None:
+            return
+        name, kind, start_ms, parent = entry
+        self.trace.add(name, kind, start_ms, self.trace.now_ms() - start_ms, span_id=span_id, parent=parent, **attrs)
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node")
+        if node and node == kwargs.get("name"):
+            self._begin(run_id, parent_run_id, node, "node")
+        else:
+            if parent_run_id in self._span_ids:
+                # Inner runnable of a node: children attach to the same span
+                self._span_ids[run_id] = self._span_ids[parent_run_id]
+            if (kwargs.get("name") or "").startswith("llm:"):
+                self._llm_nodes[run_id] = kwargs["name"]
+            elif parent_run_id in self._llm_nodes:
+                # e.g. the structured-output sequence inside a gateway runnable
+                self._llm_nodes[run_id] = self._llm_nodes[parent_run_id]
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._llm_nodes.pop(run_id, None)
+        if run_id in self._open:
+            self._end(run_id)
+        else:
+            self._span_ids.pop(run_id, None)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._llm_nodes.pop(run_id, None)
+        if run_id in self._open:
+            self._end(run_id, error=f"{type(error).__name__}: {error}")
+        else:
+            self._span_ids.pop(run_id, None)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs):
+        name = kwargs.get("name") or (serialized or {}).get("name", "tool")
+        self._begin(run_id, parent_run_id, name, "tool")
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id, cache_hit=False)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=f"{type(error).__name__}: {error}")
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        # Named after the gateway node ("llm:supervisor") when called through llm_gateway
+        name = self._llm_nodes.get(parent_run_id) or kwargs.get("name") or "llm"
+        self._begin(run_id, parent_run_id, name, "llm")
+        self._models[run_id] = (metadata or {}).get("ls_model_name")
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._end(run_id, model=self._models.pop(run_id, None), tokens=_token_usage(response))
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._models.pop(run_id, None)
+        self._end(run_id, error=f"{type(error).__name__}: {error}")
+
+
+def _token_usage(response) -> Optional[dict]:
+    for generations in getattr(response, "generations", None) or []:
+        for gen in generations:
+            usage = getattr(getattr(gen, "message", None), "usage_metadata", None)
+            if usage:
+                return {"input": usage.get("input_tokens", 0), "output": usage.get("output_tokens", 0)}
+    usage = (getattr(response, "llm_output", None) or {}).get("token_usage")
+    if usage:
+        return {"input": usage.get("prompt_tokens", 0), "output": usage.get("completion_tokens", 0)}
+    return None
+
+
+# --- STORE ---
+_store_logger: Optional[logging.Logger] = None
+_store_lock = threading.Lock()
+
+
+def _store() -> logging.Logger:
+    global _store_logger
+    with _store_lock:
+        if _store_logger is None:
+            os.makedirs(TRACE_DIR, exist_ok=True)
+            handler = RotatingFileHandler(os.path.join(TRACE_DIR, TRACE_FILE), maxBytes=MAX_BYTES,
+                                          backupCount=BACKUP_COUNT, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            store_logger = logging.getLogger("insure.traces")
+            store_logger.addHandler(handler)
+            store_logger.setLevel(logging.INFO)
+            store_logger.propagate = False
+            _store_logger = store_logger
+        return _store_logger
+
+
+def save(trace: dict):
+    """Appends a finished trace to the rotating store."""
+    if not STORE_ENABLED:
+        return
+    try:
+        _store().info(json.dumps(trace, default=str, ensure_ascii=False))
+    except OSError as e:
+        logging.getLogger(__name__).warning("Could not write trace: %s", e)
+
+
+def load_traces(trace_dir: str = TRACE_DIR) -> Iterator[dict]:
+    """All stored traces, oldest rotated file first."""
+    paths = [os.path.join(trace_dir, f"{TRACE_FILE}.{i}") for i in range(BACKUP_COUNT, 0, -1)]
+    paths.append(os.path.join(trace_dir, TRACE_FILE))
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def slowest(n: int = 10, trace_dir: str = TRACE_DIR) -> List[dict]:
+    return sorted(load_traces(trace_dir), key=lambda t: t["duration_ms"], reverse=True)[:n]
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Slowest stored request traces and their longest spans.")
+    parser.add_argument("--slowest", type=int, default=10)
+    parser.add_argument("--spans", type=int, default=5, help="Longest spans shown per trace")
+    parser.add_argument("--dir", default=TRACE_DIR)
+    args = parser.parse_args()
+
+    for t in slowest(args.slowest, args.dir):
+        print(f"\n{t['started_at']}  {t['request_id']}  {t['endpoint']}  {t['duration_ms']:.1f} ms"
+              f"  agent={t.get('agent_name')}")
+        for s in sorted(t["spans"], key=lambda s: s["duration_ms"], reverse=True)[:args.spans]:
+            tokens = s.get("tokens")
+            extra = f"  tokens={tokens['input']}/{tokens['output']}" if tokens else ""
+            extra += "  cache_hit" if s.get("cache_hit") else ""
+            extra += f"  error={s['error']}" if s.get("error") else ""
+            print(f"    {s['kind']:<9} {s['name']:<28} {s['duration_ms']:>9.1f} ms{extra}")
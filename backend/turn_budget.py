@@ -0,0 +1,149 @@
+"""
+turn_budget.py
+Domain: Turn Deadlines, Loop Budgets and Graceful Degradation
+
+Bounds the work a single chat turn can do in the graph:
+- Deadline: api.py sets one per turn (TURN_DEADLINE_S). It travels in the graph state
+  ("deadline", for routing decisions) and in the run config (configurable.deadline,
+  for llm_gateway, which caps each LLM call's timeout by the time left).
+- Tool rounds: an agent may call tools at most AGENT_MAX_TOOL_ROUNDS times per turn.
+- Recursion limit: GRAPH_RECURSION_LIMIT supersteps, as a backstop.
+Per-node LLM timeouts are configured in llm_gateway.py (LLM_TIMEOUT_S_<NODE>).
+
+When a limit is hit the turn still ends with a reply: a templated answer from the
+tool results so far when one applies (response_templates.py), else the partial
+results, else an apology. Every limit that fires is counted in
+insure_turn_limits_total{limit, node}.
+"""
+import functools
+import logging
+import os
+import time
+from typing import Callable, Optional
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from response_templates import render
+import metrics
+
+logger = logging.getLogger(__name__)
+
+TURN_DEADLINE_S = float(os.getenv("TURN_DEADLINE_S", "30"))
+MAX_TOOL_ROUNDS = int(os.getenv("AGENT_MAX_TOOL_ROUNDS", "4"))
+RECURSION_LIMIT = int(os.getenv("GRAPH_RECURSION_LIMIT", "25"))
+PARTIAL_CHARS = 800
+
+FALLBACK_MESSAGE = "Sorry, I couldn't finish looking into that in time. Please try again in a moment."
+PARTIAL_PREFIX = "Sorry, I couldn't finish looking into that in time. Here is what I found so far:\n\n"
+
+# Limits, as counted in metrics
+DEADLINE = "deadline"
+LLM_TIMEOUT = "llm_timeout"
+TOOL_ROUNDS = "tool_rounds"
+RECURSION = "recursion"
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised instead of starting an LLM call after the turn's deadline."""
+
+
+# --- DEADLINE ---
+def new_deadline() -> float:
+    return time.monotonic() + TURN_DEADLINE_S
+
+
+def config(deadline: float) -> dict:
+    """Run config for graph.invoke carrying the deadline and the recursion limit."""
+    return {"configurable": {"deadline": deadline}, "recursion_limit": RECURSION_LIMIT}
+
+
+def remaining(deadline: Optional[float]) -> Optional[float]:
+    """Seconds left before `deadline`, or None when there is no deadline."""
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def is_timeout(error: Exception) -> bool:
+    # TimeoutError, httpx.TimeoutException, openai.APITimeoutError
+    return isinstance(error, TimeoutError) or "Timeout" in type(error).__name__
+
+
+def record(limit: str, node: str):
+    metrics.TURN_LIMITS.inc(limit=limit, node=node)
+    logger.warning("turn limit reached", extra={"limit": limit, "node": node})
+
+
+# --- TOOL ROUNDS ---
+def tool_rounds(messages: list) -> int:
+    """Tool-calling agent messages since the latest question."""
+    rounds = 0
+    for m in reversed(messages):
+        if isinstance(m, HumanMessage):
+            break
+        if isinstance(m, AIMessage) and m.tool_calls:
+            rounds += 1
+    return rounds
+
+
+def exhausted(state) -> Optional[str]:
+    """The limit that stops the agent's pending tool calls from running, if any."""
+    left = remaining(state.get("deadline"))
+    if left is not None and left <= 0:
+        return DEADLINE
+    if tool_rounds(state["messages"]) > MAX_TOOL_ROUNDS:
+        return TOOL_ROUNDS
+    return None
+
+
+# --- FALLBACK REPLIES ---
+def fallback_reply(state) -> AIMessage:
+    """Best reply from what the turn has so far (ignoring an unanswered tool call at the end)."""
+    messages = state["messages"]
+    if messages and isinstance(messages[-1], AIMessage) and messages[-1].tool_calls:
+        messages = messages[:-1]
+    templated = render({**state, "messages": messages, "prefer_templates": True})
+    if templated is not None:
+        return templated
+
+    for m in reversed(messages):
+        if isinstance(m, HumanMessage):
+            break
+        if isinstance(m, ToolMessage) and getattr(m, "status", "success") != "error":
+            content = m.content if isinstance(m.content, str) else str(m.content)
+            return AIMessage(content=PARTIAL_PREFIX + content[:PARTIAL_CHARS],
+                             response_metadata={"fallback": True})
+    return AIMessage(content=FALLBACK_MESSAGE, response_metadata={"fallback": True})
+
+
+def guarded(node: str, **on_fallback) -> Callable:
+    """
+    Node decorator: past the deadline, or when the node's LLM call times out, the node
+    returns a fallback reply (plus `on_fallback` state updates) instead of raising.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(state, *args, **kwargs):
+            left = remaining(state.get("deadline"))
+            if left is not None and left <= 0:
+                record(DEADLINE, node)
+                return {"messages": [fallback_reply(state)], **on_fallback}
+            try:
+                return fn(state, *args, **kwargs)
+            except Exception as e:
+                if not is_timeout(e):
+                    raise
+                # Counted by llm_gateway as llm_timeout / deadline
+                return {"messages": [fallback_reply(state)], **on_fallback}
+        return wrapper
+    return decorator
+
+
+def budget_fallback_node(state) -> dict:
+    """
+    Ends an agent loop whose pending tool calls may not run. The unanswered tool-call
+    message is replaced (same id) so the history stays valid for the next turn.
+    """
+    last = state["messages"][-1]
+    limit = exhausted(state) or TOOL_ROUNDS
+    record(limit, state.get("next") or "agent")
+    reply = fallback_reply(state)
+    return {"messages": [AIMessage(content=reply.content, id=last.id, response_metadata=reply.response_metadata)]}
@@ -0,0 +1,313 @@
+"""
+usage_ledger.py
+Domain: LLM Token & Cost Ledger
+
+Every LLM response that passes through llm_gateway is recorded here with its prompt
+and completion tokens, estimated cost, and who it was for: session, customer,
+endpoint (chat, login, report, ...) and gateway node (supervisor, guardrail, ...).
+Rows go to a local SQLite table (USAGE_DB_PATH) through a single background writer,
+so the request path never waits on a commit. The writer survives database errors
+(including failing to open it; it reconnects on the next batch), so flush() returns.
+
+Running totals for budget checks are cached in memory: per session for the most
+recently used USAGE_SESSION_CACHE_SIZE sessions, and per customer for the current UTC
+day only. A total not in the cache is read back from the ledger plus the tokens of that
+session's / customer's rows still queued, so a request never waits on other users' writes.
+
+Budgets (0 = unlimited):
+- USAGE_SESSION_TOKEN_BUDGET: tokens per chat session
+- USAGE_CUSTOMER_DAILY_TOKEN_BUDGET: tokens per customer per UTC day
+Above USAGE_SOFT_LIMIT of a budget, chat turns use templated replies where possible;
+at the budget, chat stops calling the LLM and reports use the templated summary.
+"""
+import contextvars
+import logging
+import os
+import queue
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = os.getenv("USAGE_DB_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "db", "usage_ledger.db"))
+
+SESSION_TOKEN_BUDGET = int(os.getenv("USAGE_SESSION_TOKEN_BUDGET", "0"))
+CUSTOMER_DAILY_TOKEN_BUDGET = int(os.getenv("USAGE_CUSTOMER_DAILY_TOKEN_BUDGET", "0"))
+SOFT_LIMIT = float(os.getenv("USAGE_SOFT_LIMIT", "0.8"))
+SESSION_CACHE_SIZE = int(os.getenv("USAGE_SESSION_CACHE_SIZE", "10000"))
+
+# USD per 1M tokens (input, output); unknown models are recorded at zero cost
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1": (2.00, 8.00),
+}
+
+BUDGET_OK, BUDGET_SOFT, BUDGET_EXCEEDED = "ok", "soft", "exceeded"
+
+_attribution: contextvars.ContextVar[Dict[str, str]] = contextvars.ContextVar("usage_attribution", default={})
+
+_lock = threading.Lock()
+_session_tokens: "OrderedDict[str, int]" = OrderedDict()  # least recently used first
+_customer_day_tokens: Dict[Tuple[str, str], int] = {}  # (customer_id, UTC date) -> tokens, today only
+# Tokens recorded but not yet committed, per ("session", id) / ("customer", id, day); guarded by _lock
+_pending: Dict[tuple, int] = {}
+# Held around each commit, so a ledger sum plus _pending counts every row exactly once
+_commit_lock = threading.Lock()
+
+_queue: "queue.Queue[tuple]" = queue.Queue()
+_writer: Optional[threading.Thread] = None
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_usage (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts TEXT NOT NULL,
+    day TEXT NOT NULL,
+    session_id TEXT,
+    customer_id TEXT,
+    endpoint TEXT,
+    node TEXT NOT NULL,
+    model TEXT,
+    prompt_tokens INTEGER NOT NULL,
+    completion_tokens INTEGER NOT NULL,
+    cost_usd REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_llm_usage_session ON llm_usage(session_id);
+CREATE INDEX IF NOT EXISTS idx_llm_usage_customer_day ON llm_usage(customer_id, day);
+"""
+
+
+def get_conn() -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+    conn = sqlite3.connect(DB_PATH)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+# --- ATTRIBUTION ---
+@contextmanager
+def attribute(endpoint: str, session_id: str = "", customer_id: str = ""):
+    """LLM calls made inside the block are charged to this session / customer / endpoint."""
+    token = _attribution.set({"endpoint": endpoint, "session_id": session_id, "customer_id": customer_id})
+    try:
+        yield
+    finally:
+        _attribution.reset(token)
+
+
+def cost_usd(model: Optional[str], prompt_tokens: int, completion_tokens: int) -> float:
+    price_in, price_out = MODEL_PRICES.get(model or "", (0.0, 0.0))
+    return (prompt_tokens * price_in + completion_tokens * price_out) / 1_000_000
+
+
+# --- RECORDING ---
+def record(node: str, model: Optional[str], usage: Optional[dict]):
+    """Records one LLM response's usage (usage_metadata: input_tokens / output_tokens)."""
+    if not usage:
+        return
+    prompt_tokens = int(usage.get("input_tokens") or 0)
+    completion_tokens = int(usage.get("output_tokens") or 0)
+    who = _attribution.get()
+    session_id, customer_id = who.get("session_id", ""), who.get("customer_id", "")
+    now = datetime.now(timezone.utc)
+    day = now.date().isoformat()
+    total = prompt_tokens + completion_tokens
+
+    with _lock:
+        if session_id in _session_tokens:
+            _session_tokens[session_id] += total
+            _session_tokens.move_to_end(session_id)
+        if customer_id and (customer_id, day) in _customer_day_tokens:
+            _customer_day_tokens[(customer_id, day)] += total
+        for key in _pending_keys(session_id, customer_id, day):
+            _pending[key] = _pending.get(key, 0) + total
+
+    _ensure_writer()
+    _queue.put((now.isoformat(), day, session_id, customer_id, who.get("endpoint", ""), node, model,
+                prompt_tokens, completion_tokens, cost_usd(model, prompt_tokens, completion_tokens)))
+
+
+def _pending_keys(session_id: str, customer_id: str, day: str) -> list:
+    keys = [("session", session_id)] if session_id else []
+    return keys + ([("customer", customer_id, day)] if customer_id else [])
+
+
+def _settle(rows: list):
+    """Rows committed (or dropped): their tokens are no longer pending."""
+    with _lock:
+        for row in rows:
+            for key in _pending_keys(row[2], row[3], row[1]):
+                left = _pending.get(key, 0) - (row[7] + row[8])
+                if left > 0:
+                    _pending[key] = left
+                else:
+                    _pending.pop(key, None)
+
+
+def _ensure_writer():
+    global _writer
+    if _writer is not None and _writer.is_alive():
+        return
+    with _lock:
+        if _writer is None or not _writer.is_alive():
+            _writer = threading.Thread(target=_write_loop, name="usage-ledger-writer", daemon=True)
+            _writer.start()
+
+
+def _write_loop():
+    conn = None
+    while True:
+        rows = [_queue.get()]
+        while True:
+            try:
+                rows.append(_queue.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            if conn is None:
+                conn = get_conn()
+            conn.executemany(
+                """INSERT INTO llm_usage (ts, day, session_id, customer_id, endpoint, node, model,
+                                          prompt_tokens, completion_tokens, cost_usd)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                rows,
+            )
+            with _commit_lock:
+                conn.commit()
+                _settle(rows)
+        except (sqlite3.Error, OSError) as e:
+            # Rows are dropped, not retried: the in-memory budget totals already counted them
+            logger.error("usage ledger write failed", extra={"rows": len(rows), "error": str(e)})
+            _settle(rows)
+            if conn is not None:
+                conn.close()
+            conn = None  # reconnect on the next batch
+        finally:
+            for _ in rows:
+                _queue.task_done()
+
+
+def flush():
+    """Blocks until every recorded row is in the database (or its write failed)."""
+    if _writer is not None:
+        _ensure_writer()  # restarts a writer that died, so queued rows are still drained
+        _queue.join()
+
+
+# --- BUDGETS ---
+def _load_total(cache: dict, key, pending_key: tuple, where: str, params: tuple) -> int:
+    """
+    Seeds cache[key] with the committed total from the ledger plus this key's queued tokens.
+    Commits wait meanwhile (one batch at most), so no row is in both or in neither; rows
+    recorded after the sum are in _pending until the total is seeded, then added to it.
+    """
+    conn = get_conn()
+    try:
+        with _commit_lock:
+            committed = conn.execute(
+                f"SELECT COALESCE(SUM(prompt_tokens + completion_tokens), 0) FROM llm_usage WHERE {where}", params,
+            ).fetchone()[0]
+            with _lock:
+                return cache.setdefault(key, committed + _pending.get(pending_key, 0))
+    finally:
+        conn.close()
+
+
+def session_tokens(session_id: str) -> int:
+    with _lock:
+        cached = _session_tokens.get(session_id)
+        if cached is not None:
+            _session_tokens.move_to_end(session_id)
+            return cached
+    # Not used recently (or by this process): the ledger has every committed row
+    tokens = _load_total(_session_tokens, session_id, ("session", session_id), "session_id = ?", (session_id,))
+    with _lock:
+        while len(_session_tokens) > SESSION_CACHE_SIZE:
+            _session_tokens.popitem(last=False)
+    return tokens
+
+
+def customer_tokens_today(customer_id: str) -> int:
+    day = datetime.now(timezone.utc).date().isoformat()
+    with _lock:
+        cached = _customer_day_tokens.get((customer_id, day))
+    if cached is not None:
+        return cached
+    # First check in this process today: usage from earlier processes today counts too
+    with _lock:
+        for key in [k for k in _customer_day_tokens if k[1] != day]:
+            del _customer_day_tokens[key]  # earlier days are never checked again
+    return _load_total(_customer_day_tokens, (customer_id, day), ("customer", customer_id, day),
+                       "customer_id = ? AND day = ?", (customer_id, day))
+
+
+def budget_status(session_id: str = "", customer_id: str = "") -> str:
+    """BUDGET_OK, BUDGET_SOFT (past USAGE_SOFT_LIMIT of a budget) or BUDGET_EXCEEDED."""
+    ratios = []
+    if SESSION_TOKEN_BUDGET and session_id:
+        ratios.append(session_tokens(session_id) / SESSION_TOKEN_BUDGET)
+    if CUSTOMER_DAILY_TOKEN_BUDGET and customer_id:
+        ratios.append(customer_tokens_today(customer_id) / CUSTOMER_DAILY_TOKEN_BUDGET)
+    worst = max(ratios, default=0.0)
+    if worst >= 1.0:
+        return BUDGET_EXCEEDED
+    if worst >= SOFT_LIMIT:
+        return BUDGET_SOFT
+    return BUDGET_OK
+
+
+def current_budget_status() -> str:
+    """budget_status() for the session / customer of the enclosing attribute() block."""
+    who = _attribution.get()
+    return budget_status(who.get("session_id", ""), who.get("customer_id", ""))
+
+
+# --- QUERIES ---
+def _breakdown(conn, where: str, params: tuple, column: str) -> list:
+    rows = conn.execute(
+        f"""SELECT {column}, COUNT(*), SUM(prompt_tokens), SUM(completion_tokens), SUM(cost_usd)
+            FROM llm_usage WHERE {where} GROUP BY {column} ORDER BY SUM(prompt_tokens + completion_tokens) DESC""",
+        params,
+    ).fetchall()
+    return [{column: r[0], "calls": r[1], "prompt_tokens": r[2], "completion_tokens": r[3],
+             "cost_usd": round(r[4], 6)} for r in rows]
+
+
+def _totals(conn, where: str, params: tuple) -> dict:
+    r = conn.execute(
+        f"""SELECT COUNT(*), COALESCE(SUM(prompt_tokens), 0), COALESCE(SUM(completion_tokens), 0),
+                   COALESCE(SUM(cost_usd), 0) FROM llm_usage WHERE {where}""",
+        params,
+    ).fetchone()
+    return {"calls": r[0], "prompt_tokens": r[1], "completion_tokens": r[2], "cost_usd": round(r[3], 6)}
+
+
+def usage_summary(session_id: str, customer_id: str) -> dict:
+    """Totals and per-endpoint / per-node breakdowns for a session and its customer (today)."""
+    flush()
+    day = datetime.now(timezone.utc).date().isoformat()
+    conn = get_conn()
+    try:
+        session_where, session_params = "session_id = ?", (session_id,)
+        customer_where, customer_params = "customer_id = ? AND day = ?", (customer_id, day)
+        return {
+            "session": {
+                **_totals(conn, session_where, session_params),
+                "by_endpoint": _breakdown(conn, session_where, session_params, "endpoint"),
+                "by_node": _breakdown(conn, session_where, session_params, "node"),
+                "budget_tokens": SESSION_TOKEN_BUDGET or None,
+            },
+            "customer_today": {
+                **_totals(conn, customer_where, customer_params),
+                "by_node": _breakdown(conn, customer_where, customer_params, "node"),
+                "budget_tokens": CUSTOMER_DAILY_TOKEN_BUDGET or None,
+            },
+            "budget_status": budget_status(session_id, customer_id),
+        }
+    finally:
+        conn.close()
@@ -0,0 +1,111 @@
+"""
+lexical_index.py
+Domain: In-Memory BM25 Index for the FAQ Knowledge Base
+
+Short FAQ queries are often bare acronyms ("NCD", "COE", "GIRO", "MAS"). Exact term
+matching answers these faster and more precisely than embedding + HNSW search.
+This index is built from the same FAQ source as the Chroma collection and uses the
+same document IDs, so its results can be fused with vector results.
+"""
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Collection, Dict, Iterable, List, Optional, Tuple
+
+_TOKEN = re.compile(r"[A-Za-z0-9]+")
+_ACRONYM = re.compile(r"^[A-Z]{2,6}$")
+
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "what", "who", "how", "do", "does", "i", "my", "me",
+    "can", "of", "to", "in", "for", "on", "and", "or", "it", "you", "your", "be", "by", "with",
+    "about", "tell", "explain", "define", "mean", "means",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    return [t.lower() for t in _TOKEN.findall(text or "") if t.lower() not in STOPWORDS]
+
+
+class BM25Index:
+    """Okapi BM25 over FAQ documents with an inverted index."""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.ids: List[str] = []
+        self.documents: Dict[str, str] = {}
+        self.postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self.doc_lengths: List[int] = []
+        self.avg_length = 0.0
+        # acronym (upper-case) -> doc indexes whose *question* contains it
+        self.acronyms: Dict[str, List[int]] = defaultdict(list)
+
+    @classmethod
+    def build(cls, entries: Iterable[Tuple[str, str, str]]) -> "BM25Index":
+        """entries: (doc_id, question, document_text)"""
+        index = cls()
+        for doc_id, question, document in entries:
+            index.add(doc_id, question, document)
+        index._finalize()
+        return index
+
+    def add(self, doc_id: str, question: str, document: str):
+        idx = len(self.ids)
+        self.ids.append(doc_id)
+        self.documents[doc_id] = document
+        tokens = tokenize(document)
+        self.doc_lengths.append(len(tokens))
+        for term, tf in Counter(tokens).items():
+            self.postings[term][idx] = tf
+        for raw in _TOKEN.findall(question):
+            if _ACRONYM.match(raw) and idx not in self.acronyms[raw]:
+                self.acronyms[raw].append(idx)
+
+    def _finalize(self):
+        self.avg_length = (sum(self.doc_lengths) / len(self.doc_lengths)) if self.doc_lengths else 0.0
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _idf(self, term: str) -> float:
+        n = len(self.postings.get(term, ()))
+        return math.log(1 + (len(self.ids) - n + 0.5) / (n + 0.5))
+
+    def search(self, query: str, k: int = 5, allowed: Optional[Collection[str]] = None) -> List[Tuple[str, float]]:
+        """Returns up to k (doc_id, score) pairs, best first. `allowed` restricts the candidate IDs."""
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self._idf(term)
+            for idx, tf in postings.items():
+                if allowed is not None and self.ids[idx] not in allowed:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[idx] / (self.avg_length or 1))
+                scores[idx] += idf * tf * (self.k1 + 1) / (tf + norm)
+        ranked = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:k]
+        return [(self.ids[idx], score) for idx, score in ranked]
+
+    def acronym_match(self, query: str, k: int = 2, allowed: Optional[Collection[str]] = None) -> Optional[List[str]]:
+        """
+        Fast path: if the query names exactly one known acronym, return the FAQ
+        entries whose question contains it (best BM25 match first). Otherwise None.
+        """
+        found = {t.upper() for t in _TOKEN.findall(query or "") if t.upper() in self.acronyms}
+        if len(found) != 1:
+            return None
+        candidates = {self.ids[i] for i in self.acronyms[found.pop()]}
+        if allowed is not None:
+            candidates &= set(allowed)
+        ranked = [doc_id for doc_id, _ in self.search(query, k=len(self.ids)) if doc_id in candidates]
+        return ranked[:k] or None
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[str]:
+    """Fuses ranked ID lists: score(d) = sum(1 / (k + rank)). Ties keep first-seen order."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=lambda d: scores[d], reverse=True)
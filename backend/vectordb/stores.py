@@ -0,0 +1,239 @@
+"""
+stores.py
+Domain: Vector Store Backends for the FAQ Knowledge Base
+
+All backends store caller-computed embeddings (see vector_db.get_embedding_function)
+under stable FAQ IDs and answer cosine top-k queries.
+
+- ChromaVectorStore: the Chroma PersistentClient collection (SQLite + HNSW).
+- NumpyVectorStore: normalized embeddings in a memory-mapped .npy matrix plus a JSON
+  sidecar for IDs/documents/metadata. Exact search with one matrix-vector product;
+  cheaper in memory, import and latency for a small corpus.
+
+Selected with FAQ_VECTOR_BACKEND=chroma|numpy.
+
+Queries take an optional Chroma-style metadata filter, e.g. {"domain": {"$in": ["Motor", "General"]}}.
+"""
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# (id, document, cosine distance)
+Hit = Tuple[str, str, float]
+
+
+def matches_where(metadata: dict, where: Optional[dict]) -> bool:
+    """Evaluates the filter subset both backends support: {field: value} and {field: {"$in": [...]}}."""
+    for field, condition in (where or {}).items():
+        value = metadata.get(field)
+        if isinstance(condition, dict):
+            if "$in" in condition and value not in condition["$in"]:
+                return False
+            if "$eq" in condition and value != condition["$eq"]:
+                return False
+        elif value != condition:
+            return False
+    return True
+
+
+class VectorStore(ABC):
+    """Minimal interface used by vector_db."""
+    name = "base"
+
+    @abstractmethod
+    def upsert(self, ids: List[str], embeddings: Sequence, documents: List[str], metadatas: List[dict]):
+        ...
+
+    @abstractmethod
+    def delete(self, ids: List[str]):
+        ...
+
+    @abstractmethod
+    def query(self, embeddings: Sequence, n_results: int, where: Optional[dict] = None) -> List[List[Hit]]:
+        """One ranked hit list per query embedding, best first, over entries matching `where`."""
+
+    @abstractmethod
+    def ids(self) -> List[str]:
+        ...
+
+    @abstractmethod
+    def records(self) -> Iterator[Tuple[str, str, dict]]:
+        """(id, document, metadata) of every stored entry."""
+
+    @abstractmethod
+    def count(self) -> int:
+        ...
+
+
+class ChromaVectorStore(VectorStore):
+    name = "chroma"
+
+    def __init__(self, collection: Any):
+        self.collection = collection
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self.collection.upsert(ids=ids, embeddings=list(embeddings), documents=documents, metadatas=metadatas)
+
+    def delete(self, ids):
+        if ids:
+            self.collection.delete(ids=ids)
+
+    def query(self, embeddings, n_results, where=None):
+        results = self.collection.query(query_embeddings=list(embeddings), n_results=n_results,
+                                        where=where or None)
+        hits = []
+        for i in range(len(embeddings)):
+            ids = results["ids"][i] if results["ids"] else []
+            docs = results["documents"][i] if results["documents"] else []
+            dists = results["distances"][i] if results.get("distances") else [0.0] * len(ids)
+            hits.append(list(zip(ids, docs, dists)))
+        return hits
+
+    def ids(self):
+        return self.collection.get(include=[])["ids"]
+
+    def records(self, page: int = 1000):
+        for offset in range(0, self.count(), page):
+            got = self.collection.get(include=["documents", "metadatas"], limit=page, offset=offset)
+            yield from zip(got["ids"], got["documents"], got["metadatas"])
+
+    def count(self):
+        return self.collection.count()
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    Exact cosine search over a memory-mapped float32 matrix.
+    Layout in `path`:
+      embeddings.npy  (n, dim) L2-normalized rows
+      records.json    {"ids": [...], "documents": [...], "metadatas": [...]}
+    Writes rebuild both files atomically; reads map the matrix without copying it.
+    Filtered queries search a per-filter sub-matrix (e.g. one per set of policy
+    domains), built on first use and dropped on the next write.
+    """
+    name = "numpy"
+
+    def __init__(self, path: str):
+        self.path = path
+        self.matrix_path = os.path.join(path, "embeddings.npy")
+        self.records_path = os.path.join(path, "records.json")
+        self._lock = threading.Lock()
+        # (matrix, ids, documents, metadatas, sub-indexes), swapped as one reference so readers never see a mix
+        self._state: Tuple[Optional[np.ndarray], List[str], List[str], List[dict], Dict[str, tuple]] = (None, [], [], [], {})
+        self._load()
+
+    def _load(self):
+        if not (os.path.exists(self.matrix_path) and os.path.exists(self.records_path)):
+            self._state = (None, [], [], [], {})
+            return
+        with open(self.records_path, "r", encoding="utf-8") as f:
+            records = json.load(f)
+        matrix = np.load(self.matrix_path, mmap_mode="r")
+        self._state = (matrix, records["ids"], records["documents"], records["metadatas"], {})
+
+    def _save(self, matrix: Optional[np.ndarray], ids, documents, metadatas):
+        os.makedirs(self.path, exist_ok=True)
+        if matrix is None or not len(ids):
+            for p in (self.matrix_path, self.records_path):
+                if os.path.exists(p):
+                    os.remove(p)
+            self._load()
+            return
+        tmp_matrix = self.matrix_path + ".tmp.npy"
+        np.save(tmp_matrix, np.ascontiguousarray(matrix, dtype=np.float32))
+        tmp_records = self.records_path + ".tmp"
+        with open(tmp_records, "w", encoding="utf-8") as f:
+            json.dump({"ids": ids, "documents": documents, "metadatas": metadatas}, f, ensure_ascii=False)
+        os.replace(tmp_matrix, self.matrix_path)
+        os.replace(tmp_records, self.records_path)
+        self._load()
+
+    @staticmethod
+    def _normalize(vectors) -> np.ndarray:
+        arr = np.asarray(vectors, dtype=np.float32)
+        if arr.ndim == 1:
+            arr = arr[None, :]
+        norms = np.linalg.norm(arr, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return arr / norms
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        new_rows = self._normalize(embeddings)
+        with self._lock:
+            current, cur_ids, cur_docs, cur_meta, _ = self._state
+            matrix = np.array(current) if current is not None else np.zeros((0, new_rows.shape[1]), np.float32)
+            all_ids, all_docs, all_meta = list(cur_ids), list(cur_docs), list(cur_meta)
+            position = {doc_id: i for i, doc_id in enumerate(all_ids)}
+            appended = []
+            for row, doc_id, doc, meta in zip(new_rows, ids, documents, metadatas):
+                if doc_id in position:
+                    i = position[doc_id]
+                    matrix[i] = row
+                    all_docs[i], all_meta[i] = doc, meta
+                else:
+                    position[doc_id] = len(all_ids)
+                    all_ids.append(doc_id)
+                    all_docs.append(doc)
+                    all_meta.append(meta)
+                    appended.append(row)
+            if appended:
+                matrix = np.vstack([matrix, np.stack(appended)])
+            self._save(matrix, all_ids, all_docs, all_meta)
+
+    def delete(self, ids):
+        drop = set(ids)
+        with self._lock:
+            matrix, cur_ids, cur_docs, cur_meta, _ = self._state
+            if matrix is None or not drop:
+                return
+            keep = [i for i, doc_id in enumerate(cur_ids) if doc_id not in drop]
+            self._save(
+                np.array(matrix[keep]) if keep else None,
+                [cur_ids[i] for i in keep],
+                [cur_docs[i] for i in keep],
+                [cur_meta[i] for i in keep],
+            )
+
+    def _sub_index(self, state, where: dict) -> Tuple[np.ndarray, np.ndarray]:
+        """(row numbers, sub-matrix) of the entries matching `where`, cached on the state."""
+        matrix, _, _, metadatas, sub_indexes = state
+        key = json.dumps(where, sort_keys=True)
+        if key not in sub_indexes:
+            rows = np.array([i for i, meta in enumerate(metadatas) if matches_where(meta, where)], dtype=np.int64)
+            sub_indexes[key] = (rows, np.array(matrix[rows]) if len(rows) else None)
+        return sub_indexes[key]
+
+    def query(self, embeddings, n_results, where=None):
+        queries = self._normalize(embeddings)
+        state = self._state
+        matrix, ids, documents, _, _ = state
+        if matrix is None or not len(ids):
+            return [[] for _ in range(len(queries))]
+        rows = None
+        if where:
+            rows, matrix = self._sub_index(state, where)
+            if matrix is None:
+                return [[] for _ in range(len(queries))]
+        k = min(n_results, matrix.shape[0])
+        scores = queries @ matrix.T  # (q, n) cosine similarity
+        results = []
+        for row in scores:
+            top = np.argpartition(-row, k - 1)[:k] if k < len(row) else np.arange(len(row))
+            top = top[np.argsort(-row[top])]
+            positions = rows[top] if rows is not None else top
+            results.append([(ids[i], documents[i], float(1.0 - row[j])) for i, j in zip(positions, top)])
+        return results
+
+    def ids(self):
+        return list(self._state[1])
+
+    def records(self):
+        _, ids, documents, metadatas, _ = self._state
+        return iter(list(zip(ids, documents, metadatas)))
+
+    def count(self):
+        return len(self._state[1])
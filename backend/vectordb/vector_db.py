@@ -6,20 +6,147 @@ import logging
 import os
 import json
 import hashlib
+import threading
+import re
+import time
 import chromadb
-from typing import Any, Dict, List, Optional
+from collections import OrderedDict
+from functools import cached_property
+from typing import Any, Dict, Iterator, List, Optional, Union
 from chromadb.config import Settings as ChromaSettings
+from chromadb.utils.embedding_functions.onnx_mini_lm_l6_v2 import ONNXMiniLM_L6_V2
+
+from vectordb.lexical_index import BM25Index, reciprocal_rank_fusion, tokenize
+from vectordb.stores import ChromaVectorStore, NumpyVectorStore, VectorStore
 
 # --- CONFIGURATION ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 CHROMA_PATH = os.path.join(BASE_DIR, "chroma_faq_db")
+NUMPY_PATH = os.path.join(BASE_DIR, "numpy_faq_db")
+# Vector store backend: chroma (PersistentClient) or numpy (memory-mapped exact search)
+VECTOR_BACKEND = os.getenv("FAQ_VECTOR_BACKEND", "chroma")
 JSON_PATH = os.path.join(BASE_DIR, "faq_data.json")
+# id -> content hash of every indexed FAQ; lets upsert_faqs embed only what changed.
+# The numpy backend keeps its manifest inside NUMPY_PATH.
+MANIFEST_PATH = os.path.join(BASE_DIR, "chroma_faq_manifest.json")
+BATCH_SIZE = 100
 COLLECTION_NAME = "insurance_sg_faq"
+# Intra-op threads for the ONNX embedding model (0 = onnxruntime default, all cores)
+EMBED_THREADS = int(os.getenv("FAQ_EMBED_THREADS", "0"))
+# hybrid = BM25 + vector with reciprocal-rank fusion; vector / lexical = single retriever
+RETRIEVAL_MODE = os.getenv("FAQ_RETRIEVAL", "hybrid")
+# Candidates taken from each retriever before fusion
+FUSION_CANDIDATES = 8
+# Entries in each of the query-embedding and query-result LRU caches
+QUERY_CACHE_SIZE = int(os.getenv("FAQ_QUERY_CACHE_SIZE", "512"))
+
+# --- POLICY DOMAINS ---
+# Every FAQ is tagged with one domain ("domain" in the FAQ source; untagged entries are General),
+# stored in its vector store metadata. Both the vector filter and the BM25 allow-lists read it
+# from there. A customer's searches are narrowed to their policy types plus the shared domains.
+DOMAIN_FILTER = os.getenv("FAQ_DOMAIN_FILTER", "1").lower() in ("1", "true", "yes")
+POLICY_DOMAINS = ("Motor", "Life", "Health", "Home", "Travel")
+SHARED_DOMAINS = ("Payments", "General")
+# A question that names another domain ("does my plan cover hospital bills?") also searches it
+DOMAIN_KEYWORDS = {
+    "Motor": {"motor", "car", "cars", "vehicle", "driving", "ncd", "coe", "tpo", "comprehensive"},
+    "Life": {"life", "death", "die", "dps", "dependants"},
+    "Health": {"health", "hospital", "medical", "medishield", "medisave", "shield"},
+    "Home": {"home", "house", "flat", "hdb", "fire"},
+    "Travel": {"travel", "trip", "flight", "overseas"},
+}
 
 logger = logging.getLogger(__name__)
 
 _chroma_client: Optional[chromadb.Client] = None
 _faq_collection: Optional[Any] = None
+_vector_store: Optional[VectorStore] = None
+_embedding_function: Optional["WarmEmbeddingFunction"] = None
+_lexical_index: Optional[BM25Index] = None
+_domain_ids: Dict[str, frozenset] = {}  # domain -> FAQ IDs from stored metadata, built with the lexical index
+_allowed_ids: Dict[tuple, frozenset] = {}  # domain set -> FAQ IDs
+
+
+class _LRUCache:
+    """Thread-safe LRU map with a fixed number of entries."""
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Any, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Any) -> Any:
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Any, value: Any):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_embedding_cache = _LRUCache(QUERY_CACHE_SIZE)
+_result_cache = _LRUCache(QUERY_CACHE_SIZE)
+
+
+def clear_query_caches():
+    _embedding_cache.clear()
+    _result_cache.clear()
+
+_warmup_lock = threading.Lock()
+_warmup_state: Dict[str, Any] = {"finished": False, "ready": False, "error": None, "timings_ms": {}}
+
+
+# --- EMBEDDING FUNCTION ---
+class WarmEmbeddingFunction(ONNXMiniLM_L6_V2):
+    """
+    Same model as Chroma's default embedding function (all-MiniLM-L6-v2), with a
+    configurable intra-op thread count. One instance stays loaded for the process;
+    Chroma's DefaultEmbeddingFunction builds a new model instance on every call.
+
+    Embeddings are computed here and passed to Chroma explicitly, so collections
+    created with the default embedding function keep working unchanged.
+    """
+    def __init__(self, threads: int = 0):
+        super().__init__()
+        self._threads = threads
+
+    @cached_property
+    def model(self) -> Any:
+        so = self.ort.SessionOptions()
+        so.log_severity_level = 3
+        so.graph_optimization_level = self.ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if self._threads:
+            so.intra_op_num_threads = self._threads
+            so.inter_op_num_threads = 1
+        providers = [p for p in self.ort.get_available_providers() if p != "CoreMLExecutionProvider"]
+        return self.ort.InferenceSession(
+            os.path.join(self.DOWNLOAD_PATH, self.EXTRACTED_FOLDER_NAME, "model.onnx"),
+            providers=providers,
+            sess_options=so,
+        )
+
+
+def get_embedding_function() -> WarmEmbeddingFunction:
+    global _embedding_function
+    if _embedding_function is None:
+        _embedding_function = WarmEmbeddingFunction(EMBED_THREADS)
+    return _embedding_function
+
 
 def get_chroma_client() -> chromadb.Client:
     global _chroma_client
@@ -42,61 +169,397 @@ def get_faq_collection() -> Any:
         )
     return _faq_collection
 
-def load_faqs_from_json(filepath: str) -> List[Dict[str, str]]:
+def get_vector_store() -> VectorStore:
+    """The configured vector store backend (FAQ_VECTOR_BACKEND)."""
+    global _vector_store
+    if _vector_store is None:
+        if VECTOR_BACKEND == "numpy":
+            _vector_store = NumpyVectorStore(NUMPY_PATH)
+        elif VECTOR_BACKEND == "chroma":
+            _vector_store = ChromaVectorStore(get_faq_collection())
+        else:
+            raise ValueError(f"Unknown FAQ_VECTOR_BACKEND '{VECTOR_BACKEND}' (expected chroma or numpy)")
+    return _vector_store
+
+def get_manifest_path() -> str:
+    if VECTOR_BACKEND == "numpy":
+        return os.path.join(NUMPY_PATH, "manifest.json")
+    return MANIFEST_PATH
+
+
+# --- WARM-UP / READINESS ---
+def warm_up() -> Dict[str, Any]:
+    """
+    Opens the vector store, loads the embedding model, builds the BM25 index and runs
+    one vector query so the first user FAQ question does not pay the cold start.
+    Safe to call more than once; later calls return the recorded state.
+    """
+    with _warmup_lock:
+        if _warmup_state["ready"]:
+            return _warmup_state
+        timings = _warmup_state["timings_ms"]
+        try:
+            start = time.perf_counter()
+            get_vector_store().count()
+            timings["store"] = round((time.perf_counter() - start) * 1000, 1)
+
+            step = time.perf_counter()
+            get_embedding_function()(["warm up"])
+            timings["embedding_model"] = round((time.perf_counter() - step) * 1000, 1)
+
+            step = time.perf_counter()
+            get_lexical_index()
+            timings["lexical_index"] = round((time.perf_counter() - step) * 1000, 1)
+
+            # Straight to the vector store: an acronym query ("What is NCD?") would be answered
+            # by the BM25 fast path and leave the vector index cold
+            step = time.perf_counter()
+            vector_search("How do I make a claim after an accident?", 1)
+            timings["first_query"] = round((time.perf_counter() - step) * 1000, 1)
+
+            timings["total"] = round((time.perf_counter() - start) * 1000, 1)
+            _warmup_state["ready"] = True
+            _warmup_state["error"] = None
+            logger.info("FAQ vector store warm-up finished: %s", timings)
+        except Exception as e:
+            _warmup_state["error"] = str(e)
+            logger.error("FAQ vector store warm-up failed: %s", e)
+        _warmup_state["finished"] = True
+        return _warmup_state
+
+
+def is_ready() -> bool:
+    return _warmup_state["ready"]
+
+
+def warmup_finished() -> bool:
+    return _warmup_state["finished"]
+
+
+def warmup_status() -> Dict[str, Any]:
+    return {**_warmup_state, "timings_ms": dict(_warmup_state["timings_ms"])}
+
+def iter_faqs(filepath: str, chunk_size: int = 1 << 16) -> Iterator[Dict[str, str]]:
+    """
+    Streams FAQ entries from a JSON array (.json) or JSON Lines (.jsonl) file
+    without loading the whole file into memory.
+    """
     if not os.path.exists(filepath):
-        print(f"Warning: {filepath} not found.")
-        return []
+        logger.warning("FAQ source %s not found", filepath)
+        return
     try:
         with open(filepath, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"Error decoding JSON: {e}")
-        return []
+            if filepath.endswith(".jsonl"):
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+            else:
+                yield from _iter_json_array(f, chunk_size)
+    except ValueError as e:
+        logger.error("Error decoding FAQ JSON %s: %s", filepath, e)
+
+def _iter_json_array(f, chunk_size: int) -> Iterator[Any]:
+    decoder = json.JSONDecoder()
+    buffer, started, eof = "", False, False
+    while True:
+        buffer = buffer.lstrip()
+        if not started:
+            if not buffer and not eof:
+                chunk = f.read(chunk_size)
+                buffer, eof = buffer + chunk, not chunk
+                continue
+            if not buffer.startswith("["):
+                raise ValueError("Expected a JSON array of FAQ entries")
+            buffer, started = buffer[1:], True
+            continue
+        if buffer.startswith(","):
+            buffer = buffer[1:]
+            continue
+        if buffer.startswith("]"):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except ValueError:
+            if eof:
+                raise
+            chunk = f.read(chunk_size)
+            buffer, eof = buffer + chunk, not chunk
+            continue
+        yield item
+        buffer = buffer[end:]
+
+def load_faqs_from_json(filepath: str) -> List[Dict[str, str]]:
+    return list(iter_faqs(filepath))
+
+def _batched(items: Iterator[Any], size: int) -> Iterator[List[Any]]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
 
 def generate_id(text: str) -> str:
     """Generates a stable ID based on the question text."""
     return hashlib.md5(text.encode()).hexdigest()
 
-def upsert_faqs(json_file_path: str = JSON_PATH):
-    """Loads FAQs and inserts them. If ID exists, it updates."""
-    collection = get_faq_collection()
+def faq_domain(faq: Dict[str, str]) -> str:
+    return faq.get("domain") or "General"
+
+def faq_metadata(faq: Dict[str, str]) -> Dict[str, str]:
+    return {**faq, "domain": faq_domain(faq)}
+
+def content_hash(faq: Dict[str, str]) -> str:
+    """
+    Hash of everything that ends up in the index (document and metadata), so edited answers
+    are detected, and entries indexed before they carried a domain are written again with one.
+    """
+    return hashlib.sha256(json.dumps(faq_metadata(faq), sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+def format_document(faq: Dict[str, str]) -> str:
+    return f"Question: {faq['question']}\nAnswer: {faq['answer']}"
+
+def load_manifest(path: Optional[str] = None) -> Dict[str, str]:
+    path = path or get_manifest_path()
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring unreadable FAQ manifest %s: %s", path, e)
+        return {}
+
+def save_manifest(manifest: Dict[str, str], path: Optional[str] = None):
+    path = path or get_manifest_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def indexed_faqs() -> Iterator[tuple]:
+    """
+    (id, question, document, metadata) of every FAQ in the vector store, which holds
+    whatever source upsert_faqs last indexed. Before anything is indexed (e.g. lexical-only
+    use offline), the default source JSON_PATH.
+    """
+    # A Chroma client creates its directory on open: do not create one just to find it empty
+    if VECTOR_BACKEND != "chroma" or os.path.exists(CHROMA_PATH):
+        store = get_vector_store()
+        if store.count():
+            for doc_id, document, metadata in store.records():
+                yield doc_id, metadata.get("question", ""), document, metadata
+            return
+    for f in iter_faqs(JSON_PATH):
+        yield generate_id(f["question"]), f["question"], format_document(f), f
+
+def get_lexical_index() -> BM25Index:
+    """
+    BM25 index over the indexed FAQs (indexed_faqs()), built on first use and rebuilt
+    after upserts, so hybrid search fuses rankings over the same documents and IDs.
+    """
+    global _lexical_index, _domain_ids, _allowed_ids
+    if _lexical_index is None:
+        entries, domains = [], {}
+        for doc_id, question, document, metadata in indexed_faqs():
+            entries.append((doc_id, question, document))
+            domains.setdefault(faq_domain(metadata), set()).add(doc_id)
+        _domain_ids = {domain: frozenset(ids) for domain, ids in domains.items()}
+        _allowed_ids = {}
+        _lexical_index = BM25Index.build(entries)
+    return _lexical_index
+
+def faq_domains() -> Dict[str, str]:
+    """FAQ ID -> domain of every indexed FAQ, as the domain filter sees it."""
+    get_lexical_index()
+    return {doc_id: domain for domain, ids in _domain_ids.items() for doc_id in ids}
+
+def search_domains(policy_types: Optional[List[str]], query: str = "") -> Optional[tuple]:
+    """
+    Domains to search for a customer holding `policy_types`: those types, the shared
+    domains and any domain the query names. None means search everything.
+    """
+    if not DOMAIN_FILTER or not policy_types:
+        return None
+    domains = {t for t in policy_types if t in POLICY_DOMAINS} | set(SHARED_DOMAINS)
+    words = set(tokenize(query))
+    domains |= {d for d, keywords in DOMAIN_KEYWORDS.items() if words & keywords}
+    if domains >= set(POLICY_DOMAINS):
+        return None
+    return tuple(sorted(domains))
+
+def upsert_faqs(json_file_path: str = JSON_PATH, full: bool = False):
+    """
+    Incrementally syncs the vector store with a FAQ source (JSON array or JSONL).
+    Only new or edited entries are embedded; entries missing from the source are deleted.
+    full=True re-embeds everything (also done when the manifest and collection disagree).
+    """
+    global _lexical_index
+    store = get_vector_store()
 
     print(f"Processing FAQs from {json_file_path} ...")
-    faqs = load_faqs_from_json(json_file_path)
+    manifest = {} if full else load_manifest()
+    if manifest and store.count() != len(manifest):
+        print("Manifest does not match the vector store; re-indexing everything.")
+        manifest = {}
+
+    new_manifest: Dict[str, str] = {}
+    seen, changed = 0, 0
+    for batch in _batched(iter_faqs(json_file_path), BATCH_SIZE):
+        documents, metadatas, ids = [], [], []
+        for faq in batch:
+            stable_id = generate_id(faq['question'])
+            digest = content_hash(faq)
+            new_manifest[stable_id] = digest
+            seen += 1
+            if manifest.get(stable_id) == digest:
+                continue
+            documents.append(format_document(faq))
+            metadatas.append(faq_metadata(faq))
+            ids.append(stable_id)
+        if ids:
+            store.upsert(ids, get_embedding_function()(documents), documents, metadatas)
+            changed += len(ids)
 
-    if not faqs:
+    if not seen:
         return
 
-    documents, metadatas, ids = [], [], []
-
-    for faq in faqs:
-        stable_id = generate_id(faq['question'])
-        doc_text = f"Question: {faq['question']}\nAnswer: {faq['answer']}"
-        documents.append(doc_text)
-        metadatas.append(faq)
-        ids.append(stable_id)
-
-    batch_size = 100
-    for i in range(0, len(documents), batch_size):
-        collection.upsert(
-            documents=documents[i : i + batch_size],
-            metadatas=metadatas[i : i + batch_size],
-            ids=ids[i : i + batch_size]
-        )
+    # Without a manifest, compare against what the store actually holds
+    known_ids = manifest or store.ids()
+    removed = [doc_id for doc_id in known_ids if doc_id not in new_manifest]
+    for i in range(0, len(removed), BATCH_SIZE):
+        store.delete(removed[i : i + BATCH_SIZE])
+
+    save_manifest(new_manifest)
+    if changed or removed:
+        _lexical_index = None
+        _result_cache.clear()
+    print(f"Processed {seen} items ({changed} embedded, {len(removed)} deleted, "
+          f"{seen - changed} unchanged). Total {store.name} store size: {store.count()}")
+
+def normalize_query(query: str) -> str:
+    """Cache key for a query: case, surrounding punctuation and spacing do not matter."""
+    return " ".join(re.sub(r"[^\w\s]", " ", query.lower()).split())
+
+def embed_queries(queries: List[str]) -> List[Any]:
+    """Embeds queries in one model call, reusing cached embeddings of normalized text."""
+    keys = [normalize_query(q) for q in queries]
+    vectors = [_embedding_cache.get(k) for k in keys]
+    missing = list(dict.fromkeys(k for k, v in zip(keys, vectors) if v is None))
+    if missing:
+        fresh = dict(zip(missing, get_embedding_function()(missing)))
+        for k, v in fresh.items():
+            _embedding_cache.put(k, v)
+        vectors = [v if v is not None else fresh[k] for k, v in zip(keys, vectors)]
+    return vectors
+
+def _domain_where(domains: Optional[tuple]) -> Optional[dict]:
+    return {"domain": {"$in": list(domains)}} if domains else None
+
+def vector_search_many(queries: List[str], n_results: int, domains: Optional[tuple] = None) -> List[List[tuple]]:
+    """(id, document) pairs per query, best first, from one batched embed + store query."""
+    if not queries:
+        return []
+    results = get_vector_store().query(embed_queries(queries), n_results, where=_domain_where(domains))
+    return [[(doc_id, doc) for doc_id, doc, _ in hits] for hits in results]
+
+def vector_search(query: str, n_results: int) -> List[tuple]:
+    """Returns (id, document) pairs from the vector store, best first."""
+    return vector_search_many([query], n_results)[0]
+
+def retrieve_many(queries: List[str], n_results: int = 2, mode: Optional[str] = None,
+                  policy_types: Optional[List[str]] = None) -> List[List[tuple]]:
+    """
+    Ranked (id, document) pairs for each query.
+    An exact acronym hit ("NCD", "COE") is answered from the BM25 index alone;
+    otherwise BM25 and vector rankings are fused with reciprocal-rank fusion.
+    With policy_types, each query searches only the FAQ domains from search_domains()
+    and falls back to the whole knowledge base when that finds nothing.
+    Queries still needing vector search are embedded and searched in batches (one per
+    domain set), and results are cached by normalized query text.
+    """
+    mode = mode or RETRIEVAL_MODE
+    results: List[Optional[List[tuple]]] = [None] * len(queries)
+    scopes = [search_domains(policy_types, q) for q in queries]
+    lexical = get_lexical_index()
+
+    def run(indexes: List[int], filtered: bool):
+        pending: Dict[Optional[tuple], Dict[int, List[tuple]]] = {}  # domains -> index -> lexical hits
+        for i in indexes:
+            domains = scopes[i] if filtered else None
+            allowed = None
+            if domains:
+                if domains not in _allowed_ids:
+                    _allowed_ids[domains] = frozenset().union(*(_domain_ids.get(d, ()) for d in domains))
+                allowed = _allowed_ids[domains]
+            if mode == "vector":
+                pending.setdefault(domains, {})[i] = []
+                continue
+            fast = lexical.acronym_match(queries[i], n_results, allowed=allowed)
+            if fast:
+                results[i] = [(doc_id, lexical.documents[doc_id]) for doc_id in fast]
+                continue
+            lexical_hits = [(doc_id, lexical.documents[doc_id])
+                            for doc_id, _ in lexical.search(queries[i], k=FUSION_CANDIDATES, allowed=allowed)]
+            if mode == "lexical":
+                results[i] = lexical_hits[:n_results]
+            else:
+                pending.setdefault(domains, {})[i] = lexical_hits
+
+        k = n_results if mode == "vector" else FUSION_CANDIDATES
+        for domains, group in pending.items():
+            order = list(group)
+            for i, vector_hits in zip(order, vector_search_many([queries[i] for i in order], k, domains)):
+                if mode == "vector":
+                    results[i] = vector_hits
+                    continue
+                lexical_hits = group[i]
+                documents = dict(lexical_hits + vector_hits)
+                fused = reciprocal_rank_fusion([[d for d, _ in vector_hits], [d for d, _ in lexical_hits]])
+                results[i] = [(doc_id, documents[doc_id]) for doc_id in fused[:n_results]]
+
+    todo = []
+    for i, query in enumerate(queries):
+        cached = _result_cache.get((normalize_query(query), n_results, mode, scopes[i]))
+        if cached is not None:
+            results[i] = cached
+        else:
+            todo.append(i)
+    run(todo, filtered=True)
+    # Nothing in the customer's domains: search the whole knowledge base
+    run([i for i in todo if not results[i] and scopes[i]], filtered=False)
 
-    print(f"Processed {len(faqs)} items. Total Collection Size: {collection.count()}")
+    for i in todo:
+        _result_cache.put((normalize_query(queries[i]), n_results, mode, scopes[i]), results[i])
+    return results
 
-def query_faqs(query: str, n_results: int = 2) -> str:
-    collection = get_faq_collection()
-    results = collection.query(query_texts=[query], n_results=n_results)
+def retrieve(query: str, n_results: int = 2, mode: Optional[str] = None,
+             policy_types: Optional[List[str]] = None) -> List[tuple]:
+    """Ranked (id, document) pairs for one query; see retrieve_many."""
+    return retrieve_many([query], n_results, mode, policy_types)[0]
 
-    if not results['documents'] or not results['documents'][0]:
+def _format_hits(hits: List[tuple]) -> str:
+    if not hits:
         return "No relevant FAQ found."
+    return "\n\n".join(doc for _, doc in hits)
 
-    return "\n\n".join(results['documents'][0])
+def query_faqs(query: Union[str, List[str]], n_results: int = 2,
+               policy_types: Optional[List[str]] = None) -> Union[str, List[str]]:
+    """
+    Answer text for one query, or a list of answers when given a list of queries.
+    policy_types (the customer's policies, e.g. ["Motor"]) narrows the search to related FAQs.
+    """
+    if isinstance(query, str):
+        return _format_hits(retrieve(query, n_results, policy_types=policy_types))
+    return [_format_hits(hits) for hits in retrieve_many(list(query), n_results, policy_types=policy_types)]
 
 # Auto-run upsert on import/run
 if __name__ == "__main__":
-    upsert_faqs()
+    import sys
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    upsert_faqs(args[0] if args else JSON_PATH, full="--full" in sys.argv)
     print("\nTest Query 'NCD':")
     print(query_faqs("What is NCD?"))
@@ -3,11 +3,13 @@ import type { ChatResponse } from "@/types";
 
 export async function sendMessage(
   sessionId: string,
-  message: string
+  message: string,
+  idempotencyKey?: string
 ): Promise<ChatResponse> {
   const { data } = await client.post<ChatResponse>("/api/chat", {
     session_id: sessionId,
     message,
+    idempotency_key: idempotencyKey,
   });
   return data;
 }
@@ -1,16 +1,76 @@
 import { useState } from "react";
 import { ChevronDown, ChevronRight, Terminal } from "lucide-react";
-import type { ToolCall } from "@/types";
+import type { RequestTrace, ToolCall, TraceSpan } from "@/types";
 
 interface Props {
   toolCalls: ToolCall[];
   agentName?: string | null;
+  trace?: RequestTrace | null;
 }
 
-export function AgentTracePanel({ toolCalls, agentName }: Props) {
+const KIND_COLORS: Record<TraceSpan["kind"], string> = {
+  guardrail: "bg-amber-400",
+  node: "bg-indigo-400",
+  tool: "bg-sky-400",
+  llm: "bg-violet-400",
+  cache: "bg-emerald-400",
+};
+
+function spanDepth(span: TraceSpan, byId: Map<string, TraceSpan>): number {
+  let depth = 0;
+  let parent = span.parent ? byId.get(span.parent) : undefined;
+  while (parent) {
+    depth += 1;
+    parent = parent.parent ? byId.get(parent.parent) : undefined;
+  }
+  return depth;
+}
+
+function TraceTimeline({ trace }: { trace: RequestTrace }) {
+  const total = Math.max(trace.duration_ms, 1);
+  const byId = new Map(trace.spans.map((s) => [s.id, s]));
+
+  return (
+    <div className="mb-2">
+      <div className="mb-1 text-emerald-400">
+        Timing: {trace.duration_ms.toFixed(0)} ms
+      </div>
+      {trace.spans.map((span) => (
+        <div key={span.id} className="flex items-center gap-2 py-0.5">
+          <span
+            className="w-40 shrink-0 truncate"
+            style={{ paddingLeft: `${spanDepth(span, byId) * 8}px` }}
+            title={span.error ?? span.name}
+          >
+            {span.name}
+          </span>
+          <div className="relative h-2 flex-1 rounded bg-slate-800">
+            <div
+              className={`absolute h-2 rounded ${KIND_COLORS[span.kind] ?? "bg-slate-400"}`}
+              style={{
+                left: `${(span.start_ms / total) * 100}%`,
+                width: `${Math.max((span.duration_ms / total) * 100, 0.5)}%`,
+              }}
+            />
+          </div>
+          <span className="w-16 shrink-0 text-right text-slate-400">
+            {span.cache_hit ? "cached" : `${span.duration_ms.toFixed(0)} ms`}
+          </span>
+          {span.tokens && (
+            <span className="w-20 shrink-0 text-right text-slate-500">
+              {span.tokens.input}/{span.tokens.output} tok
+            </span>
+          )}
+        </div>
+      ))}
+    </div>
+  );
+}
+
+export function AgentTracePanel({ toolCalls, agentName, trace }: Props) {
   const [open, setOpen] = useState(false);
 
-  if (!toolCalls.length) return null;
+  if (!toolCalls.length && !trace) return null;
 
   return (
     <div className="mt-2">
@@ -28,6 +88,7 @@ export function AgentTracePanel({ toolCalls, agentName }: Props) {
           {agentName && (
             <div className="mb-2 text-emerald-400">Route: {agentName}</div>
           )}
+          {trace && <TraceTimeline trace={trace} />}
           {toolCalls.map((tc, i) => (
             <div key={i} className="mb-2 last:mb-0">
               <span className="text-sky-400">Tool:</span> {tc.name}
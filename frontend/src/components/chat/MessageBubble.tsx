@@ -66,8 +66,12 @@ export function MessageBubble({ message }: Props) {
             <ReactMarkdown>{message.content}</ReactMarkdown>
           </div>
         </div>
-        {message.toolCalls && message.toolCalls.length > 0 && (
-          <AgentTracePanel toolCalls={message.toolCalls} agentName={message.agentName} />
+        {((message.toolCalls && message.toolCalls.length > 0) || message.trace) && (
+          <AgentTracePanel
+            toolCalls={message.toolCalls ?? []}
+            agentName={message.agentName}
+            trace={message.trace}
+          />
         )}
       </div>
     </motion.div>
@@ -1,4 +1,5 @@
-import { useCallback } from "react";
+import { useCallback, useRef } from "react";
+import { isAxiosError } from "axios";
 import { Navigate } from "react-router-dom";
 import { Menu } from "lucide-react";
 import { Button } from "@/components/ui/button";
@@ -22,6 +23,9 @@ export function ChatPage() {
   const { isAuthenticated, sessionId } = useAuthStore();
   const { addMessage, setTyping, isTyping, messages } = useChatStore();
   const { setSidebarOpen } = useUIStore();
+  // Idempotency key of each message text still awaiting its reply: sending it again (a
+  // double-clicked quick action) reuses the key, so the backend runs the turn once
+  const inFlight = useRef(new Map<string, string>());
 
   const handleSend = useCallback(
     async (text: string) => {
@@ -65,17 +69,18 @@ export function ChatPage() {
         return;
       }
 
-      const userMsg: Message = {
-        id: crypto.randomUUID(),
-        role: "user",
-        content: text,
-        timestamp: new Date(),
-      };
-      addMessage(userMsg);
+      const pendingKey = inFlight.current.get(text.trim());
+      const key = pendingKey ?? crypto.randomUUID();
+      if (!pendingKey) {
+        inFlight.current.set(text.trim(), key);
+        addMessage({ id: key, role: "user", content: text, timestamp: new Date() });
+      }
       setTyping(true);
 
       try {
-        const res = await sendMessage(sessionId, text);
+        const res = await sendMessage(sessionId, text, key);
+        // The duplicate gets the same reply; the first send already shows it
+        if (pendingKey) return;
 
         const aiMsg: Message = {
           id: crypto.randomUUID(),
@@ -83,18 +88,27 @@ export function ChatPage() {
           content: res.ai_message,
           agentName: res.agent_name,
           toolCalls: res.tool_calls,
+          trace: res.trace,
           timestamp: new Date(),
         };
         addMessage(aiMsg);
-      } catch {
+      } catch (err) {
+        if (pendingKey) return;
+        // 429: the server is shedding load (admission control); say so instead of a connection error
+        const busy = isAxiosError(err) && err.response?.status === 429;
         addMessage({
           id: crypto.randomUUID(),
           role: "assistant",
-          content: "Connection error. Please check the backend server and try again.",
+          content: busy
+            ? "The assistant is busy right now. Please try again in a few seconds."
+            : "Connection error. Please check the backend server and try again.",
           timestamp: new Date(),
         });
       } finally {
-        setTyping(false);
+        if (!pendingKey) {
+          inFlight.current.delete(text.trim());
+          setTyping(false);
+        }
       }
     },
     [sessionId, addMessage, setTyping]
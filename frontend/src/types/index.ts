@@ -11,6 +11,28 @@ export interface ToolCall {
   args: Record<string, unknown>;
 }
 
+export interface TraceSpan {
+  id: string;
+  parent: string | null;
+  name: string;
+  kind: "guardrail" | "node" | "tool" | "llm" | "cache";
+  start_ms: number;
+  duration_ms: number;
+  model?: string;
+  tokens?: { input: number; output: number };
+  cache_hit?: boolean;
+  source?: string;
+  error?: string;
+}
+
+export interface RequestTrace {
+  request_id: string;
+  endpoint: string;
+  started_at: string;
+  duration_ms: number;
+  spans: TraceSpan[];
+}
+
 export type AgentType =
   | "Policy Agent"
   | "Claims Agent"
@@ -26,6 +48,7 @@ export interface Message {
   content: string;
   agentName?: AgentType | null;
   toolCalls?: ToolCall[];
+  trace?: RequestTrace | null;
   timestamp: Date;
 }
 
@@ -35,6 +58,10 @@ export interface ChatResponse {
   tool_calls: ToolCall[];
   blocked: boolean;
   block_message: string | null;
+  cached?: boolean;
+  budget_exceeded?: boolean;
+  coalesced?: boolean;
+  trace?: RequestTrace | null;
 }
 
 export interface LoginResponse {
@@ -103,10 +130,29 @@ export interface ClaimRecord {
   description: string;
 }
 
+export interface AmountTotal {
+  amount: number;
+  bills: number;
+  currency: string;
+}
+
+export interface AccountSummary {
+  active_policies: number;
+  total_policies: number;
+  outstanding: AmountTotal;
+  overdue: AmountTotal;
+  claims: {
+    count: number;
+    amount: number;
+    by_status: Record<string, { count: number; amount: number }>;
+  };
+}
+
 export interface ExecutiveReport {
   report_metadata: ReportMetadata;
   executive_summary: ExecutiveSummary;
   customer_profile: CustomerProfile;
+  account_summary?: Partial<AccountSummary>;
   policy_portfolio: PolicyPortfolioItem[];
   claims_history: ClaimRecord[];
 }